@@ -61,15 +61,6 @@ INSTALLED_APPS = [
     'allauth.socialaccount.providers.google',
     'shop',
 ]
-if DEBUG:
-    INSTALLED_APPS += ["django_crontab"]
-
-
-if DEBUG:
-    CRONJOBS = [
-        ('*/10 * * * *', 'utils.overdue_notifications.send_overdue_notifications'),
-    ]
-
 
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
@@ -159,6 +150,25 @@ DATABASES = {
     )
 }
 
+# Cache: Redis in production so every worker sees the same catalog
+# versions; local memory for development and tests.
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "laundry-shop",
+        }
+    }
+
 
 
 # Password validation
@@ -191,6 +201,12 @@ USE_I18N = True
 
 USE_TZ = True
 
+# Load the delivery model at WSGI import (pair with `gunicorn --preload`)
+DELIVERY_MODEL_PRELOAD = os.getenv("DELIVERY_MODEL_PRELOAD", "False") == "True"
+
+# Serve nearby-branch lookups from an in-process NumPy index instead of SQL
+BRANCH_SPATIAL_INDEX = os.getenv("BRANCH_SPATIAL_INDEX", "False") == "True"
+
 PLATFORM_FEE = 20        # ₹20 flat
 DELIVERY_FEE = 30        # ₹30 flat
 GST_PERCENTAGE = 18      # 18% GST
@@ -232,6 +248,16 @@ cloudinary.config(
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 MEDIA_URL = '/media/'
 
+# Generated payment receipt PDFs (shop.utils.receipts): Cloudinary raw
+# files when Cloudinary is configured, otherwise MEDIA_ROOT/receipts
+if CLOUDINARY_STORAGE['CLOUD_NAME']:
+    RECEIPT_STORAGE = {'BACKEND': 'cloudinary_storage.storage.RawMediaCloudinaryStorage'}
+else:
+    RECEIPT_STORAGE = {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': MEDIA_ROOT / 'receipts'},
+    }
+
 # Razorpay configuration
 RAZORPAY_KEY_ID = os.getenv('RAZORPAY_KEY_ID')
 RAZORPAY_KEY_SECRET = os.getenv('RAZORPAY_KEY_SECRET')
@@ -7,10 +7,29 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
+import gc
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'laundry_shop.settings')
 
 application = get_wsgi_application()
+
+if settings.BRANCH_SPATIAL_INDEX:
+    from django.db import connections
+    from shop.utils.branch_index import get_branch_index
+
+    get_branch_index()
+    # Don't hand this connection to forked workers.
+    connections.close_all()
+
+# With `gunicorn --preload` this module is imported once in the master,
+# so loading the delivery model here lets every worker share it.
+if settings.DELIVERY_MODEL_PRELOAD:
+    from shop.utils.delivery_ai import preload
+
+    preload()
+    # Keep the GC from touching (and un-sharing) the preloaded objects.
+    gc.freeze()
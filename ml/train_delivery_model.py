@@ -1,3 +1,5 @@
+import os
+import sys
 import pandas as pd
 import pickle
 from sklearn.pipeline import Pipeline
@@ -5,6 +7,9 @@ from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.ensemble import RandomForestRegressor
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shop.utils.delivery_forest import compile_pipeline
+
 data = pd.read_csv("delivery_data.csv")
 
 X = data.drop("delivery_hours", axis=1)
@@ -33,4 +38,7 @@ pipeline.fit(X, y)
 with open("delivery_model.pkl", "wb") as f:
     pickle.dump(pipeline, f)
 
+# NumPy export used by shop.utils.delivery_ai at prediction time
+compile_pipeline(pipeline).save("delivery_model.npz")
+
 print("✅ Delivery prediction model trained")
@@ -6,7 +6,8 @@ from .models import (
     Notification,
     ServiceRating,
     EmailVerificationToken, ShopPasswordResetToken,
-    NewsletterSubscriber
+    NewsletterSubscriber,
+    EmailOutbox, ScheduledJob
 )
 
 # -----------------------------
@@ -186,3 +187,24 @@ class ShopPasswordResetTokenAdmin(admin.ModelAdmin):
 class NewsletterSubscriberAdmin(admin.ModelAdmin):
     list_display = ('email', 'subscribed_at')
     search_fields = ('email',)
+
+
+# -----------------------------
+# EMAIL OUTBOX
+# -----------------------------
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    readonly_fields = ('created_at', 'sent_at', 'claimed_at', 'last_error')
+
+
+# -----------------------------
+# SCHEDULED JOBS
+# -----------------------------
+@admin.register(ScheduledJob)
+class ScheduledJobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'next_run_at', 'locked_by', 'last_duration', 'last_lag', 'runs', 'failures')
+    readonly_fields = ('locked_by', 'locked_until', 'last_started_at', 'last_finished_at',
+                       'last_duration', 'last_lag', 'last_error', 'runs', 'failures')
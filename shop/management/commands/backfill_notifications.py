@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from shop.utils.order_notifications import backfill_order_notifications, backfill_welcome_notifications
+
+class Command(BaseCommand):
+    help = "Create missing order status and welcome notifications (safe to re-run)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        orders = backfill_order_notifications(batch_size=options["batch_size"])
+        welcome = backfill_welcome_notifications(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {orders} order notifications and {welcome} welcome notifications"
+        ))
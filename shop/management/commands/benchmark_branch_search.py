@@ -0,0 +1,54 @@
+import math
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from shop.utils.branch_index import build_branch_index
+from shop.utils.geo import DEFAULT_RADIUS_KM, nearby_branches
+
+class Command(BaseCommand):
+    help = "Compare nearby-branch lookups through the in-memory index and through SQL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--radius", type=float, default=DEFAULT_RADIUS_KM)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        index = build_branch_index()
+        build_ms = (time.perf_counter() - started) * 1000
+        self.stdout.write(f"Index: {len(index)} branches, built in {build_ms:.1f} ms")
+        if not len(index):
+            self.stdout.write(self.style.WARNING("No branches with coordinates"))
+            return
+
+        # Query around real branch locations so both paths have work to do
+        rng = random.Random(options["seed"])
+        points = []
+        for _ in range(options["queries"]):
+            i = rng.randrange(len(index))
+            points.append((
+                math.degrees(index.lat[i]) + rng.uniform(-0.05, 0.05),
+                math.degrees(index.lng[i]) + rng.uniform(-0.05, 0.05),
+            ))
+
+        k, radius = options["k"], options["radius"]
+
+        started = time.perf_counter()
+        index_results = [index.nearest(lat, lng, k=k, radius_km=radius) for lat, lng in points]
+        index_ms = (time.perf_counter() - started) * 1000 / len(points)
+
+        started = time.perf_counter()
+        sql_results = [nearby_branches(lat, lng, k=k, radius_km=radius) for lat, lng in points]
+        sql_ms = (time.perf_counter() - started) * 1000 / len(points)
+
+        mismatches = sum(
+            [row["branch_id"] for row in a] != [branch.id for branch in b]
+            for a, b in zip(index_results, sql_results)
+        )
+
+        self.stdout.write(f"Index: {index_ms:.3f} ms/query")
+        self.stdout.write(f"SQL:   {sql_ms:.3f} ms/query")
+        self.stdout.write(f"Speedup: {sql_ms / index_ms:.0f}x, mismatched results: {mismatches}")
@@ -1,9 +1,35 @@
+import signal
+import time
+
 from django.core.management.base import BaseCommand
-from shop.utils import notify_delayed_orders
+from shop.utils.sweeps import CHUNK_SIZE, SWEEPS, run_sweep
 
 class Command(BaseCommand):
-    help = "Check delayed orders and notify customers"
+    help = "Notify customers and shops about delayed and new paid orders (runs until stopped unless --once)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sweep", choices=sorted(SWEEPS), action="append", help="Run only this sweep (repeatable)")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--interval", type=float, default=60, help="Seconds between sweeps")
+        parser.add_argument("--once", action="store_true", help="Sweep once and exit")
+
+    def handle(self, *args, **options):
+        names = options["sweep"] or list(SWEEPS)
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        while self.running:
+            for name in names:
+                handled = run_sweep(name, chunk_size=options["chunk_size"])
+                if handled:
+                    self.stdout.write(f"Sweep {name}: {handled} orders")
+
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
 
-    def handle(self, *args, **kwargs):
-        notify_delayed_orders()
         self.stdout.write(self.style.SUCCESS("Delayed orders checked successfully"))
+
+    def stop(self, *args):
+        self.running = False
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from shop.utils.tokens import CHUNK_SIZE, delete_expired_tokens
+
+class Command(BaseCommand):
+    help = "Delete expired password reset OTPs, shop reset tokens and email verification tokens"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        deleted = delete_expired_tokens(chunk_size=options["chunk_size"])
+        summary = ", ".join(f"{count} {label}" for label, count in deleted.items())
+        self.stdout.write(self.style.SUCCESS(f"Deleted {summary}"))
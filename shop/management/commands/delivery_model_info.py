@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from shop.utils.delivery_ai import preload
+
+class Command(BaseCommand):
+    help = "Load the delivery prediction model and report load time and memory"
+
+    def handle(self, *args, **kwargs):
+        info = preload()
+        self.stdout.write(f"Model: {info['path']}")
+        self.stdout.write(f"Load time: {info['load_seconds']:.3f}s")
+        if info["rss_delta_kb"] is not None:
+            self.stdout.write(f"Max RSS increase: {info['rss_delta_kb'] / 1024:.1f} MB")
+        self.stdout.write(self.style.SUCCESS("Delivery model loaded"))
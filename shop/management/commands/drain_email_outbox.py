@@ -0,0 +1,36 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from shop.utils.email_outbox import drain_outbox
+
+class Command(BaseCommand):
+    help = "Send queued emails from the outbox (runs until stopped unless --once)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--interval", type=float, default=5, help="Seconds to sleep when the outbox is empty")
+        parser.add_argument("--once", action="store_true", help="Drain what is due now and exit")
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        while self.running:
+            sent, failed = drain_outbox(batch_size=options["batch_size"])
+            if sent or failed:
+                self.stdout.write(f"Outbox: {sent} sent, {failed} failed")
+
+            if options["once"]:
+                if not (sent or failed):
+                    break
+                continue
+
+            if not (sent or failed):
+                time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS("Email outbox worker stopped"))
+
+    def stop(self, *args):
+        self.running = False
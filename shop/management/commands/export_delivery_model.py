@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from shop.utils.delivery_ai import COMPILED_MODEL_PATH, MODEL_PATH, _load_pickle
+from shop.utils.delivery_forest import compile_pipeline
+
+class Command(BaseCommand):
+    help = "Export the sklearn delivery model to the NumPy format used for predictions"
+
+    def handle(self, *args, **kwargs):
+        forest = compile_pipeline(_load_pickle(MODEL_PATH))
+        forest.save(COMPILED_MODEL_PATH)
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {forest.left.shape[0]} trees (depth {forest.depth}) to {COMPILED_MODEL_PATH}"
+        ))
@@ -0,0 +1,54 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.utils.exports import CHUNK_SIZE, FORMATS, export_lines, export_queryset, export_records, parse_cursor, parse_day
+
+class Command(BaseCommand):
+    help = "Stream orders with items, fees and Razorpay ids as CSV or JSON lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="First day (YYYY-MM-DD), inclusive")
+        parser.add_argument("--end", help="Last day (YYYY-MM-DD), inclusive")
+        parser.add_argument("--shop", type=int, help="Only this shop id")
+        parser.add_argument("--payment-status")
+        parser.add_argument("--format", choices=list(FORMATS), default="csv")
+        parser.add_argument("--cursor", help="Resume after the row with this cursor")
+        parser.add_argument("--output", help="File to write (default stdout)")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_day(options["start"], "--start")
+            end = parse_day(options["end"], "--end")
+            cursor = parse_cursor(options["cursor"], "--cursor")
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        orders = export_queryset(start, end, options["shop"], options["payment_status"])
+        records = export_records(orders, cursor=cursor, chunk_size=options["chunk_size"])
+
+        # Resuming into a file appends to what the interrupted run wrote
+        appending = bool(options["output"] and cursor)
+        out = open(options["output"], "a" if appending else "w", newline="") \
+            if options["output"] else sys.stdout
+        self.count, self.last_cursor = 0, None
+        try:
+            for line in export_lines(self._track(records), options["format"], header=not appending):
+                out.write(line)
+        except BaseException:
+            if self.last_cursor:
+                self.stderr.write(f"Export interrupted; resume with --cursor {self.last_cursor}")
+            raise
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        self.stderr.write(self.style.SUCCESS(f"Exported {self.count} orders"))
+
+    def _track(self, records):
+        for record in records:
+            yield record
+            # Only count a row once the writer has asked for the next one
+            self.count += 1
+            self.last_cursor = record["cursor"]
@@ -0,0 +1,42 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from shop.utils.statements import generate_statements
+
+class Command(BaseCommand):
+    help = "Write a PDF and CSV statement per shop for one month"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--month", help="YYYY-MM (default: last month)")
+        parser.add_argument("--output", default="statements", help="Directory to write into")
+        parser.add_argument("--workers", type=int, help="Rendering processes (default: CPU count)")
+        parser.add_argument("--shop", type=int, action="append", help="Only this shop id (repeatable)")
+        parser.add_argument("--commission", type=float, default=5, help="Platform commission percentage")
+
+    def handle(self, *args, **options):
+        if options["month"]:
+            try:
+                year, month = (int(part) for part in options["month"].split("-"))
+                if not 1 <= month <= 12:
+                    raise ValueError
+            except ValueError:
+                raise CommandError("--month must look like 2026-09")
+        else:
+            first = timezone.localdate().replace(day=1)
+            last_month = first - timedelta(days=1)
+            year, month = last_month.year, last_month.month
+
+        started = time.monotonic()
+        count = generate_statements(
+            year, month, options["output"],
+            workers=options["workers"],
+            shop_ids=options["shop"],
+            commission_percentage=options["commission"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {count} statements for {year:04d}-{month:02d} "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from shop.utils.revenue import rebuild_rollup
+
+class Command(BaseCommand):
+    help = "Rebuild the daily revenue rollup from the orders table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = rebuild_rollup(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Revenue rollup rebuilt ({count} buckets)"))
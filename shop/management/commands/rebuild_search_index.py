@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shop.models import SearchDocument
+from shop.utils.search import rebuild_index
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents for services, shops, branches and users"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind",
+            action="append",
+            choices=[kind for kind, _ in SearchDocument.KIND_CHOICES],
+            help="Only rebuild this kind (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_index(options["kind"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} search documents"))
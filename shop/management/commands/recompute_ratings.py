@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from shop.utils.ratings import recompute_rating_totals
+
+class Command(BaseCommand):
+    help = "Recompute rating sums and counts on shops, branches and services"
+
+    def handle(self, *args, **kwargs):
+        drifted = recompute_rating_totals()
+        for model, count in drifted.items():
+            self.stdout.write(f"{model}: {count} corrected")
+        self.stdout.write(self.style.SUCCESS("Rating totals recomputed"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from shop.utils.branch_load import reconcile_branch_loads
+
+class Command(BaseCommand):
+    help = "Recount in-progress orders per branch and fix drifted load counters"
+
+    def handle(self, *args, **kwargs):
+        drifted = reconcile_branch_loads()
+        if drifted:
+            self.stdout.write(self.style.WARNING(
+                f"Fixed {len(drifted)} branch counters: {', '.join(map(str, drifted))}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("All branch load counters are correct"))
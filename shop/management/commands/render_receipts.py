@@ -0,0 +1,36 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from shop.utils.receipts import render_pending_receipts
+
+class Command(BaseCommand):
+    help = "Render queued payment receipt PDFs (runs until stopped unless --once)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=20)
+        parser.add_argument("--interval", type=float, default=5, help="Seconds to sleep when nothing is queued")
+        parser.add_argument("--once", action="store_true", help="Render what is queued now and exit")
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        while self.running:
+            rendered, failed = render_pending_receipts(batch_size=options["batch_size"])
+            if rendered or failed:
+                self.stdout.write(f"Receipts: {rendered} rendered, {failed} failed")
+
+            if options["once"]:
+                if not (rendered or failed):
+                    break
+                continue
+
+            if not (rendered or failed):
+                time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS("Receipt worker stopped"))
+
+    def stop(self, *args):
+        self.running = False
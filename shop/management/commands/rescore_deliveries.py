@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from shop.models import Branch, Order
+from shop.utils.delivery_ai import rescore_branch_orders
+
+class Command(BaseCommand):
+    help = "Recompute predicted delivery times for in-flight orders from current branch load"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--branch", type=int, help="Only rescore this branch id")
+        parser.add_argument("--combine", choices=["max", "weighted"], default="max")
+
+    def handle(self, *args, **options):
+        branches = Branch.objects.filter(
+            order__cloth_status__in=Order.IN_PROGRESS_STATUSES
+        ).distinct()
+        if options["branch"]:
+            branches = branches.filter(id=options["branch"])
+
+        total = 0
+        for branch in branches:
+            total += rescore_branch_orders(branch, combine=options["combine"])
+
+        self.stdout.write(self.style.SUCCESS(f"Rescored {total} orders"))
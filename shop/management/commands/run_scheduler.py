@@ -0,0 +1,53 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from shop.utils.scheduler import JOBS, ensure_jobs, node_name, run_job, seconds_until_due
+
+class Command(BaseCommand):
+    help = "Run the periodic jobs (sweeps, outbox, rollup, token cleanup) on their intervals until stopped"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--job", choices=sorted(JOBS), action="append", help="Run only this job (repeatable)")
+        parser.add_argument("--tick", type=float, default=5, help="Longest sleep between schedule checks")
+        parser.add_argument("--once", action="store_true", help="Run the jobs that are due now and exit")
+
+    def handle(self, *args, **options):
+        names = options["job"] or list(JOBS)
+        node = node_name()
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        ensure_jobs(names)
+        while self.running:
+            close_old_connections()
+            ran = False
+            for name in names:
+                # A stop request lets the current job finish, not the rest
+                if not self.running:
+                    break
+                job = run_job(name, node)
+                if job is None:
+                    continue
+                ran = True
+                status = f"failed ({job.last_error})" if job.last_error else "ok"
+                self.stdout.write(
+                    f"Job {name}: {status} in {job.last_duration:.2f}s, started {job.last_lag:.2f}s late"
+                )
+
+            if options["once"]:
+                break
+            if not ran:
+                self.sleep(min(max(seconds_until_due(names), 1), options["tick"]))
+
+        self.stdout.write(self.style.SUCCESS("Scheduler stopped"))
+
+    def sleep(self, seconds):
+        deadline = time.monotonic() + seconds
+        while self.running and time.monotonic() < deadline:
+            time.sleep(min(1, deadline - time.monotonic()))
+
+    def stop(self, *args):
+        self.running = False
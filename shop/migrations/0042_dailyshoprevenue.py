@@ -0,0 +1,51 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_rollup(apps, schema_editor):
+    Order = apps.get_model('shop', 'Order')
+    DailyShopRevenue = apps.get_model('shop', 'DailyShopRevenue')
+
+    rows = (
+        Order.objects
+        .annotate(date=TruncDate('created_at'))
+        .values('date', 'shop_id', 'branch_id', 'payment_status', 'cloth_status')
+        .annotate(order_count=Count('id'), revenue=Sum('amount'))
+        .order_by()
+    )
+    DailyShopRevenue.objects.bulk_create(
+        (DailyShopRevenue(**{**row, 'revenue': row['revenue'] or 0}) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0041_servicerating_unique_user_shop_rating_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyShopRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('payment_status', models.CharField(max_length=20)),
+                ('cloth_status', models.CharField(max_length=20)),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_revenue', to='shop.branch')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_revenue', to='shop.laundryshop')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['shop', 'date'], name='dailyrev_shop_date_idx'), models.Index(fields=['date'], name='dailyrev_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'shop', 'branch', 'payment_status', 'cloth_status'), name='unique_daily_shop_revenue_bucket')],
+            },
+        ),
+        migrations.RunPython(populate_rollup, migrations.RunPython.noop),
+    ]
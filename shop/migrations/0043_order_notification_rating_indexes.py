@@ -0,0 +1,63 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0042_dailyshoprevenue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='notif_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user', '-created_at'], name='notif_user_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['shop', '-created_at'], name='notif_shop_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['shop', 'payment_status', 'cloth_status', 'created_at'], name='order_shop_pay_cloth_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'payment_status', 'created_at'], name='order_user_pay_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['branch', 'cloth_status'], name='order_branch_cloth_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['delivery_date', 'cloth_status'], name='order_delivery_cloth_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('cloth_status__in', ['Pending', 'Washing', 'Drying', 'Ironing']), ('payment_status', 'Completed')), fields=['delivery_date'], name='order_delayed_candidates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerating',
+            index=models.Index(fields=['branch', 'rating'], name='rating_branch_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerating',
+            index=models.Index(fields=['service', 'rating'], name='rating_service_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerating',
+            index=models.Index(fields=['shop', 'rating'], name='rating_shop_rating_idx'),
+        ),
+    ]
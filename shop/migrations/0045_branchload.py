@@ -0,0 +1,43 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+IN_PROGRESS_STATUSES = ['Pending', 'Washing', 'Drying', 'Ironing']
+
+
+def populate_loads(apps, schema_editor):
+    Order = apps.get_model('shop', 'Order')
+    BranchLoad = apps.get_model('shop', 'BranchLoad')
+
+    rows = (
+        Order.objects
+        .filter(branch__isnull=False, cloth_status__in=IN_PROGRESS_STATUSES)
+        .values('branch_id')
+        .annotate(in_flight=Count('id'))
+        .order_by()
+    )
+    BranchLoad.objects.bulk_create(
+        (BranchLoad(**row) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0044_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BranchLoad',
+            fields=[
+                ('branch', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='load', serialize=False, to='shop.branch')),
+                ('in_flight', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_loads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:40
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_totals(apps, schema_editor):
+    ServiceRating = apps.get_model('shop', 'ServiceRating')
+
+    for field, model_name in (('shop', 'LaundryShop'), ('branch', 'Branch'), ('service', 'Service')):
+        ratings = (
+            ServiceRating.objects
+            .filter(**{field: OuterRef('pk')})
+            .values(field)
+            .order_by()
+        )
+        apps.get_model('shop', model_name).objects.update(
+            rating_sum=Coalesce(
+                Subquery(ratings.annotate(total=Sum('rating')).values('total')),
+                Value(0), output_field=IntegerField(),
+            ),
+            rating_count=Coalesce(
+                Subquery(ratings.annotate(total=Count('id')).values('total')),
+                Value(0), output_field=IntegerField(),
+            ),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0045_branchload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='branch',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='branch',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='laundryshop',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='laundryshop',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0046_rating_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='branch',
+            index=models.Index(fields=['latitude', 'longitude'], name='branch_lat_lng_idx'),
+        ),
+    ]
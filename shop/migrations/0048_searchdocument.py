@@ -0,0 +1,134 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:45
+
+import re
+
+from django.db import migrations, models
+
+FTS_TABLE = 'shop_searchdocument_fts'
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE shop_searchdocument ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX shop_searchdocument_vector_gin ON shop_searchdocument USING GIN (search_vector)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS shop_searchdocument_vector_gin",
+    "ALTER TABLE shop_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+# External-content FTS5 table over shop_searchdocument, kept in step by triggers
+SQLITE_FORWARD = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, body, content='shop_searchdocument', content_rowid='id'
+    )
+    """,
+    f"""
+    CREATE TRIGGER shop_searchdocument_ai AFTER INSERT ON shop_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER shop_searchdocument_ad AFTER DELETE ON shop_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER shop_searchdocument_au AFTER UPDATE ON shop_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS shop_searchdocument_au",
+    "DROP TRIGGER IF EXISTS shop_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS shop_searchdocument_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def _run(schema_editor, statements):
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def create_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_FORWARD)
+
+
+def drop_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_REVERSE)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_REVERSE)
+
+
+def _text(*parts):
+    return re.sub(r'[^\w]+', ' ', ' '.join(str(part) for part in parts if part)).strip()
+
+
+def populate_documents(apps, schema_editor):
+    # Mirrors the builders in shop.utils.search at the time of writing
+    SearchDocument = apps.get_model('shop', 'SearchDocument')
+    User = apps.get_model('auth', 'User')
+    Service = apps.get_model('shop', 'Service')
+    LaundryShop = apps.get_model('shop', 'LaundryShop')
+    Branch = apps.get_model('shop', 'Branch')
+
+    def documents():
+        for s in Service.objects.select_related('branch__shop').iterator():
+            yield 'service', s.id, _text(s.name), _text(s.branch.name, s.branch.city, s.branch.shop.name)
+        for s in LaundryShop.objects.iterator():
+            yield 'shop', s.id, _text(s.name), _text(s.city, s.email, s.phone, s.address)
+        for b in Branch.objects.select_related('shop').iterator():
+            yield 'branch', b.id, _text(b.name), _text(b.shop.name, b.city, b.address, b.phone)
+        for u in User.objects.iterator():
+            yield 'user', u.id, _text(u.username, u.first_name, u.last_name), _text(u.email)
+
+    SearchDocument.objects.bulk_create(
+        (
+            SearchDocument(kind=kind, object_id=object_id, title=title[:255], body=body)
+            for kind, object_id, title, body in documents()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('shop', '0047_branch_lat_lng_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('service', 'Service'), ('shop', 'Shop'), ('branch', 'Branch'), ('user', 'User')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        migrations.RunPython(create_text_index, drop_text_index),
+        migrations.RunPython(populate_documents, migrations.RunPython.noop),
+    ]
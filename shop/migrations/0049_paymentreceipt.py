@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0048_searchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentReceipt',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='receipt', serialize=False, to='shop.order')),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Rendering', 'Rendering'), ('Ready', 'Ready'), ('Failed', 'Failed')], default='Pending', max_length=10)),
+                ('paid_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('order_version', models.CharField(blank=True, max_length=64)),
+                ('content_hash', models.CharField(blank=True, max_length=64)),
+                ('file_name', models.CharField(blank=True, max_length=255)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('requested_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('generated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'requested_at'], name='receipt_status_requested_idx')],
+            },
+        ),
+    ]
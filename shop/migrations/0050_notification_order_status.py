@@ -0,0 +1,73 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:55
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Titles written by the old per-page-view create_order_notifications
+LEGACY_TITLE = re.compile(r'^Order #(\d+) (Completed|Ready for Pickup|In Progress)$')
+LEGACY_STATUS = {'Completed': 'Completed', 'Ready for Pickup': 'Ready', 'In Progress': 'Washing'}
+
+
+def link_legacy_notifications(apps, schema_editor):
+    """
+    Attach existing order notifications to their order and status, so
+    the backfill does not repeat them. Only the first row per (user,
+    order, status) is linked; later duplicates stay unlinked.
+    """
+    Notification = apps.get_model('shop', 'Notification')
+    Order = apps.get_model('shop', 'Order')
+
+    rows = (
+        Notification.objects
+        .filter(
+            user__isnull=False,
+            order__isnull=True,
+            notification_type__in=['completed', 'ready_pickup', 'status_update'],
+            title__startswith='Order #',
+        )
+        .order_by('id')
+        .values_list('id', 'user_id', 'title')
+    )
+    seen = set()
+    links = []
+    for notification_id, user_id, title in rows.iterator():
+        match = LEGACY_TITLE.match(title)
+        if not match:
+            continue
+        key = (user_id, int(match.group(1)), LEGACY_STATUS[match.group(2)])
+        if key not in seen:
+            seen.add(key)
+            links.append((notification_id, key))
+
+    existing = set(Order.objects.filter(id__in={key[1] for _, key in links}).values_list('id', flat=True))
+    batch = [
+        Notification(id=notification_id, order_id=order_id, status=status)
+        for notification_id, (_, order_id, status) in links
+        if order_id in existing
+    ]
+    Notification.objects.bulk_update(batch, ['order', 'status'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0049_paymentreceipt'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='shop.order'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='status',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.RunPython(link_legacy_notifications, migrations.RunPython.noop),
+    ]
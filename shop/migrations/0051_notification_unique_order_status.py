@@ -0,0 +1,22 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Separate from 0050 so the constraint is not added in the same
+    # transaction as that migration's data updates (Postgres refuses to
+    # alter a table with pending deferred FK checks).
+
+    dependencies = [
+        ('shop', '0050_notification_order_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('order__isnull', False)), fields=('user', 'order', 'status'), name='unique_order_status_notification'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:01
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def keep_latest_otp(apps, schema_editor):
+    """OTPs are now upserted per user; drop all but each user's newest."""
+    PasswordResetOTP = apps.get_model('shop', 'PasswordResetOTP')
+    latest = PasswordResetOTP.objects.values('user_id').annotate(latest=Max('id')).values('latest')
+    PasswordResetOTP.objects.exclude(id__in=list(latest)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0052_scheduledjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_latest_otp, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='emailverificationtoken',
+            index=models.Index(fields=['expires_at'], name='email_token_expires_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordresetotp',
+            index=models.Index(fields=['user', 'created_at'], name='otp_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppasswordresettoken',
+            index=models.Index(fields=['created_at'], name='shop_reset_created_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:12
+
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_buckets(apps, schema_editor):
+    """Sum branch-less buckets that NULL-distinct uniqueness let through."""
+    DailyShopRevenue = apps.get_model('shop', 'DailyShopRevenue')
+    keys = ('date', 'shop_id', 'payment_status', 'cloth_status')
+    duplicates = (
+        DailyShopRevenue.objects
+        .filter(branch__isnull=True)
+        .values(*keys)
+        .annotate(rows=Count('id'), keep=Min('id'), order_count=Sum('order_count'), revenue=Sum('revenue'))
+        .filter(rows__gt=1)
+    )
+    for bucket in list(duplicates):
+        lookup = {key: bucket[key] for key in keys}
+        DailyShopRevenue.objects.filter(branch__isnull=True, **lookup).exclude(id=bucket['keep']).delete()
+        DailyShopRevenue.objects.filter(id=bucket['keep']).update(
+            order_count=bucket['order_count'], revenue=bucket['revenue'],
+        )
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0053_token_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_buckets, migrations.RunPython.noop),
+    ]
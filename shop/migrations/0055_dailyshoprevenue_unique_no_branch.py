@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0054_merge_no_branch_revenue_buckets'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='dailyshoprevenue',
+            constraint=models.UniqueConstraint(condition=models.Q(('branch__isnull', True)), fields=('date', 'shop', 'payment_status', 'cloth_status'), name='unique_daily_shop_revenue_no_branch'),
+        ),
+    ]
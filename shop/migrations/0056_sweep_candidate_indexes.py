@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0055_dailyshoprevenue_unique_no_branch'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_delayed_candidates_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('cloth_status__in', ['Pending', 'Washing', 'Drying', 'Ironing']), ('overdue_notification_sent', False), ('payment_status', 'Completed')), fields=['delivery_date'], name='order_delayed_candidates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('cloth_status', 'Pending'), ('payment_status', 'Completed'), ('pending_notification_sent', False)), fields=['id'], name='order_pending_candidates_idx'),
+        ),
+    ]
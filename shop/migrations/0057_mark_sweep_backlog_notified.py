@@ -0,0 +1,42 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:15
+
+from datetime import timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+IN_PROGRESS_STATUSES = ['Pending', 'Washing', 'Drying', 'Ironing']
+
+
+def mark_backlog_notified(apps, schema_editor):
+    """
+    The notifiers the sweeps replace never ran, so no order has its flag
+    set. Mark what was already overdue (or paid and waiting for over a
+    day) as handled, instead of apologising for every old order on the
+    first sweep.
+    """
+    Order = apps.get_model('shop', 'Order')
+    now = timezone.now()
+    Order.objects.filter(
+        payment_status='Completed',
+        cloth_status__in=IN_PROGRESS_STATUSES,
+        delivery_date__lt=now,
+        overdue_notification_sent=False,
+    ).update(overdue_notification_sent=True)
+    Order.objects.filter(
+        payment_status='Completed',
+        cloth_status='Pending',
+        created_at__lt=now - timedelta(days=1),
+        pending_notification_sent=False,
+    ).update(pending_notification_sent=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0056_sweep_candidate_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_backlog_notified, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:16
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def keep_latest_otp(apps, schema_editor):
+    """Drop duplicates concurrent requests could insert before the constraint."""
+    PasswordResetOTP = apps.get_model('shop', 'PasswordResetOTP')
+    latest = PasswordResetOTP.objects.values('user_id').annotate(latest=Max('id')).values('latest')
+    PasswordResetOTP.objects.exclude(id__in=list(latest)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0057_mark_sweep_backlog_notified'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_latest_otp, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='passwordresetotp',
+            constraint=models.UniqueConstraint(fields=('user',), name='unique_password_reset_otp_user'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:33
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0058_unique_password_reset_otp_user'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='passwordresetotp',
+            name='otp_user_created_idx',
+        ),
+    ]
@@ -3,6 +3,21 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from cloudinary.models import CloudinaryField
 from datetime import timedelta
+
+
+class RatingTotals(models.Model):
+    """Running sum and count of ratings, maintained by shop.utils.ratings."""
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def rating_average(self):
+        return self.rating_sum / self.rating_count if self.rating_count else 0
+
+
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     full_name = models.CharField(max_length=100, blank=True)
@@ -18,7 +33,7 @@ class Profile(models.Model):
     def __str__(self):
         return f"{self.user.username}'s profile"
 
-class LaundryShop(models.Model):
+class LaundryShop(RatingTotals):
     name = models.CharField(max_length=100, unique=True)
     email = models.EmailField(unique=True)
     password = models.CharField(max_length=128, blank=True)
@@ -103,7 +118,7 @@ class LaundryShop(models.Model):
     def __str__(self):
         return self.name
 
-class Branch(models.Model):
+class Branch(RatingTotals):
     shop = models.ForeignKey(LaundryShop, on_delete=models.CASCADE, related_name='branches')
     name = models.CharField(max_length=100)
     address = models.TextField()
@@ -116,7 +131,13 @@ class Branch(models.Model):
 
     created_at = models.DateTimeField(default=timezone.now)
 
-class Service(models.Model):
+    class Meta:
+        indexes = [
+            # Bounding-box prefilter for nearby-branch search
+            models.Index(fields=['latitude', 'longitude'], name='branch_lat_lng_idx'),
+        ]
+
+class Service(RatingTotals):
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='services')
     name = models.CharField(max_length=100)
     price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
@@ -211,9 +232,57 @@ class Order(models.Model):
     razorpay_payment_id = models.CharField(max_length=100, blank=True, null=True)
     razorpay_order_id = models.CharField(max_length=100, blank=True, null=True)
 
+    IN_PROGRESS_STATUSES = ['Pending', 'Washing', 'Drying', 'Ironing']
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['shop', 'payment_status', 'cloth_status', 'created_at'],
+                name='order_shop_pay_cloth_idx'
+            ),
+            models.Index(
+                fields=['user', 'payment_status', 'created_at'],
+                name='order_user_pay_created_idx'
+            ),
+            models.Index(
+                fields=['branch', 'cloth_status'],
+                name='order_branch_cloth_idx'
+            ),
+            models.Index(
+                fields=['delivery_date', 'cloth_status'],
+                name='order_delivery_cloth_idx'
+            ),
+            # The sweeps (shop.utils.sweeps) only look at paid orders they
+            # have not handled yet, so these stay as small as the backlog
+            models.Index(
+                fields=['delivery_date'],
+                condition=models.Q(
+                    payment_status='Completed',
+                    cloth_status__in=['Pending', 'Washing', 'Drying', 'Ironing'],
+                    overdue_notification_sent=False,
+                ),
+                name='order_delayed_candidates_idx'
+            ),
+            models.Index(
+                fields=['id'],
+                condition=models.Q(
+                    payment_status='Completed',
+                    cloth_status='Pending',
+                    pending_notification_sent=False,
+                ),
+                name='order_pending_candidates_idx'
+            ),
+            models.Index(fields=['created_at'], name='order_created_idx'),
+        ]
+
 class Notification(models.Model):
     user = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE)
     shop = models.ForeignKey(LaundryShop, null=True, blank=True, on_delete=models.CASCADE)
+    # Set on order status notifications, which exist once per status
+    order = models.ForeignKey(
+        'Order', null=True, blank=True, on_delete=models.CASCADE, related_name='notifications'
+    )
+    status = models.CharField(max_length=20, blank=True)
 
     title = models.CharField(max_length=200)
     message = models.TextField()
@@ -223,6 +292,32 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-created_at'],
+                name='notif_user_created_idx'
+            ),
+            # Badges and dropdowns only ever ask for unread rows
+            models.Index(
+                fields=['user', '-created_at'],
+                condition=models.Q(is_read=False),
+                name='notif_user_unread_idx'
+            ),
+            models.Index(
+                fields=['shop', '-created_at'],
+                condition=models.Q(is_read=False),
+                name='notif_shop_unread_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'order', 'status'],
+                condition=models.Q(order__isnull=False),
+                name='unique_order_status_notification'
+            ),
+        ]
+
 class ServiceRating(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     shop = models.ForeignKey(LaundryShop, on_delete=models.CASCADE, null=True, blank=True)
@@ -244,12 +339,22 @@ class ServiceRating(models.Model):
                 name='unique_user_service_rating'
             ),
         ]
+        indexes = [
+            models.Index(fields=['branch', 'rating'], name='rating_branch_rating_idx'),
+            models.Index(fields=['service', 'rating'], name='rating_service_rating_idx'),
+            models.Index(fields=['shop', 'rating'], name='rating_shop_rating_idx'),
+        ]
     
 class EmailVerificationToken(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     token = models.CharField(max_length=100, unique=True)
     expires_at = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at'], name='email_token_expires_idx'),
+        ]
+
     def is_expired(self):
         return timezone.now() > self.expires_at
 
@@ -261,8 +366,15 @@ class ShopPasswordResetToken(models.Model):
     token = models.CharField(max_length=100, unique=True)
     created_at = models.DateTimeField(default=timezone.now)
 
+    TTL = timedelta(hours=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='shop_reset_created_idx'),
+        ]
+
     def is_expired(self):
-        return timezone.now() > self.created_at + timezone.timedelta(hours=1)
+        return timezone.now() > self.created_at + self.TTL
 
 class NewsletterSubscriber(models.Model):
     email = models.EmailField(unique=True)
@@ -285,8 +397,17 @@ class PasswordResetOTP(models.Model):
     otp = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    TTL = timedelta(minutes=5)
+
+    class Meta:
+        # One row per user (shop.utils.tokens.issue_password_reset_otp);
+        # its unique index also serves verification lookups
+        constraints = [
+            models.UniqueConstraint(fields=['user'], name='unique_password_reset_otp_user'),
+        ]
+
     def is_expired(self):
-        return timezone.now() > self.created_at + timedelta(minutes=5)
+        return timezone.now() > self.created_at + self.TTL
 
     def __str__(self):
         return f"{self.user.email} - {self.otp}"
@@ -316,3 +437,161 @@ class ShopNotification(models.Model):
     color = models.CharField(max_length=20, default="#e74c3c")
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+
+class DailyShopRevenue(models.Model):
+    """Per-day order count and revenue, kept in step with Order saves."""
+    date = models.DateField()
+    shop = models.ForeignKey(LaundryShop, on_delete=models.CASCADE, related_name='daily_revenue')
+    branch = models.ForeignKey(Branch, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_revenue')
+    payment_status = models.CharField(max_length=20)
+    cloth_status = models.CharField(max_length=20)
+
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'shop', 'branch', 'payment_status', 'cloth_status'],
+                name='unique_daily_shop_revenue_bucket'
+            ),
+            # NULLs are distinct in the constraint above, so branch-less
+            # buckets need their own
+            models.UniqueConstraint(
+                fields=['date', 'shop', 'payment_status', 'cloth_status'],
+                condition=models.Q(branch__isnull=True),
+                name='unique_daily_shop_revenue_no_branch'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['shop', 'date'], name='dailyrev_shop_date_idx'),
+            models.Index(fields=['date'], name='dailyrev_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.shop_id}/{self.branch_id} - {self.payment_status}/{self.cloth_status}"
+
+class BranchLoad(models.Model):
+    """Orders currently in progress at a branch, kept in step with Order saves."""
+    branch = models.OneToOneField(Branch, on_delete=models.CASCADE, primary_key=True, related_name='load')
+    in_flight = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.branch_id} - {self.in_flight} in progress"
+
+class EmailOutbox(models.Model):
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Sending', 'Sending'),
+        ('Sent', 'Sent'),
+        ('Dead', 'Dead'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    is_html = models.BooleanField(default=False)
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.JSONField(default=list)
+    reply_to = models.JSONField(default=list, blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+class SearchDocument(models.Model):
+    """
+    Flattened searchable text for one service, shop, branch or user.
+    The full-text index over it (tsvector + GIN on Postgres, FTS5 on
+    SQLite) is created in migration 0048; see shop.utils.search.
+    """
+    KIND_CHOICES = [
+        ('service', 'Service'),
+        ('shop', 'Shop'),
+        ('branch', 'Branch'),
+        ('user', 'User'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_document'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}: {self.title}"
+
+
+class PaymentReceipt(models.Model):
+    """
+    The stored PDF receipt of a paid order. `order_version` hashes the
+    data the PDF shows, so a receipt is rendered again only when that
+    data changes; the file is stored under `content_hash`.
+    """
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Rendering', 'Rendering'),
+        ('Ready', 'Ready'),
+        ('Failed', 'Failed'),
+    ]
+
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, primary_key=True, related_name='receipt')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    paid_at = models.DateTimeField(default=timezone.now)
+    order_version = models.CharField(max_length=64, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    file_name = models.CharField(max_length=255, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    requested_at = models.DateTimeField(default=timezone.now)
+    generated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'requested_at'], name='receipt_status_requested_idx'),
+        ]
+
+    def __str__(self):
+        return f"Receipt for order #{self.order_id} ({self.status})"
+
+
+class ScheduledJob(models.Model):
+    """
+    Schedule and lease of one run_scheduler job (shop.utils.scheduler).
+    A node runs the job only after taking the lease with a conditional
+    update, so each run happens on one node; the last_* fields record
+    how late it started and how long it took.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    next_run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_finished_at = models.DateTimeField(null=True, blank=True)
+    last_duration = models.FloatField(null=True, blank=True)
+    last_lag = models.FloatField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    runs = models.PositiveIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} (next {self.next_run_at:%Y-%m-%d %H:%M:%S})"
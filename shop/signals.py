@@ -1,10 +1,22 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth.models import User
 
-from .models import Order, Profile
+from .models import (
+    Branch, BranchCloth, LaundryShop, Order, Profile, Service, ServiceClothPrice, ServiceRating,
+)
+from .utils.branch_load import record_load_change
+from .utils.branch_index import BRANCH_INDEX_SCOPE
+from .utils.catalog import bump_catalog_version, bump_version
+from .utils.email_outbox import queue_email
+from .utils.order_notifications import notify_status_change, send_welcome_notifications
+from .utils.ratings import forget_rating
+from .utils.revenue import fold_branch_buckets, order_snapshot, record_order_change
+from .utils.search import index_object, reindex_related, unindex_object
+
+ROLLUP_SOURCE_FIELDS = {"created_at", "shop", "branch", "payment_status", "cloth_status", "amount"}
 
 
 @receiver(post_save, sender=Order)
@@ -49,12 +61,11 @@ Shine & Bright Team
 🧺✨
 """
 
-        send_mail(
+        queue_email(
             subject=subject,
             message=message,
             from_email=settings.EMAIL_HOST_USER,
             recipient_list=[user.email],
-            fail_silently=True,
         )
 
         instance.thank_you_sent = True
@@ -69,3 +80,137 @@ def create_user_profile(sender, instance, created, **kwargs):
 
     if created:
         Profile.objects.get_or_create(user=instance)
+        send_welcome_notifications(instance)
+
+
+# -----------------------------
+# DAILY REVENUE ROLLUP + BRANCH LOAD
+# -----------------------------
+@receiver(post_init, sender=Order)
+def remember_order_bucket(sender, instance, **kwargs):
+    # Reading a deferred field here would cost a query per instance;
+    # pre_save fetches the old bucket instead when it is needed.
+    if ROLLUP_SOURCE_FIELDS & instance.get_deferred_fields():
+        return
+    instance._rollup_snapshot = order_snapshot(instance)
+
+
+@receiver(pre_save, sender=Order)
+def load_order_bucket(sender, instance, **kwargs):
+    if kwargs.get("raw", False) or hasattr(instance, "_rollup_snapshot"):
+        return
+
+    old = Order.objects.filter(pk=instance.pk).first() if instance.pk else None
+    instance._rollup_snapshot = order_snapshot(old) if old else None
+
+
+# Must stay above update_revenue_rollup, which replaces the snapshot
+@receiver(post_save, sender=Order)
+def notify_order_status(sender, instance, created, **kwargs):
+    if kwargs.get("raw", False):
+        return
+
+    old = None if created else instance._rollup_snapshot
+    old_status = old[0][4] if old else None
+    notify_status_change(instance, old_status)
+
+
+@receiver(post_save, sender=Order)
+def update_revenue_rollup(sender, instance, created, **kwargs):
+    if kwargs.get("raw", False):
+        return
+
+    old = None if created else instance._rollup_snapshot
+    new = order_snapshot(instance)
+    record_order_change(old, new)
+    record_load_change(old, new)
+    instance._rollup_snapshot = new
+
+
+@receiver(post_delete, sender=Order)
+def remove_from_revenue_rollup(sender, instance, **kwargs):
+    old = getattr(instance, "_rollup_snapshot", None)
+    record_order_change(old, None)
+    record_load_change(old, None)
+
+
+@receiver(pre_delete, sender=Branch)
+def fold_branch_revenue(sender, instance, **kwargs):
+    fold_branch_buckets(instance.pk)
+
+
+# -----------------------------
+# CATALOG CACHE VERSIONS
+# -----------------------------
+def _shop_id_for_branch(branch_id):
+    return Branch.objects.filter(pk=branch_id).values_list("shop_id", flat=True).first()
+
+
+def _catalog_shop_id(instance):
+    if isinstance(instance, LaundryShop):
+        return instance.pk
+    if isinstance(instance, Branch):
+        return instance.shop_id
+    if isinstance(instance, BranchCloth):
+        return _shop_id_for_branch(instance.branch_id)
+    if isinstance(instance, Service):
+        return _shop_id_for_branch(instance.branch_id)
+    if isinstance(instance, ServiceClothPrice):
+        branch_id = (
+            Service.objects.filter(pk=instance.service_id)
+            .values_list("branch_id", flat=True)
+            .first()
+        )
+        return _shop_id_for_branch(branch_id)
+    return None
+
+
+@receiver(post_save, sender=LaundryShop)
+@receiver(post_save, sender=Branch)
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=ServiceClothPrice)
+@receiver(post_save, sender=BranchCloth)
+@receiver(post_delete, sender=LaundryShop)
+@receiver(post_delete, sender=Branch)
+@receiver(post_delete, sender=Service)
+@receiver(post_delete, sender=ServiceClothPrice)
+@receiver(post_delete, sender=BranchCloth)
+def bump_catalog_on_change(sender, instance, **kwargs):
+    if kwargs.get("raw", False):
+        return
+
+    # Bump once the change commits, so a concurrent reader can't cache
+    # pre-commit data under the new version
+    shop_id = _catalog_shop_id(instance)
+    if shop_id is not None:
+        transaction.on_commit(lambda: bump_catalog_version(shop_id))
+
+    # Shop approval/open state and branch locations feed the branch index
+    if isinstance(instance, (LaundryShop, Branch)):
+        transaction.on_commit(lambda: bump_version(BRANCH_INDEX_SCOPE))
+
+
+@receiver(post_save, sender=LaundryShop)
+@receiver(post_save, sender=Branch)
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=User)
+def update_search_document(sender, instance, created, **kwargs):
+    if kwargs.get("raw", False):
+        return
+
+    changed = index_object(instance, kwargs.get("update_fields"))
+    if changed and not created:
+        reindex_related(instance)
+
+
+@receiver(post_delete, sender=LaundryShop)
+@receiver(post_delete, sender=Branch)
+@receiver(post_delete, sender=Service)
+@receiver(post_delete, sender=User)
+def remove_search_document(sender, instance, **kwargs):
+    unindex_object(instance)
+
+
+@receiver(post_delete, sender=ServiceRating)
+def remove_rating_from_totals(sender, instance, **kwargs):
+    forget_rating(instance)
@@ -1,3 +1,1514 @@
-from django.test import TestCase
+import csv
+import importlib
+import io
+import json
+import os
+import smtplib
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.core import mail
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Avg, Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import (
+    Branch, BranchCloth, BranchLoad, Cloth, DailyShopRevenue, EmailVerificationToken, LaundryShop, Notification,
+    Order, OrderItem, PasswordResetOTP, ShopPasswordResetToken,
+    EmailOutbox, PaymentReceipt, ScheduledJob, SearchDocument, Service, ServiceClothPrice, ServiceRating,
+)
+from .utils import branch_index, delivery_ai
+from .utils.branch_index import get_branch_index, reset_branch_index
+from .utils.branch_load import branch_load, branch_loads, reconcile_branch_loads
+from .utils.catalog import build_branch_catalog, catalog_version, get_branch_catalog
+from .utils.delivery_forest import CompiledForest
+from .utils.email_outbox import MAX_ATTEMPTS, drain_outbox, queue_email
+from .utils.geo import bounding_box, haversine_km, nearby_branches
+from .utils.order_notifications import backfill_order_notifications, backfill_welcome_notifications
+from .utils.pagination import capped_count, keyset_page
+from .utils.ratings import rating_average_expression, recompute_rating_totals, save_rating
+from .utils.receipts import current_receipt, render_pending_receipts, request_receipt
+from .utils.revenue import rebuild_rollup, reconcile_rollup
+from .utils.scheduler import JOBS, ensure_jobs, run_job
+from .utils.search import SEARCH_LIMIT, order_search_filter, rebuild_index, search_ids, search_queryset
+from .utils.statements import generate_statements, iter_statements
+from .utils.stats import admin_dashboard_stats
+from .utils.sweeps import delayed_candidates, pending_candidates, run_sweep
+from .utils.tokens import delete_expired_tokens, delete_in_chunks, issue_password_reset_otp
+
+BASE_DIR = settings.BASE_DIR
+
+
+class HotQueryIndexTests(TestCase):
+    """
+    The dashboards and sweeps rely on the composite indexes declared on
+    Order, Notification and ServiceRating. These tests fail if a query
+    change stops the planner from being able to use them.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("indexer", "indexer@example.com", "pw")
+        cls.shop = LaundryShop.objects.create(name="Index Shop", email="index@example.com")
+        cls.branch = Branch.objects.create(shop=cls.shop, name="Main", address="-")
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            # Tables are tiny in tests; make the planner show its index choice.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, msg=plan)
+
+    def test_shop_dashboard_orders(self):
+        qs = Order.objects.filter(
+            shop=self.shop, payment_status="Completed", cloth_status="Pending"
+        ).order_by("-created_at")
+        self.assertUsesIndex(qs, "order_shop_pay_cloth_idx")
+
+    def test_user_paid_orders(self):
+        qs = Order.objects.filter(
+            user=self.user, payment_status="Completed"
+        ).order_by("-created_at")
+        self.assertUsesIndex(qs, "order_user_pay_created_idx")
+
+    def test_branch_in_progress_orders(self):
+        qs = Order.objects.filter(
+            branch=self.branch, cloth_status__in=Order.IN_PROGRESS_STATUSES
+        )
+        self.assertUsesIndex(qs, "order_branch_cloth_idx")
+
+    def test_delayed_order_sweep(self):
+        qs = delayed_candidates(timezone.now())
+        # SQLite cannot match a partial index against bound IN parameters,
+        # so locally the full (delivery_date, cloth_status) index is used.
+        if connection.vendor == "postgresql":
+            self.assertUsesIndex(qs, "order_delayed_candidates_idx")
+        else:
+            self.assertUsesIndex(qs, "order_delivery_cloth_idx")
+
+    def test_pending_order_sweep(self):
+        qs = pending_candidates(timezone.now())
+        self.assertUsesIndex(qs, "order_pending_candidates_idx")
+
+    def test_user_notifications(self):
+        qs = Notification.objects.filter(user=self.user).order_by("-created_at")
+        self.assertUsesIndex(qs, "notif_user_created_idx")
+
+    def test_unread_user_notifications(self):
+        qs = Notification.objects.filter(
+            user=self.user, is_read=False
+        ).order_by("-created_at")
+        self.assertUsesIndex(qs, "notif_user_unread_idx")
+
+    def test_unread_shop_notifications(self):
+        qs = Notification.objects.filter(shop=self.shop, is_read=False)
+        self.assertUsesIndex(qs, "notif_shop_unread_idx")
+
+    def test_nearby_branch_bounding_box(self):
+        min_lat, max_lat, min_lng, max_lng = bounding_box(9.98, 76.28, 15)
+        qs = Branch.objects.filter(
+            latitude__gte=min_lat, latitude__lte=max_lat,
+            longitude__gte=min_lng, longitude__lte=max_lng,
+        )
+        self.assertUsesIndex(qs, "branch_lat_lng_idx")
+
+    def test_branch_rating_average(self):
+        qs = ServiceRating.objects.filter(branch=self.branch).values("rating")
+        self.assertUsesIndex(qs, "rating_branch_rating_idx")
+
+
+class CompiledDeliveryModelTests(SimpleTestCase):
+    """The NumPy delivery model must predict exactly what the sklearn pipeline does."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        import pandas as pd
+
+        cls.data = pd.read_csv(os.path.join(BASE_DIR, "ml", "delivery_data.csv"))
+        cls.X = cls.data.drop("delivery_hours", axis=1)
+        cls.pipeline = delivery_ai.registry.get()
+        cls.forest = delivery_ai.compiled_registry.get()
+
+    def test_batch_matches_sklearn(self):
+        expected = self.pipeline.predict(self.X)
+        actual = self.forest.predict(self.X.to_numpy())
+        np.testing.assert_allclose(actual, expected, rtol=1e-9)
+
+    def test_single_values_match_sklearn(self):
+        for row in self.X.itertuples(index=False):
+            self.assertEqual(
+                delivery_ai.predict_delivery_hours(*row),
+                delivery_ai.predict_delivery_hours_sklearn(*row),
+            )
+
+    def test_unseen_inputs_match_sklearn(self):
+        rows = [
+            ("Blanket", "Wash & Iron", 7, 3),
+            ("Shirt", "Steam Press", 0, 1),
+            ("Suit", "Dry Cleaning", 50, 12),
+        ]
+        for row in rows:
+            self.assertEqual(
+                delivery_ai.predict_delivery_hours(*row),
+                delivery_ai.predict_delivery_hours_sklearn(*row),
+            )
+
+    def test_batch_combines_lines(self):
+        lines = [("Shirt", "Wash & Iron", 4), ("Suit", "Dry Cleaning", 1)]
+        singles = [
+            delivery_ai.compiled_registry.get().predict_one(cloth, service, 10, 5)
+            for cloth, service, _ in lines
+        ]
+        self.assertEqual(
+            delivery_ai.predict_delivery_hours_batch(lines, branch_load=10),
+            int(round(max(singles))),
+        )
+        self.assertEqual(
+            delivery_ai.predict_delivery_hours_batch(lines, branch_load=10, combine="weighted"),
+            int(round((singles[0] * 4 + singles[1]) / 5)),
+        )
+
+    def test_export_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.npz")
+            self.forest.save(path)
+            loaded = CompiledForest.load(path)
+        np.testing.assert_array_equal(
+            loaded.predict(self.X.to_numpy()), self.forest.predict(self.X.to_numpy())
+        )
+
+
+class DeliveryModelRegistryTests(SimpleTestCase):
+
+    def counting_loader(self, delay=0):
+        calls = []
+
+        def load(path):
+            calls.append(path)
+            time.sleep(delay)
+            return object()
+
+        return load, calls
+
+    def test_import_does_not_load_the_model(self):
+        code = (
+            "import sys, django; django.setup()\n"
+            "from shop.utils import delivery_ai\n"
+            "print(delivery_ai.registry.loaded, delivery_ai.compiled_registry.loaded, 'sklearn' in sys.modules)"
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(result.stdout.split(), ["False", "False", "False"])
+
+    def test_concurrent_first_calls_load_once(self):
+        load, calls = self.counting_loader(delay=0.05)
+        registry = delivery_ai.ModelRegistry("model.npz", loader=load)
+        self.assertFalse(registry.loaded)
+
+        barrier = threading.Barrier(8)
+        models = []
+
+        def get():
+            barrier.wait()
+            models.append(registry.get())
+
+        threads = [threading.Thread(target=get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, ["model.npz"])
+        self.assertEqual(len({id(model) for model in models}), 1)
+        self.assertIs(registry.get(), models[0])
+        self.assertGreaterEqual(registry.info()["load_seconds"], 0.05)
+
+    def import_wsgi(self, preload):
+        sys.modules.pop("laundry_shop.wsgi", None)
+        with override_settings(DELIVERY_MODEL_PRELOAD=preload, BRANCH_SPATIAL_INDEX=False), \
+                mock.patch("shop.utils.delivery_ai.preload") as preloaded, mock.patch("gc.freeze"):
+            importlib.import_module("laundry_shop.wsgi")
+        sys.modules.pop("laundry_shop.wsgi", None)
+        return preloaded.called
+
+    def test_wsgi_preloads_only_when_enabled(self):
+        self.assertFalse(self.import_wsgi(False))
+        self.assertTrue(self.import_wsgi(True))
+
+    def test_info_command_reports_load_time_and_size(self):
+        load, calls = self.counting_loader()
+        registry = delivery_ai.ModelRegistry("model.npz", loader=load)
+        out = io.StringIO()
+        with mock.patch.object(delivery_ai, "compiled_registry", registry):
+            call_command("delivery_model_info", stdout=out)
+        self.assertEqual(len(calls), 1)
+        output = out.getvalue()
+        self.assertIn("Model: model.npz", output)
+        self.assertRegex(output, r"Load time: \d+\.\d{3}s")
+        if delivery_ai.resource is not None:
+            self.assertRegex(output, r"Max RSS increase: \d+\.\d MB")
+
+
+class BranchLoadCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("loader", "loader@example.com", "pw")
+        cls.shop = LaundryShop.objects.create(name="Load Shop", email="load@example.com")
+        cls.branch = Branch.objects.create(shop=cls.shop, name="Main", address="-")
+        cls.other = Branch.objects.create(shop=cls.shop, name="Second", address="-")
+
+    def test_counter_follows_status_and_branch_changes(self):
+        order = Order.objects.create(user=self.user, shop=self.shop, branch=self.branch)
+        Order.objects.create(user=self.user, shop=self.shop, branch=self.branch)
+        self.assertEqual(branch_load(self.branch), 2)
+
+        order.cloth_status = "Washing"
+        order.save()
+        self.assertEqual(branch_load(self.branch), 2)
+
+        order.branch = self.other
+        order.save()
+        self.assertEqual(branch_loads([self.branch, self.other]), {self.branch.id: 1, self.other.id: 1})
+
+        order.cloth_status = "Ready"
+        order.save()
+        self.assertEqual(branch_load(self.other), 0)
+
+        Order.objects.filter(branch=self.branch).delete()
+        self.assertEqual(branch_load(self.branch), 0)
+
+    def test_reconcile_fixes_drift(self):
+        Order.objects.create(user=self.user, shop=self.shop, branch=self.branch)
+        BranchLoad.objects.filter(branch=self.branch).update(in_flight=7)
+        BranchLoad.objects.create(branch=self.other, in_flight=3)
+
+        self.assertEqual(reconcile_branch_loads(), sorted([self.branch.id, self.other.id]))
+        self.assertEqual(branch_loads([self.branch, self.other]), {self.branch.id: 1, self.other.id: 0})
+        self.assertEqual(reconcile_branch_loads(), [])
+
+
+class BranchCatalogTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = LaundryShop.objects.create(name="Catalog Shop", email="catalog@example.com")
+        cls.branch = Branch.objects.create(shop=cls.shop, name="Main", address="-")
+        cls.service = Service.objects.create(branch=cls.branch, name="Wash & Iron", price=50)
+        cls.shirt = Cloth.objects.create(name="Shirt")
+        cls.suit = Cloth.objects.create(name="Suit")
+        BranchCloth.objects.create(branch=cls.branch, cloth=cls.shirt)
+        ServiceClothPrice.objects.create(service=cls.service, cloth=cls.shirt, price=20)
+        # Priced, but not offered at this branch
+        ServiceClothPrice.objects.create(service=cls.service, cloth=cls.suit, price=90)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_built_with_three_queries_and_serializable(self):
+        with self.assertNumQueries(3):
+            catalog = build_branch_catalog(self.branch.id)
+
+        json.dumps(catalog.data)
+        self.assertEqual(catalog.price(self.service.id, self.shirt.id), Decimal("20.00"))
+        self.assertIsNone(catalog.price(self.service.id, self.suit.id))
+        self.assertEqual(catalog.cloth_prices(), {self.service.id: {self.shirt.id: 20.0}})
+
+    def test_cached_until_catalog_changes(self):
+        get_branch_catalog(self.branch)
+        with self.assertNumQueries(0):
+            get_branch_catalog(self.branch)
+
+        # Saving any catalog model bumps the shop's version on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            BranchCloth.objects.create(branch=self.branch, cloth=self.suit)
+            # Until then readers keep the cached catalog
+            self.assertIsNone(get_branch_catalog(self.branch).price(self.service.id, self.suit.id))
+        catalog = get_branch_catalog(self.branch)
+        self.assertEqual(catalog.price(self.service.id, self.suit.id), Decimal("90.00"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ServiceClothPrice.objects.update_or_create(
+                service=self.service, cloth=self.suit, defaults={"price": 80}
+            )
+        self.assertEqual(get_branch_catalog(self.branch).price(self.service.id, self.suit.id), Decimal("80.00"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Service.objects.filter(pk=self.service.pk).delete()
+        self.assertEqual(get_branch_catalog(self.branch).services, [])
+
+    def test_versions_are_per_shop(self):
+        other = LaundryShop.objects.create(name="Other", email="other@example.com")
+        before = catalog_version(self.shop.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Branch.objects.create(shop=other, name="Elsewhere", address="-")
+        self.assertEqual(catalog_version(self.shop.id), before)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.branch.save()
+        self.assertNotEqual(catalog_version(self.shop.id), before)
+
+    def test_orders_charge_the_database_price(self):
+        LaundryShop.objects.filter(pk=self.shop.pk).update(is_approved=True)
+        user = User.objects.create_user("kim", "kim@example.com", "pw")
+        self.client.force_login(user)
+        get_branch_catalog(self.branch)
+        # A price change this process's cache has not heard about, as
+        # when another worker saved it
+        ServiceClothPrice.objects.filter(service=self.service, cloth=self.shirt).update(price=25)
+
+        self.client.post(
+            f"/shop/{self.shop.id}/branch/{self.branch.id}/create-order/",
+            {"selected_services": [self.service.id], f"clothes_{self.service.id}": [self.shirt.id],
+             f"quantity_{self.service.id}_{self.shirt.id}": 2},
+        )
+        self.assertEqual(Order.objects.get(user=user).base_amount, Decimal("50.00"))
+
+
+class RatingTotalsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user("alice", "alice@example.com", "pw")
+        cls.bob = User.objects.create_user("bob", "bob@example.com", "pw")
+        cls.shop = LaundryShop.objects.create(name="Rated Shop", email="rated@example.com")
+        cls.branch = Branch.objects.create(shop=cls.shop, name="Main", address="-")
+        cls.service = Service.objects.create(branch=cls.branch, name="Wash & Fold")
+
+    def test_save_rating_keeps_totals(self):
+        save_rating(self.alice, self.branch, 5)
+        save_rating(self.bob, self.branch, 2)
+        _, created = save_rating(self.alice, self.branch, 3, "changed my mind")
+
+        self.assertFalse(created)
+        self.branch.refresh_from_db()
+        self.assertEqual((self.branch.rating_sum, self.branch.rating_count), (5, 2))
+        self.assertEqual(self.branch.rating_average, 2.5)
+
+        self.shop.refresh_from_db()
+        self.assertEqual(self.shop.rating_count, 0)
+
+    def test_average_expression_matches_ratings(self):
+        save_rating(self.alice, self.service, 4)
+        save_rating(self.bob, self.service, 5)
+        save_rating(self.alice, self.shop, 3)
+
+        service = Service.objects.annotate(
+            avg=rating_average_expression(),
+            shop_avg=rating_average_expression("branch__shop__"),
+        ).get(pk=self.service.pk)
+        self.assertEqual((service.avg, service.shop_avg), (4.5, 3.0))
+        self.assertIsNone(
+            Branch.objects.annotate(avg=rating_average_expression()).get(pk=self.branch.pk).avg
+        )
+
+    def test_deleted_ratings_leave_the_totals(self):
+        save_rating(self.alice, self.service, 4)
+        save_rating(self.bob, self.service, 2)
+        save_rating(self.bob, self.branch, 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ServiceRating.objects.filter(user=self.alice).delete()
+        self.service.refresh_from_db()
+        self.assertEqual((self.service.rating_sum, self.service.rating_count), (2, 1))
+
+        # Cascade from deleting the user (the delete_account flow)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.delete()
+        self.service.refresh_from_db()
+        self.branch.refresh_from_db()
+        self.assertEqual((self.service.rating_sum, self.service.rating_count), (0, 0))
+        self.assertEqual((self.branch.rating_sum, self.branch.rating_count), (0, 0))
+        self.assertEqual(recompute_rating_totals(), {"LaundryShop": 0, "Branch": 0, "Service": 0})
+
+    def test_recompute_fixes_drift(self):
+        save_rating(self.alice, self.service, 4)
+        ServiceRating.objects.create(user=self.bob, branch=self.branch, rating=1)
+        Service.objects.filter(pk=self.service.pk).update(rating_sum=40, rating_count=9)
+
+        drifted = recompute_rating_totals()
+
+        self.assertEqual(drifted, {"LaundryShop": 0, "Branch": 1, "Service": 1})
+        self.service.refresh_from_db()
+        self.branch.refresh_from_db()
+        self.assertEqual((self.service.rating_sum, self.service.rating_count), (4, 1))
+        self.assertEqual((self.branch.rating_sum, self.branch.rating_count), (1, 1))
+
+
+class NearbyBranchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        open_shop = LaundryShop.objects.create(name="Open", email="open@example.com", is_approved=True)
+        closed_shop = LaundryShop.objects.create(
+            name="Closed", email="closed@example.com", is_approved=True, is_open=False
+        )
+        # Around Kochi (9.98, 76.28)
+        cls.near = Branch.objects.create(
+            shop=open_shop, name="Near", address="-", city="Kochi", latitude=9.99, longitude=76.29
+        )
+        cls.farther = Branch.objects.create(
+            shop=open_shop, name="Farther", address="-", city="Aluva", latitude=10.10, longitude=76.35
+        )
+        cls.closed = Branch.objects.create(
+            shop=closed_shop, name="Closed", address="-", city="Kochi", latitude=9.98, longitude=76.28
+        )
+        cls.far_away = Branch.objects.create(
+            shop=open_shop, name="Delhi", address="-", city="Delhi", latitude=28.61, longitude=77.21
+        )
+
+    def test_nearest_first_within_radius(self):
+        branches = nearby_branches(9.98, 76.28, k=5, radius_km=20)
+        self.assertEqual([b.id for b in branches], [self.near.id, self.farther.id])
+        self.assertAlmostEqual(
+            branches[0].distance_km, haversine_km(9.98, 76.28, 9.99, 76.29), places=6
+        )
+        self.assertLess(branches[0].distance_km, branches[1].distance_km)
+
+    def test_radius_and_k_limit(self):
+        self.assertEqual([b.id for b in nearby_branches(9.98, 76.28, radius_km=5)], [self.near.id])
+        self.assertEqual(len(nearby_branches(9.98, 76.28, k=1, radius_km=20)), 1)
+
+    def test_city_fallback_without_coordinates(self):
+        branches = nearby_branches(None, None, city="kochi ")
+        self.assertEqual([b.id for b in branches], [self.near.id])
+        self.assertIsNone(branches[0].distance_km)
+        self.assertEqual(nearby_branches(None, None), [])
+
+    def test_api_validates_coordinates(self):
+        self.client.force_login(User.objects.create_user("max", "max@example.com", "pw"))
+        url = "/api/nearby-branches/"
+        for params in (
+            {"lat": "nan", "lng": "76.28"},
+            {"lat": "9.98", "lng": "inf"},
+            {"lat": "91", "lng": "76.28"},
+            {"lat": "9.98", "lng": "-181"},
+            {"lat": "9.98", "lng": "76.28", "radius": "0"},
+            {"lat": "9.98", "lng": "76.28", "radius": "nan"},
+        ):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+
+        response = self.client.get(url, {"lat": "9.98", "lng": "76.28", "k": "-3", "radius": "20"})
+        self.assertEqual([b["branch_id"] for b in response.json()["branches"]], [self.near.id])
+
+    def test_haversine_known_distance(self):
+        # Kochi to Delhi is roughly 2,070 km great-circle
+        self.assertAlmostEqual(haversine_km(9.98, 76.28, 28.61, 77.21) / 1000, 2.07, places=1)
+
+
+class BranchIndexTests(NearbyBranchTests):
+    """The in-memory index must agree with the SQL nearby-branch search."""
+
+    def setUp(self):
+        cache.clear()
+        reset_branch_index()
+
+    def assertMatchesSql(self, lat, lng, **kwargs):
+        expected = [(b.id, b.distance_km) for b in nearby_branches(lat, lng, **kwargs)]
+        actual = [
+            (row["branch_id"], row["distance_km"])
+            for row in get_branch_index().nearest(lat, lng, **kwargs)
+        ]
+        self.assertEqual([i for i, _ in actual], [i for i, _ in expected])
+        for (_, a), (_, b) in zip(actual, expected):
+            self.assertAlmostEqual(a, b, places=6)
+
+    def test_matches_sql_path(self):
+        self.assertMatchesSql(9.98, 76.28, k=5, radius_km=20)
+        self.assertMatchesSql(9.98, 76.28, k=1, radius_km=20)
+        self.assertMatchesSql(9.98, 76.28, radius_km=5)
+        self.assertMatchesSql(20.0, 77.0, k=5, radius_km=2000)
+        self.assertMatchesSql(-40.0, 10.0)
+
+    def test_rebuilt_when_branches_change(self):
+        index = get_branch_index()
+        with self.assertNumQueries(0):
+            self.assertIs(get_branch_index(), index)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            extra = Branch.objects.create(
+                shop=self.near.shop, name="New", address="-", latitude=9.981, longitude=76.281
+            )
+        with mock.patch.object(branch_index, "VERSION_CHECK_INTERVAL", 0):
+            rebuilt = get_branch_index()
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(rebuilt.nearest(9.98, 76.28, k=1)[0]["branch_id"], extra.id)
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = LaundryShop.objects.create(
+            name="Sparkle Laundry", email="hello@sparkle.example", city="Kochi", is_approved=True
+        )
+        cls.branch = Branch.objects.create(shop=cls.shop, name="Marine Drive", address="-", city="Kochi")
+        cls.wash_iron = Service.objects.create(branch=cls.branch, name="Wash & Iron")
+        cls.dry_clean = Service.objects.create(branch=cls.branch, name="Dry Cleaning")
+        # Mentions "iron" only in its body (the branch name)
+        other = Branch.objects.create(shop=cls.shop, name="Iron Street", address="-")
+        cls.steam = Service.objects.create(branch=other, name="Steam Press")
+        cls.alice = User.objects.create_user("alice", "alice.w@example.com", "pw", first_name="Alice")
+
+    def test_prefix_and_all_terms(self):
+        self.assertEqual(search_ids("was ir", "service"), [self.wash_iron.id])
+        self.assertEqual(search_ids("dry", "service"), [self.dry_clean.id])
+        self.assertEqual(search_ids("sparkle", "shop"), [self.shop.id])
+        self.assertEqual(search_ids("nothing here", "service"), [])
+        self.assertEqual(search_ids("  ", "service"), [])
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(search_ids("iron", "service"), [self.wash_iron.id, self.steam.id])
+        ranked = search_queryset(Service.objects.all(), "iron")
+        self.assertEqual([s.id for s in ranked], [self.wash_iron.id, self.steam.id])
+
+    def test_email_tokens_match(self):
+        self.assertEqual(search_ids("alice.w@example", "user"), [self.alice.id])
+
+    def test_signals_keep_documents_current(self):
+        self.wash_iron.name = "Fold Only"
+        self.wash_iron.save()
+        self.assertEqual(search_ids("wash", "service"), [])
+        self.assertEqual(search_ids("fold", "service"), [self.wash_iron.id])
+
+        # Renaming a shop refreshes its branch and service documents
+        self.shop.name = "Bubbles"
+        self.shop.save()
+        self.assertCountEqual(
+            search_ids("bubbles", "service"), [self.wash_iron.id, self.dry_clean.id, self.steam.id]
+        )
+
+        self.dry_clean.delete()
+        self.assertFalse(SearchDocument.objects.filter(kind="service", object_id=self.dry_clean.id).exists())
+        self.assertEqual(search_ids("dry", "service"), [])
+
+    def test_unchanged_saves_skip_the_index(self):
+        self.alice.last_login = timezone.now()
+        with self.assertNumQueries(1):
+            self.alice.save(update_fields=["last_login"])
+
+        before = dict(SearchDocument.objects.values_list("id", "updated_at"))
+        # Saves that leave the document text alone write nothing
+        self.shop.is_open = not self.shop.is_open
+        self.shop.save()
+        self.branch.save()
+        self.assertEqual(dict(SearchDocument.objects.values_list("id", "updated_at")), before)
+
+    def test_rebuild_matches_signals(self):
+        before = set(SearchDocument.objects.values_list("kind", "object_id", "title", "body"))
+        self.assertEqual(rebuild_index(), len(before))
+        after = set(SearchDocument.objects.values_list("kind", "object_id", "title", "body"))
+        self.assertEqual(after, before)
+        self.assertEqual(search_ids("was ir", "service"), [self.wash_iron.id])
+
+    def test_order_search_filter(self):
+        order = Order.objects.create(user=self.alice, shop=self.shop, amount=Decimal("10"))
+        self.assertEqual(list(Order.objects.filter(order_search_filter("ali"))), [order])
+        self.assertEqual(list(Order.objects.filter(order_search_filter(f"#{order.id}"))), [order])
+        self.assertFalse(Order.objects.filter(order_search_filter("bob")).exists())
+
+    def test_common_terms_stay_subqueries(self):
+        User.objects.bulk_create([User(username=f"user{n}", email=f"user{n}@gmail.com") for n in range(30)])
+        rebuild_index(["user"])
+
+        self.assertEqual(len(search_ids("gmail", "user", limit=10)), 10)
+        users = search_queryset(User.objects.all(), "gmail", ranked=False, limit=20)
+        self.assertEqual(users.count(), 20)
+        # Matches are filtered through SearchDocument in SQL, not as a
+        # parameter per matching id
+        sql, params = Order.objects.filter(order_search_filter("gmail")).query.sql_with_params()
+        self.assertIn("shop_searchdocument", sql)
+        self.assertLess(len(params), 5)
+
+
+class AdminPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user("boss", "boss@example.com", "pw", is_staff=True)
+        cls.customer = User.objects.create_user("carol", "carol@example.com", "pw")
+        cls.shop = LaundryShop.objects.create(name="Paged", email="paged@example.com", is_approved=True)
+        now = timezone.now()
+        # Repeated amounts and timestamps, so the id tie-breaker matters
+        Order.objects.bulk_create([
+            Order(
+                user=cls.customer, shop=cls.shop, amount=Decimal(i % 3),
+                payment_status="Completed", created_at=now - timezone.timedelta(hours=i // 2),
+            )
+            for i in range(7)
+        ])
+
+    def walk(self, ordering, page_size=3):
+        seen, cursor = [], None
+        while True:
+            page = keyset_page(Order.objects.all(), cursor, ordering, page_size)
+            seen.extend(order.id for order in page)
+            if not page.has_next:
+                return seen
+            cursor = page.next_cursor
+
+    def test_pages_cover_every_row_once_in_order(self):
+        for ordering in (("-created_at", "-id"), ("-amount", "-id")):
+            expected = list(Order.objects.order_by(*ordering).values_list("id", flat=True))
+            self.assertEqual(self.walk(ordering), expected)
+
+    def test_capped_count(self):
+        self.assertEqual(capped_count(Order.objects.all()), (7, False))
+        self.assertEqual(capped_count(Order.objects.all(), cap=5), (5, True))
+
+    def test_partial_pages_keep_filters(self):
+        self.client.force_login(self.admin)
+        with mock.patch("shop.views.ADMIN_PAGE_SIZE", 4):
+            first = self.client.get("/admin-panel/orders/filter/", {"search": "carol"})
+            page = first.context["orders"]
+            self.assertEqual(len(page), 4)
+            self.assertEqual(page.total_display, "7")
+            self.assertIn("search=carol", page.next_url)
+
+            second = self.client.get(page.next_url)
+        rest = second.context["orders"]
+        self.assertEqual(len(rest), 3)
+        self.assertIsNone(rest.next_url)
+        self.assertTrue(rest.first_url.startswith("/admin-panel/orders/filter/"))
+        self.assertFalse({o.id for o in page} & {o.id for o in rest})
+
+    def test_user_search_counts_every_match(self):
+        total = SEARCH_LIMIT + 5
+        User.objects.bulk_create([User(username=f"user{n}", email=f"user{n}@gmail.com") for n in range(total)])
+        rebuild_index(["user"])
+        self.client.force_login(self.admin)
+        response = self.client.get("/dashboard/users/search/", {"q": "gmail"})
+        self.assertEqual(response.context["users"].total_display, str(total))
+
+    def test_bad_cursor_restarts(self):
+        self.client.force_login(self.admin)
+        response = self.client.get("/admin-panel/orders/revenue/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["orders"]), 7)
+
+
+class OrderExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user("finance", "finance@example.com", "pw", is_staff=True)
+        customer = User.objects.create_user("dan", "dan@example.com", "pw")
+        cls.shop = LaundryShop.objects.create(name="Exported", email="exported@example.com")
+        other = LaundryShop.objects.create(name="Other", email="other@example.com")
+        branch = Branch.objects.create(shop=cls.shop, name="Main", address="-")
+        service = Service.objects.create(branch=branch, name="Wash")
+        cloth = Cloth.objects.create(name="Shirt")
+
+        day = timezone.make_aware(timezone.datetime(2026, 3, 10, 12))
+        cls.orders = []
+        for i in range(5):
+            order = Order.objects.create(
+                user=customer, shop=cls.shop, branch=branch, created_at=day + timezone.timedelta(days=i),
+                amount=Decimal("118.00"), gst_amount=Decimal("18.00"), platform_fee=Decimal("5.00"),
+                payment_status="Completed" if i != 2 else "Pending", razorpay_payment_id=f"pay_{i}",
+            )
+            OrderItem.objects.create(order=order, service=service, cloth=cloth, quantity=i + 1)
+            cls.orders.append(order)
+        Order.objects.create(user=customer, shop=other, created_at=day)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def export(self, **params):
+        response = self.client.get("/admin-panel/orders/export/", params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_with_filters(self):
+        body = self.export(shop=self.shop.id, start="2026-03-11", end="2026-03-13", payment_status="Completed")
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual([int(r["order_id"]) for r in rows], [self.orders[1].id, self.orders[3].id])
+        self.assertEqual(rows[0]["items"], "Wash / Shirt x2")
+        self.assertEqual(rows[0]["gst_amount"], "18.00")
+        self.assertEqual(rows[0]["razorpay_payment_id"], "pay_1")
+        self.assertEqual(rows[0]["branch"], "Main")
+
+    def test_jsonl_resumes_from_cursor(self):
+        lines = [json.loads(line) for line in self.export(format="jsonl", shop=self.shop.id).splitlines()]
+        self.assertEqual([r["order_id"] for r in lines], [o.id for o in self.orders])
+        self.assertEqual(lines[0]["items"], [{"service": "Wash", "cloth": "Shirt", "quantity": 1}])
+
+        rest = self.export(format="jsonl", shop=self.shop.id, cursor=lines[1]["cursor"]).splitlines()
+        self.assertEqual([json.loads(line)["order_id"] for line in rest], [o.id for o in self.orders[2:]])
+
+    def test_rejects_bad_filters(self):
+        for params in ({"start": "yesterday"}, {"format": "xml"}, {"shop": "x"}, {"cursor": "not-a-cursor"}):
+            self.assertEqual(self.client.get("/admin-panel/orders/export/", params).status_code, 400)
+
+    def test_command_appends_when_resuming(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "orders.csv")
+            call_command("export_orders", shop=self.shop.id, end="2026-03-11", output=path, stderr=io.StringIO())
+            with open(path) as f:
+                cursor = list(csv.DictReader(f))[-1]["cursor"]
+            call_command(
+                "export_orders", shop=self.shop.id, cursor=cursor, output=path,
+                chunk_size=2, stderr=io.StringIO(),
+            )
+            with open(path) as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual([int(r["order_id"]) for r in rows], [o.id for o in self.orders])
+
+    def test_command_rejects_bad_cursor_before_writing(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "orders.csv")
+            with self.assertRaises(CommandError):
+                call_command("export_orders", cursor="typo", output=path, stderr=io.StringIO())
+            self.assertFalse(os.path.exists(path))
+
+
+class PaymentReceiptTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user("erin", "erin@example.com", "pw")
+        shop = LaundryShop.objects.create(name="Receipts", email="receipts@example.com")
+        branch = Branch.objects.create(shop=shop, name="Main", address="-")
+        service = Service.objects.create(branch=branch, name="Wash", price=Decimal("40"))
+        cloth = Cloth.objects.create(name="Saree")
+        ServiceClothPrice.objects.create(service=service, cloth=cloth, price=Decimal("55"))
+        cls.order = Order.objects.create(
+            user=cls.customer, shop=shop, branch=branch, payment_status="Completed",
+            base_amount=Decimal("110"), amount=Decimal("129.80"), gst_amount=Decimal("19.80"),
+        )
+        OrderItem.objects.create(order=cls.order, service=service, cloth=cloth, quantity=2)
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        storage = {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": tmp.name}}
+        override = override_settings(RECEIPT_STORAGE=storage)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client.force_login(self.customer)
+
+    def test_worker_renders_queued_receipt_once(self):
+        request_receipt(self.order)
+        self.assertEqual(render_pending_receipts(), (1, 0))
+        self.assertEqual(render_pending_receipts(), (0, 0))
+
+        receipt = PaymentReceipt.objects.get(order=self.order)
+        self.assertEqual(receipt.status, "Ready")
+        self.assertTrue(receipt.file_name.endswith(f"{receipt.content_hash}.pdf"))
+
+        # Downloads reuse it while the order is unchanged
+        again = current_receipt(self.order)
+        self.assertEqual(again.generated_at, receipt.generated_at)
+
+    def test_download_with_etag(self):
+        response = self.client.get(f"/orders/{self.order.id}/receipt/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        body = b"".join(response.streaming_content)
+        self.assertTrue(body.startswith(b"%PDF"))
+        etag = response["ETag"]
+
+        cached = self.client.get(f"/orders/{self.order.id}/receipt/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+
+        Order.objects.filter(pk=self.order.pk).update(delivery_name="Erin at work")
+        changed = self.client.get(f"/orders/{self.order.id}/receipt/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], etag)
+
+    def test_rendering_is_deterministic(self):
+        first = current_receipt(self.order)
+        PaymentReceipt.objects.filter(pk=first.pk).update(status="Pending")
+        self.assertEqual(render_pending_receipts(), (1, 0))
+        self.assertEqual(PaymentReceipt.objects.get(pk=first.pk).content_hash, first.content_hash)
+
+    def test_only_owner_can_download(self):
+        User.objects.create_user("mallory", "m@example.com", "pw")
+        self.client.login(username="mallory", password="pw")
+        self.assertEqual(self.client.get(f"/orders/{self.order.id}/receipt/").status_code, 404)
+
+
+class MonthlyStatementTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = User.objects.create_user("fay", "fay@example.com", "pw")
+        cls.shops = [
+            LaundryShop.objects.create(name=f"Statement {i}", email=f"statement{i}@example.com")
+            for i in range(3)
+        ]
+        september = timezone.make_aware(timezone.datetime(2026, 9, 15, 10))
+        for shop, amounts in zip(cls.shops, ([100, 200], [50], [])):
+            for amount in amounts:
+                Order.objects.create(
+                    user=customer, shop=shop, amount=Decimal(amount),
+                    payment_status="Completed", created_at=september,
+                )
+        Order.objects.create(user=customer, shop=cls.shops[0], amount=Decimal("80"), created_at=september)
+        # Outside the month
+        Order.objects.create(
+            user=customer, shop=cls.shops[2], amount=Decimal("999"), payment_status="Completed",
+            created_at=september + timezone.timedelta(days=30),
+        )
+
+    def test_one_query_grouped_by_shop(self):
+        with self.assertNumQueries(2):
+            statements = list(iter_statements(2026, 9))
+        self.assertEqual([s["shop_id"] for s in statements], [self.shops[0].id, self.shops[1].id])
+
+        totals = statements[0]["totals"]
+        self.assertEqual(totals["orders"], 3)
+        self.assertEqual(totals["paid_orders"], 2)
+        self.assertEqual(totals["amount"], "380.00")
+        self.assertEqual(totals["gross"], "300.00")
+        self.assertEqual(totals["commission"], "15.00")
+        self.assertEqual(totals["payout"], "285.00")
+
+    def test_writes_pdf_and_csv_per_shop(self):
+        for workers in (1, 2):
+            with self.subTest(workers=workers), tempfile.TemporaryDirectory() as tmp:
+                self.assertEqual(generate_statements(2026, 9, tmp, workers=workers), 2)
+                folder = os.path.join(tmp, "2026-09")
+                self.assertEqual(sorted(os.listdir(folder)), sorted(
+                    f"shop-{shop.id}.{ext}" for shop in self.shops[:2] for ext in ("csv", "pdf")
+                ))
+                with open(os.path.join(folder, f"shop-{self.shops[1].id}.csv")) as f:
+                    rows = list(csv.reader(f))
+                self.assertEqual(rows[-1], ["total", "", "", "", "50.00", "2.50", "47.50"])
+                # The unpaid order counts toward the amount column, not commission or payout
+                with open(os.path.join(folder, f"shop-{self.shops[0].id}.csv")) as f:
+                    rows = list(csv.reader(f))
+                self.assertEqual(rows[-1], ["total", "", "", "", "380.00", "15.00", "285.00"])
+                for column in (4, 5, 6):
+                    self.assertEqual(sum(Decimal(row[column]) for row in rows[1:-1]), Decimal(rows[-1][column]))
+                with open(os.path.join(folder, f"shop-{self.shops[1].id}.pdf"), "rb") as f:
+                    self.assertTrue(f.read(4) == b"%PDF")
+
+
+class OrderNotificationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("gus", "gus@example.com", "pw")
+        cls.shop = LaundryShop.objects.create(name="Notify", email="notify@example.com")
+
+    def order_notifications(self):
+        return list(
+            Notification.objects.filter(user=self.user, order__isnull=False)
+            .order_by("id").values_list("order_id", "status", "title")
+        )
+
+    def test_new_user_gets_welcome_notifications_once(self):
+        types = Notification.objects.filter(user=self.user).values_list("notification_type", flat=True)
+        self.assertCountEqual(types, ["welcome", "profile_reminder"])
+        self.assertEqual(backfill_welcome_notifications(), 0)
+
+    def test_written_once_per_status_transition(self):
+        order = Order.objects.create(user=self.user, shop=self.shop)
+        self.assertEqual(self.order_notifications(), [])
+
+        order.cloth_status = "Washing"
+        order.save()
+        order.special_instructions = "Cold wash"
+        order.save()
+        order.cloth_status = "Completed"
+        order.save()
+
+        self.assertEqual(self.order_notifications(), [
+            (order.id, "Washing", f"Order #{order.id} In Progress"),
+            (order.id, "Completed", f"Order #{order.id} Completed"),
+        ])
+
+    def test_backfill_fills_gaps_only(self):
+        notified = Order.objects.create(user=self.user, shop=self.shop, cloth_status="Ready")
+        silent = Order.objects.create(user=self.user, shop=self.shop)
+        # Simulate a row written before notifications existed
+        Order.objects.filter(pk=silent.pk).update(cloth_status="Completed")
+
+        self.assertEqual(backfill_order_notifications(), 1)
+        self.assertEqual(backfill_order_notifications(), 0)
+        self.assertCountEqual(
+            [(order_id, status) for order_id, status, _ in self.order_notifications()],
+            [(notified.id, "Ready"), (silent.id, "Completed")],
+        )
+
+    def test_dashboard_does_not_write_notifications(self):
+        Order.objects.create(user=self.user, shop=self.shop, cloth_status="Ready")
+        self.client.force_login(self.user)
+        count = Notification.objects.count()
+        self.client.get("/notifications/")
+        self.client.get("/dashboard/")
+        self.assertEqual(Notification.objects.count(), count)
+
+
+class OrderSweepTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("hal", "hal@example.com", "pw")
+        cls.shop = LaundryShop.objects.create(name="Sweep", email="sweep@example.com")
+
+    def order(self, **fields):
+        fields.setdefault("payment_status", "Completed")
+        fields.setdefault("delivery_date", timezone.now() - timezone.timedelta(hours=2))
+        return Order.objects.create(user=self.user, shop=self.shop, **fields)
+
+    def test_delayed_orders_notified_once(self):
+        late = [self.order(cloth_status="Washing") for _ in range(3)]
+        self.order(cloth_status="Completed")
+        self.order(payment_status="Pending")
+        self.order(delivery_date=timezone.now() + timezone.timedelta(days=1))
+
+        self.assertEqual(run_sweep("delayed", chunk_size=2), 3)
+        self.assertEqual(run_sweep("delayed"), 0)
+
+        ids = [order.id for order in late]
+        notified = Notification.objects.filter(notification_type="delay")
+        self.assertCountEqual(notified.values_list("order_id", flat=True), ids)
+        self.assertTrue(all(n.user_id == self.user.id for n in notified))
+        shop_rows = Notification.objects.filter(shop=self.shop, notification_type="shop_overdue")
+        self.assertCountEqual(shop_rows.values_list("order_id", flat=True), ids)
+        self.assertEqual(EmailOutbox.objects.filter(to=["hal@example.com"]).count(), 3)
+        self.assertEqual(set(Order.objects.filter(overdue_notification_sent=True).values_list("id", flat=True)), set(ids))
+
+    def test_chunk_cost_does_not_grow_with_orders(self):
+        for _ in range(5):
+            self.order()
+        # pick ids, read rows, two inserts and one update in a savepoint
+        with self.assertNumQueries(7):
+            self.assertEqual(run_sweep("delayed", chunk_size=10), 5)
+
+    def test_pending_orders_reach_the_shop(self):
+        new = self.order(delivery_date=None)
+        self.order(cloth_status="Washing", delivery_date=None)
+
+        self.assertEqual(run_sweep("pending"), 1)
+        self.assertEqual(run_sweep("pending"), 0)
+        titles = list(Notification.objects.filter(shop=self.shop).values_list("title", flat=True))
+        self.assertEqual(titles, [f"Pending Order #{new.id}"])
+
+    def test_command_runs_once(self):
+        self.order()
+        out = io.StringIO()
+        call_command("check_delayed_orders", "--once", stdout=out)
+        self.assertIn("Sweep delayed: 1 orders", out.getvalue())
+        self.assertIn("Sweep pending: 1 orders", out.getvalue())
+
+
+class SchedulerTests(TestCase):
+
+    def setUp(self):
+        self.calls = []
+        jobs = mock.patch.dict(JOBS, {"probe": (60, 300, lambda: self.calls.append(1))})
+        jobs.start()
+        self.addCleanup(jobs.stop)
+
+    def due(self, **fields):
+        ago = timezone.now() - timezone.timedelta(seconds=30)
+        return ScheduledJob.objects.create(name="probe", next_run_at=ago, **fields)
+
+    def test_due_job_runs_and_is_rescheduled_with_jitter(self):
+        self.due()
+        job = run_job("probe", node="a")
+
+        self.assertEqual(self.calls, [1])
+        self.assertEqual((job.runs, job.failures, job.locked_by, job.locked_until), (1, 0, "", None))
+        self.assertGreaterEqual(job.last_lag, 30)
+        self.assertIsNotNone(job.last_duration)
+        delay = (job.next_run_at - job.last_finished_at).total_seconds()
+        self.assertTrue(54 <= delay <= 66, delay)
+        # Not due again yet
+        self.assertIsNone(run_job("probe", node="b"))
+        self.assertEqual(self.calls, [1])
+
+    def test_leased_job_runs_on_one_node_only(self):
+        self.due(locked_by="a", locked_until=timezone.now() + timezone.timedelta(minutes=5))
+        self.assertIsNone(run_job("probe", node="b"))
+        self.assertEqual(self.calls, [])
+
+        # An expired lease (node died mid-run) is taken over
+        ScheduledJob.objects.filter(name="probe").update(locked_until=timezone.now())
+        self.assertIsNotNone(run_job("probe", node="b"))
+        self.assertEqual(self.calls, [1])
+
+    def test_failure_is_recorded_and_lease_released(self):
+        JOBS["probe"] = (60, 300, mock.Mock(side_effect=RuntimeError("boom")))
+        self.due()
+        with self.assertLogs("shop.utils.scheduler", "ERROR"):
+            job = run_job("probe", node="a")
+        self.assertEqual((job.runs, job.failures, job.last_error), (1, 1, "RuntimeError: boom"))
+        self.assertEqual(job.locked_by, "")
+
+    def test_ensure_jobs_keeps_existing_schedule(self):
+        existing = self.due()
+        ensure_jobs(["probe", "order_sweeps"])
+        self.assertEqual(ScheduledJob.objects.get(name="probe").next_run_at, existing.next_run_at)
+        self.assertTrue(ScheduledJob.objects.filter(name="order_sweeps").exists())
+
+    def test_command_runs_due_jobs_once(self):
+        self.due()
+        out = io.StringIO()
+        call_command("run_scheduler", "--once", "--job", "probe", stdout=out)
+        self.assertEqual(self.calls, [1])
+        self.assertIn("Job probe: ok", out.getvalue())
+
+
+class ExpiredTokenTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("ivy", "ivy@example.com", "pw")
+        cls.shop = LaundryShop.objects.create(name="Tokens", email="tokens@example.com")
+
+    def test_otp_is_upserted_per_user(self):
+        first = issue_password_reset_otp(self.user)
+        second = issue_password_reset_otp(self.user)
+        self.assertEqual(list(PasswordResetOTP.objects.values_list("otp", flat=True)), [second])
+        self.assertEqual(len(first), 6)
+
+    def test_concurrent_first_otp_updates_the_winner(self):
+        PasswordResetOTP.objects.create(user=self.user, otp="111111")
+        # The first update sees no row, as when a concurrent request
+        # inserts between this request's update and create
+        with mock.patch("django.db.models.query.QuerySet.update", side_effect=[0, 1]) as update:
+            issue_password_reset_otp(self.user)
+        self.assertEqual(update.call_count, 2)
+        self.assertEqual(PasswordResetOTP.objects.filter(user=self.user).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PasswordResetOTP.objects.create(user=self.user, otp="222222")
+
+    def test_verify_otp_accepts_only_the_latest_code(self):
+        old = issue_password_reset_otp(self.user)
+        new = issue_password_reset_otp(self.user)
+        session = self.client.session
+        session["reset_user_id"] = self.user.id
+        session.save()
+
+        if old != new:
+            self.client.post("/verify-otp/", {"otp": old})
+            self.assertNotIn("otp_verified", self.client.session)
+        self.client.post("/verify-otp/", {"otp": new})
+        self.assertTrue(self.client.session.get("otp_verified"))
+
+    def test_only_expired_rows_are_deleted(self):
+        now = timezone.now()
+        long_ago = now - timezone.timedelta(days=2)
+        issue_password_reset_otp(self.user)
+        stale_user = User.objects.create_user("jon", "jon@example.com", "pw")
+        issue_password_reset_otp(stale_user)
+        PasswordResetOTP.objects.filter(user=stale_user).update(created_at=long_ago)
+        ShopPasswordResetToken.objects.create(shop=self.shop, token="fresh")
+        for n in range(3):
+            ShopPasswordResetToken.objects.create(shop=self.shop, token=f"old-{n}", created_at=long_ago)
+        EmailVerificationToken.objects.create(user=self.user, token="live", expires_at=now + timezone.timedelta(days=1))
+        EmailVerificationToken.objects.create(user=stale_user, token="dead", expires_at=long_ago)
+
+        self.assertEqual(delete_expired_tokens(chunk_size=2), {
+            "password reset OTPs": 1, "shop reset tokens": 3, "email verification tokens": 1,
+        })
+        self.assertEqual(list(PasswordResetOTP.objects.values_list("user_id", flat=True)), [self.user.id])
+        self.assertEqual(list(ShopPasswordResetToken.objects.values_list("token", flat=True)), ["fresh"])
+        self.assertEqual(list(EmailVerificationToken.objects.values_list("token", flat=True)), ["live"])
+
+    def test_deletes_in_bounded_chunks(self):
+        long_ago = timezone.now() - timezone.timedelta(days=2)
+        for n in range(5):
+            ShopPasswordResetToken.objects.create(shop=self.shop, token=f"old-{n}", created_at=long_ago)
+        # three chunks of (select ids, delete), then the empty select
+        with self.assertNumQueries(7):
+            deleted = delete_in_chunks(ShopPasswordResetToken.objects.all(), chunk_size=2)
+        self.assertEqual(deleted, 5)
+
+
+class RevenueRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lee", "lee@example.com", "pw")
+        cls.shop = LaundryShop.objects.create(name="Rollup", email="rollup@example.com")
+        cls.branch = Branch.objects.create(shop=cls.shop, name="Main", address="-")
+
+    def buckets(self):
+        return list(
+            DailyShopRevenue.objects.filter(order_count__gt=0)
+            .order_by("branch_id", "payment_status", "cloth_status")
+            .values_list("branch_id", "payment_status", "cloth_status", "order_count", "revenue")
+        )
+
+    def test_saves_and_deletes_move_orders_between_buckets(self):
+        order = Order.objects.create(user=self.user, shop=self.shop, branch=self.branch, amount=Decimal("100"))
+        Order.objects.create(user=self.user, shop=self.shop, branch=self.branch, amount=Decimal("50"))
+        self.assertEqual(self.buckets(), [(self.branch.id, "Pending", "Pending", 2, Decimal("150"))])
+
+        order.payment_status = "Completed"
+        order.amount = Decimal("120")
+        order.save()
+        self.assertEqual(self.buckets(), [
+            (self.branch.id, "Completed", "Pending", 1, Decimal("120")),
+            (self.branch.id, "Pending", "Pending", 1, Decimal("50")),
+        ])
+
+        order.delete()
+        self.assertEqual(self.buckets(), [(self.branch.id, "Pending", "Pending", 1, Decimal("50"))])
+
+    def test_branchless_orders_share_one_bucket(self):
+        Order.objects.create(user=self.user, shop=self.shop, amount=Decimal("10"))
+        Order.objects.create(user=self.user, shop=self.shop, amount=Decimal("15"))
+        self.assertEqual(self.buckets(), [(None, "Pending", "Pending", 2, Decimal("25"))])
+
+        bucket = DailyShopRevenue.objects.get()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DailyShopRevenue.objects.create(
+                date=bucket.date, shop=self.shop, branch=None,
+                payment_status="Pending", cloth_status="Pending",
+            )
+
+    def test_deleted_branch_folds_into_branchless_bucket(self):
+        Order.objects.create(user=self.user, shop=self.shop, amount=Decimal("10"))
+        doomed = Branch.objects.create(shop=self.shop, name="Closing", address="-")
+        Order.objects.create(user=self.user, shop=self.shop, branch=doomed, amount=Decimal("30"))
+
+        doomed.delete()
+        self.assertEqual(self.buckets(), [(None, "Pending", "Pending", 2, Decimal("40"))])
+        self.assertEqual(rebuild_rollup(), 1)
+        self.assertEqual(self.buckets(), [(None, "Pending", "Pending", 2, Decimal("40"))])
+
+    def test_rebuild_matches_signal_totals(self):
+        for status, amount in (("Completed", "80"), ("Completed", "20"), ("Pending", "5")):
+            Order.objects.create(
+                user=self.user, shop=self.shop, branch=self.branch,
+                payment_status=status, amount=Decimal(amount),
+            )
+        Order.objects.create(user=self.user, shop=self.shop, amount=Decimal("7"))
+        maintained = self.buckets()
+
+        DailyShopRevenue.objects.update(order_count=99)
+        rebuild_rollup()
+        self.assertEqual(self.buckets(), maintained)
+
+    def test_reconcile_fixes_recent_drift_only(self):
+        order = Order.objects.create(user=self.user, shop=self.shop, branch=self.branch, amount=Decimal("40"))
+        old = Order.objects.create(user=self.user, shop=self.shop, branch=self.branch, amount=Decimal("9"))
+        Order.objects.filter(pk=old.pk).update(created_at=timezone.now() - timezone.timedelta(days=30))
+        # Queryset updates skip the signals that keep the rollup current
+        Order.objects.filter(pk=order.pk).update(payment_status="Completed")
+
+        self.assertEqual(reconcile_rollup(days=2), 2)
+        today = DailyShopRevenue.objects.filter(date=timezone.localdate(), order_count__gt=0)
+        self.assertEqual(
+            list(today.values_list("payment_status", "order_count", "revenue")),
+            [("Completed", 1, Decimal("40"))],
+        )
+        self.assertEqual(reconcile_rollup(days=2), 0)
+
+
+class MyOrdersTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("mo", "mo@example.com", "pw")
+        cls.shop = LaundryShop.objects.create(name="Orders", email="orders@example.com", is_approved=True)
+        cls.branch = Branch.objects.create(shop=cls.shop, name="Main", address="-")
+        cls.services = [Service.objects.create(branch=cls.branch, name=name) for name in ("Wash", "Iron", "Fold")]
+        cls.cloth = Cloth.objects.create(name="Shirt")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def add_orders(self, count, items):
+        for _ in range(count):
+            order = Order.objects.create(user=self.user, shop=self.shop, branch=self.branch)
+            for service in self.services[:items]:
+                OrderItem.objects.create(order=order, service=service, cloth=self.cloth, quantity=1)
+
+    def test_query_count_does_not_grow_with_orders_or_items(self):
+        self.add_orders(1, items=1)
+        save_rating(self.user, self.services[0], 5)
+        # The first request sets up the session
+        self.client.get("/orders/")
+        with CaptureQueriesContext(connection) as small:
+            self.client.get("/orders/")
+
+        self.add_orders(6, items=3)
+        with self.assertNumQueries(len(small)):
+            response = self.client.get("/orders/")
+        ratings = {
+            item.service_id: item.service_rating
+            for order in response.context["orders"] for item in order.order_items.all()
+        }
+        self.assertEqual(ratings[self.services[0].id].rating, 5)
+        self.assertIsNone(ratings[self.services[1].id])
+
+    def test_cursor_pages_with_equal_timestamps(self):
+        self.add_orders(45, items=0)
+        Order.objects.update(created_at=timezone.now())
+
+        seen, cursor = [], None
+        while True:
+            response = self.client.get("/orders/", {"cursor": cursor} if cursor else {})
+            seen.extend(order.id for order in response.context["orders"])
+            cursor = response.context["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(seen, list(Order.objects.order_by("-id").values_list("id", flat=True)))
+
+    def test_bad_cursor_shows_the_first_page(self):
+        self.add_orders(3, items=1)
+        for cursor in ("not-a-cursor", "WyJ4Il0", "W10"):
+            response = self.client.get("/orders/", {"cursor": cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context["orders"]), 3)
+
+
+class DashboardStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("dee", "dee@example.com", "pw")
+        cls.shop = LaundryShop.objects.create(name="Stats", email="stats@example.com", is_approved=True)
+        cls.branch = Branch.objects.create(shop=cls.shop, name="Main", address="-")
+        cls.today = timezone.localdate()
+        for days_ago, status, amount in ((0, "Completed", "100"), (3, "Completed", "50"), (0, "Pending", "30")):
+            order = Order.objects.create(
+                user=cls.user, shop=cls.shop, branch=cls.branch, payment_status=status, amount=Decimal(amount),
+            )
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timezone.timedelta(days=days_ago))
+        rebuild_rollup()
+
+    def test_query_count_does_not_grow_with_the_range(self):
+        for range_days in (7, 30, 90):
+            with self.assertNumQueries(5):
+                stats = admin_dashboard_stats(range_days=range_days, today=self.today)
+            self.assertEqual(len(stats["chart_labels"]), range_days)
+
+    def test_series_is_zero_filled_and_counts_paid_orders(self):
+        stats = admin_dashboard_stats(range_days=7, today=self.today)
+        self.assertEqual(stats["revenue_chart_data"], [0.0, 0.0, 0.0, 50.0, 0.0, 0.0, 100.0])
+        self.assertEqual(stats["orders_chart_data"], [0, 0, 0, 1, 0, 0, 1])
+        self.assertEqual(stats["chart_labels"][-1], self.today.strftime("%b %d"))
+        self.assertEqual(stats["today_revenue"], 100.0)
+        self.assertEqual((stats["total_orders"], stats["total_revenue"]), (2, Decimal("150")))
+        self.assertEqual(stats["status_counts"], {"Pending": 2})
+
+    def get_shop_dashboard(self):
+        session = self.client.session
+        session["shop_id"] = self.shop.id
+        session.save()
+        response = self.client.get("/shop/dashboard/")
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_shop_dashboard_queries_do_not_grow_with_branches(self):
+        # The first request creates the session row
+        self.get_shop_dashboard()
+        with CaptureQueriesContext(connection) as one_branch:
+            self.get_shop_dashboard()
+
+        for n in range(4):
+            branch = Branch.objects.create(shop=self.shop, name=f"Branch {n}", address="-")
+            Service.objects.create(branch=branch, name="Wash")
+            Order.objects.create(user=self.user, shop=self.shop, branch=branch, payment_status="Completed")
+            save_rating(self.user, branch, 4)
+        with self.assertNumQueries(len(one_branch)):
+            self.get_shop_dashboard()
+
+    def test_branch_figures_match_per_branch_queries(self):
+        other = Branch.objects.create(shop=self.shop, name="Second", address="-")
+        for status, cloth_status, amount in (
+            ("Completed", "Pending", "20"), ("Completed", "Completed", "40"), ("Pending", "Pending", "10"),
+        ):
+            Order.objects.create(
+                user=self.user, shop=self.shop, branch=other,
+                payment_status=status, cloth_status=cloth_status, amount=Decimal(amount),
+            )
+        save_rating(self.user, other, 4)
+        save_rating(User.objects.create_user("eve", "eve@example.com", "pw"), other, 1)
+
+        stats = self.get_shop_dashboard().context["branch_stats"]
+        self.assertEqual([row["branch"] for row in stats], [self.branch, other])
+        for row in stats:
+            # What the dashboard used to query branch by branch
+            paid = Order.objects.filter(branch=row["branch"], payment_status="Completed")
+            ratings = ServiceRating.objects.filter(branch=row["branch"])
+            self.assertEqual(
+                (row["total_orders"], row["pending_orders"], row["completed_orders"], row["revenue"]),
+                (
+                    paid.count(),
+                    paid.filter(cloth_status="Pending").count(),
+                    paid.filter(cloth_status="Completed").count(),
+                    paid.aggregate(total=Sum("amount"))["total"] or 0,
+                ),
+            )
+            self.assertEqual(row["total_ratings"], ratings.count())
+            self.assertAlmostEqual(row["average_rating"], ratings.aggregate(avg=Avg("rating"))["avg"] or 0)
+
+
+class EmailOutboxTests(TestCase):
+
+    def queue(self, **fields):
+        row = queue_email("Hello", "Body", None, ["to@example.com"])
+        if fields:
+            EmailOutbox.objects.filter(pk=row.pk).update(**fields)
+            row.refresh_from_db()
+        return row
+
+    def failing_send(self, error=None):
+        return mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=error or ConnectionResetError("connection reset"),
+        )
+
+    def test_sent_rows_are_marked(self):
+        row = self.queue()
+        self.assertEqual(drain_outbox(), (1, 0))
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), ("Sent", 1))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(drain_outbox(), (0, 0))
+
+    def test_failures_back_off_exponentially(self):
+        row = self.queue()
+        for attempt, delay in ((1, 60), (2, 120), (3, 240)):
+            before = timezone.now()
+            with self.failing_send():
+                self.assertEqual(drain_outbox(), (0, 1))
+            row.refresh_from_db()
+            self.assertEqual((row.status, row.attempts, row.claimed_at), ("Pending", attempt, None))
+            self.assertIn("ConnectionResetError", row.last_error)
+            wait = (row.next_attempt_at - before).total_seconds()
+            self.assertTrue(delay <= wait < delay + 5, wait)
+
+            # Not due yet, so a drain leaves it alone
+            self.assertEqual(drain_outbox(), (0, 0))
+            EmailOutbox.objects.filter(pk=row.pk).update(next_attempt_at=timezone.now())
+
+    def test_dead_after_max_attempts(self):
+        row = self.queue(attempts=MAX_ATTEMPTS - 1)
+        with self.failing_send():
+            drain_outbox()
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), ("Dead", MAX_ATTEMPTS))
+        self.assertEqual(drain_outbox(), (0, 0))
+
+    def test_permanent_errors_are_not_retried(self):
+        row = self.queue()
+        refused = smtplib.SMTPRecipientsRefused({"to@example.com": (550, b"no such user")})
+        with self.failing_send(refused):
+            drain_outbox()
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), ("Dead", 1))
+
+    def test_claims_skip_rows_other_workers_hold(self):
+        held = self.queue(status="Sending", claimed_at=timezone.now())
+        stale = self.queue(status="Sending", claimed_at=timezone.now() - timezone.timedelta(hours=1))
+        self.assertEqual(drain_outbox(), (1, 0))
+        held.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertEqual((held.status, stale.status), ("Sending", "Sent"))
+
+    def assert_status_change_rolls_back(self, url, order, data):
+        calls = []
+
+        def queue_then_fail(*args, **kwargs):
+            # The first email is queued for real, the next one blows up
+            calls.append(args)
+            if len(calls) > 1:
+                raise RuntimeError("outbox insert failed")
+            return queue_email(*args, **kwargs)
+
+        notifications = Notification.objects.count()
+        with mock.patch("shop.views.queue_email", side_effect=queue_then_fail), \
+                self.assertRaises(RuntimeError), self.assertLogs("django.request", "ERROR"):
+            self.client.post(url, data)
+
+        order.refresh_from_db()
+        self.assertEqual(len(calls), 2)
+        self.assertEqual((order.cloth_status, order.shop), ("Pending", self.shop))
+        self.assertEqual(Notification.objects.count(), notifications)
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def order_setup(self):
+        self.shop = LaundryShop.objects.create(name="Outbox", email="outbox@example.com", is_approved=True)
+        self.staff = User.objects.create_user("root", "root@example.com", "pw", is_staff=True)
+        customer = User.objects.create_user("ola", "ola@example.com", "pw")
+        return Order.objects.create(user=customer, shop=self.shop, payment_status="Completed")
+
+    def test_shop_status_update_rolls_back_with_its_emails(self):
+        order = self.order_setup()
+        session = self.client.session
+        session["shop_id"] = self.shop.id
+        session.save()
+        self.assert_status_change_rolls_back(
+            f"/shop/order/{order.id}/update-status/", order, {"status": "Ready"}
+        )
+
+    def test_admin_status_update_rolls_back_with_its_emails(self):
+        order = self.order_setup()
+        other = LaundryShop.objects.create(name="Other", email="other@example.com", is_approved=True)
+        self.client.force_login(self.staff)
+        self.assert_status_change_rolls_back(
+            f"/admin-panel/order/{order.id}/update-status/", order, {"status": "Ready", "shop_id": other.id}
+        )
+
+
+class CreateOrderQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("nia", "nia@example.com", "pw")
+        cls.shop = LaundryShop.objects.create(name="Cart", email="cart@example.com", is_approved=True)
+        cls.branch = Branch.objects.create(shop=cls.shop, name="Main", address="-")
+        cls.services = [Service.objects.create(branch=cls.branch, name=name) for name in ("Wash", "Iron")]
+        cls.cloths = [Cloth.objects.create(name=name) for name in ("Shirt", "Saree", "Towel")]
+        for cloth in cls.cloths:
+            BranchCloth.objects.create(branch=cls.branch, cloth=cloth)
+            for service in cls.services:
+                ServiceClothPrice.objects.create(service=service, cloth=cloth, price=10)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = f"/shop/{self.shop.id}/branch/{self.branch.id}/create-order/"
+
+    def cart(self, services, cloths):
+        data = {"selected_services": [s.id for s in services]}
+        for service in services:
+            data[f"clothes_{service.id}"] = [c.id for c in cloths]
+            for cloth in cloths:
+                data[f"quantity_{service.id}_{cloth.id}"] = 2
+        return data
+
+    def test_query_count_does_not_grow_with_the_cart(self):
+        # Warm the catalog cache, and create today's revenue bucket and the
+        # branch load row, so every measured order takes the same path
+        get_branch_catalog(self.branch)
+        self.client.post(self.url, self.cart(self.services[:1], self.cloths[:1]))
+        for services, cloths in (
+            (self.services[:1], self.cloths[:1]),
+            (self.services, self.cloths),
+        ):
+            with self.assertNumQueries(17):
+                response = self.client.post(self.url, self.cart(services, cloths))
+            self.assertEqual(response.status_code, 302)
+
+        order = Order.objects.latest("id")
+        self.assertEqual(order.order_items.count(), 6)
+        self.assertEqual(order.base_amount, Decimal("120"))
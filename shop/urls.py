@@ -41,6 +41,7 @@ urlpatterns = [
         path("notifications/", views.notifications_view, name="notifications"),
         path("notifications/<int:notification_id>/mark-read/", views.mark_notification_read, name="mark_notification_read"),
         path("orders/", views.my_orders, name="orders"),
+        path("orders/<int:order_id>/receipt/", views.download_receipt, name="download_receipt"),
         path("billing/", views.billing_payments, name="billing"),
 
         # ADMIN DASHBOARD
@@ -50,6 +51,7 @@ urlpatterns = [
         path("admin-panel/orders/filter/", views.admin_orders_filter, name="admin_orders_filter"),
         path("admin-panel/orders/revenue/", views.admin_revenue_orders, name="admin_revenue_orders"),
         path("admin-panel/payments/", views.admin_payments, name="admin_payments"),
+        path("admin-panel/orders/export/", views.admin_export_orders, name="admin_export_orders"),
         path("admin-panel/shops/", views.admin_shops, name="admin_shops"),
         path("admin-panel/shops/open/", views.admin_open_shops, name="admin_open_shops"),
         path("admin-panel/shop/<int:shop_id>/approve/", views.admin_approve_shop, name="admin_approve_shop"),
@@ -73,6 +75,7 @@ urlpatterns = [
         path('shop/branch/<int:branch_id>/delete/', views.delete_branch, name='delete_branch'),
         path("update-live-location/", views.update_live_location, name="update_live_location"),
         path("update-location/", views.update_location, name="update_location"),
+        path("api/nearby-branches/", views.nearby_branches_api, name="nearby_branches_api"),
         path('admin-panel/mark-notifications-read/', views.mark_admin_notifications_read, name='mark_admin_notifications_read'),
         # Service: can pass branch_id to auto-attach after create
         path('shop/service/add/<int:branch_id>/', views.add_service, name='add_service'),
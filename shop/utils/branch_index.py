@@ -0,0 +1,137 @@
+"""
+Process-local spatial index over orderable branches.
+
+Optional fast path for "shops near me": coordinates live in NumPy arrays
+bucketed into a lat/lng grid, so a k-nearest query is a handful of slice
+lookups plus one vectorized haversine and never touches the database.
+Each process rebuilds its copy when the branch index version (bumped by
+shop.signals on Branch/LaundryShop changes) moves.
+"""
+import math
+import threading
+import time
+
+import numpy as np
+
+from shop.utils.catalog import catalog_version
+from shop.utils.geo import DEFAULT_RADIUS_KM, EARTH_RADIUS_KM, bounding_box, orderable_branches
+
+BRANCH_INDEX_SCOPE = "branch_index"
+CELL_DEGREES = 0.25
+# How often (seconds) a process asks the cache whether branches changed
+VERSION_CHECK_INTERVAL = 2.0
+
+
+class BranchIndex:
+
+    def __init__(self, rows):
+        # rows: (id, name, city, shop_id, shop_name, latitude, longitude)
+        rows = sorted(rows, key=lambda row: self.cell(row[5], row[6]))
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.info = [
+            {"branch_id": row[0], "branch_name": row[1], "city": row[2],
+             "shop_id": row[3], "shop_name": row[4]}
+            for row in rows
+        ]
+        lat = np.array([row[5] for row in rows], dtype=np.float64)
+        lng = np.array([row[6] for row in rows], dtype=np.float64)
+        self.lat = np.radians(lat)
+        self.lng = np.radians(lng)
+        self.cos_lat = np.cos(self.lat)
+
+        # cell -> (start, end) into the cell-sorted arrays
+        self.cells = {}
+        for position, row in enumerate(rows):
+            key = self.cell(row[5], row[6])
+            start, _ = self.cells.get(key, (position, position))
+            self.cells[key] = (start, position + 1)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def cell(lat, lng):
+        return (math.floor(lat / CELL_DEGREES), math.floor(lng / CELL_DEGREES))
+
+    def _candidates(self, lat, lng, radius_km):
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+        if min_lng is None:
+            return None
+
+        lat_cells = range(math.floor(min_lat / CELL_DEGREES), math.floor(max_lat / CELL_DEGREES) + 1)
+        lng_cells = range(math.floor(min_lng / CELL_DEGREES), math.floor(max_lng / CELL_DEGREES) + 1)
+        if len(lat_cells) * len(lng_cells) > len(self.cells):
+            return None  # cheaper to scan everything
+
+        spans = [
+            self.cells[(i, j)]
+            for i in lat_cells for j in lng_cells
+            if (i, j) in self.cells
+        ]
+        if not spans:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate([np.arange(start, end) for start, end in spans])
+
+    def nearest(self, lat, lng, k=10, radius_km=DEFAULT_RADIUS_KM):
+        """Up to k nearest branches within radius_km as dicts with distance_km."""
+        if not len(self):
+            return []
+
+        positions = self._candidates(lat, lng, radius_km)
+        if positions is None:
+            positions = np.arange(len(self))
+        if not len(positions):
+            return []
+
+        lat_r, lng_r = math.radians(lat), math.radians(lng)
+        a = (
+            np.sin((self.lat[positions] - lat_r) / 2) ** 2
+            + math.cos(lat_r) * self.cos_lat[positions]
+            * np.sin((self.lng[positions] - lng_r) / 2) ** 2
+        )
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+        within = distances <= radius_km
+        positions, distances = positions[within], distances[within]
+        if len(positions) > k:
+            top = np.argpartition(distances, k - 1)[:k]
+            positions, distances = positions[top], distances[top]
+        order = np.lexsort((self.ids[positions], distances))
+
+        return [
+            {**self.info[positions[i]], "distance_km": float(distances[i])}
+            for i in order
+        ]
+
+
+def build_branch_index():
+    rows = (
+        orderable_branches()
+        .filter(latitude__isnull=False, longitude__isnull=False)
+        .values_list("id", "name", "city", "shop_id", "shop__name", "latitude", "longitude")
+    )
+    return BranchIndex(list(rows))
+
+
+_lock = threading.Lock()
+_state = {"index": None, "version": None, "checked_at": 0.0}
+
+
+def get_branch_index():
+    """This process's index, rebuilt if branches changed since it was built."""
+    now = time.monotonic()
+    if _state["index"] is not None and now - _state["checked_at"] < VERSION_CHECK_INTERVAL:
+        return _state["index"]
+
+    with _lock:
+        version = catalog_version(BRANCH_INDEX_SCOPE)
+        if _state["index"] is None or version != _state["version"]:
+            _state["index"] = build_branch_index()
+            _state["version"] = version
+        _state["checked_at"] = time.monotonic()
+        return _state["index"]
+
+
+def reset_branch_index():
+    with _lock:
+        _state.update(index=None, version=None, checked_at=0.0)
@@ -0,0 +1,99 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from shop.models import BranchLoad, Order
+
+
+def _in_flight_branch(snapshot):
+    """Branch id an order snapshot counts towards, or None."""
+    if snapshot is None:
+        return None
+    bucket = snapshot[0]
+    branch_id, cloth_status = bucket[2], bucket[4]
+    if branch_id is None or cloth_status not in Order.IN_PROGRESS_STATUSES:
+        return None
+    return branch_id
+
+
+def _apply(branch_id, delta):
+    updated = BranchLoad.objects.filter(branch_id=branch_id).update(
+        in_flight=F("in_flight") + delta
+    )
+    if updated or delta <= 0:
+        return
+
+    try:
+        with transaction.atomic():
+            BranchLoad.objects.create(branch_id=branch_id, in_flight=delta)
+    except IntegrityError:
+        # Another request created the row first
+        BranchLoad.objects.filter(branch_id=branch_id).update(
+            in_flight=F("in_flight") + delta
+        )
+
+
+def record_load_change(old, new):
+    """
+    Adjust branch counters for an order moving between the revenue
+    rollup snapshots `old` and `new` (see shop.utils.revenue).
+    """
+    old_branch = _in_flight_branch(old)
+    new_branch = _in_flight_branch(new)
+    if old_branch == new_branch:
+        return
+
+    if old_branch is not None:
+        _apply(old_branch, -1)
+    if new_branch is not None:
+        _apply(new_branch, 1)
+
+
+def branch_load(branch):
+    """In-progress order count for a branch: a single primary-key read."""
+    value = (
+        BranchLoad.objects
+        .filter(branch_id=getattr(branch, "pk", branch))
+        .values_list("in_flight", flat=True)
+        .first()
+    )
+    return max(value or 0, 0)
+
+
+def branch_loads(branches):
+    """{branch_id: in-progress count} for several branches in one query."""
+    ids = [getattr(branch, "pk", branch) for branch in branches]
+    rows = BranchLoad.objects.filter(branch_id__in=ids).values_list("branch_id", "in_flight")
+    loads = {branch_id: max(value, 0) for branch_id, value in rows}
+    return {branch_id: loads.get(branch_id, 0) for branch_id in ids}
+
+
+def reconcile_branch_loads():
+    """
+    Reset every counter from the orders table. Returns the branch ids
+    whose stored count had drifted.
+    """
+    with transaction.atomic():
+        # Lock the counters first so saves that land meanwhile wait for us
+        stored = dict(
+            BranchLoad.objects.select_for_update().values_list("branch_id", "in_flight")
+        )
+        actual = dict(
+            Order.objects
+            .filter(branch__isnull=False, cloth_status__in=Order.IN_PROGRESS_STATUSES)
+            .values("branch_id")
+            .annotate(count=Count("id"))
+            .order_by()
+            .values_list("branch_id", "count")
+        )
+        drifted = [
+            branch_id
+            for branch_id in set(actual) | set(stored)
+            if actual.get(branch_id, 0) != stored.get(branch_id, 0)
+        ]
+        for branch_id in drifted:
+            BranchLoad.objects.update_or_create(
+                branch_id=branch_id,
+                defaults={"in_flight": actual.get(branch_id, 0)},
+            )
+
+    return sorted(drifted)
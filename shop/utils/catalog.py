@@ -0,0 +1,184 @@
+import hashlib
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from shop.models import Branch, BranchCloth, LaundryShop, Service, ServiceClothPrice
+
+CATALOG_TIMEOUT = 60 * 60
+
+# Catalog data (shops, branches, services, cloth prices) is cached under
+# keys that embed a per-shop version number. Writes never delete cache
+# entries; shop.signals bumps the version instead, so every key built
+# afterwards is new and stale entries simply age out. Listings that span
+# shops use the global version, which moves on every bump.
+GLOBAL = "all"
+
+
+def _version_key(scope):
+    return f"catalog:version:{scope}"
+
+
+def catalog_version(scope):
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock rather than 1 so an evicted counter can
+        # never come back as a version that already has stale entries.
+        cache.add(key, time.time_ns())
+        version = cache.get(key)
+    return version
+
+
+def bump_version(scope):
+    key = _version_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def bump_catalog_version(shop_id):
+    for scope in (shop_id, GLOBAL):
+        bump_version(scope)
+
+
+def cached_fragment(scope, name, build, timeout=CATALOG_TIMEOUT):
+    """Return the cached value of build() for the current version of `scope`."""
+    key = f"catalog:{scope}:v{catalog_version(scope)}:{name}"
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout)
+    return value
+
+
+class BranchCatalog:
+    """
+    What a branch sells: its services, the cloths each one accepts at
+    this branch and their prices. Backed by plain JSON-friendly data so
+    it can be cached as-is.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self._services = {service["id"]: service for service in data["services"]}
+        self._prices = {
+            (service["id"], cloth["id"]): cloth
+            for service in data["services"]
+            for cloth in service["cloths"]
+        }
+
+    @property
+    def branch_id(self):
+        return self.data["branch_id"]
+
+    @property
+    def services(self):
+        return self.data["services"]
+
+    def service(self, service_id):
+        return self._services.get(service_id)
+
+    def cloth(self, service_id, cloth_id):
+        """{"id", "name", "price"} if the branch offers this cloth for the service."""
+        return self._prices.get((service_id, cloth_id))
+
+    def price(self, service_id, cloth_id):
+        cloth = self.cloth(service_id, cloth_id)
+        return Decimal(cloth["price"]) if cloth else None
+
+    def service_clothes(self):
+        """{service_id: [cloth, ...]} as select_services.html expects it."""
+        return {service["id"]: service["cloths"] for service in self.services}
+
+    def cloth_prices(self):
+        """{service_id: {cloth_id: float price}} for the page's JavaScript."""
+        return {
+            service["id"]: {cloth["id"]: float(cloth["price"]) for cloth in service["cloths"]}
+            for service in self.services
+        }
+
+
+def build_branch_catalog(branch_id):
+    """Build the catalog for one branch from three queries."""
+    services = list(
+        Service.objects
+        .filter(branch_id=branch_id)
+        .order_by("id")
+        .values("id", "name", "price")
+    )
+
+    available = set(
+        BranchCloth.objects
+        .filter(branch_id=branch_id)
+        .values_list("cloth_id", flat=True)
+    )
+
+    by_service = {}
+    for service in services:
+        service["price"] = str(service["price"]) if service["price"] is not None else None
+        service["cloths"] = by_service.setdefault(service["id"], [])
+
+    prices = (
+        ServiceClothPrice.objects
+        .filter(service__branch_id=branch_id, cloth_id__in=available)
+        .order_by("id")
+        .values_list("service_id", "cloth_id", "cloth__name", "price")
+    )
+    for service_id, cloth_id, cloth_name, price in prices:
+        by_service[service_id].append({
+            "id": cloth_id,
+            "name": cloth_name,
+            "price": str(price),
+        })
+
+    return BranchCatalog({"branch_id": branch_id, "services": services})
+
+
+def get_branch_catalog(branch):
+    data = cached_fragment(
+        branch.shop_id,
+        f"branch:{branch.id}:catalog",
+        lambda: build_branch_catalog(branch.id).data,
+    )
+    return BranchCatalog(data)
+
+
+def shop_branches(shop):
+    """A shop's branches with their services prefetched."""
+    return cached_fragment(
+        shop.id,
+        "branches",
+        lambda: list(Branch.objects.filter(shop=shop).prefetch_related("services")),
+    )
+
+
+def shop_services(shop):
+    return cached_fragment(
+        shop.id,
+        "services",
+        lambda: list(Service.objects.filter(branch__shop=shop).select_related("branch")),
+    )
+
+
+def branch_services(branch):
+    return cached_fragment(
+        branch.shop_id,
+        f"branch:{branch.id}:services",
+        lambda: list(Service.objects.filter(branch=branch)),
+    )
+
+
+def approved_shops_in_city(city, limit=10):
+    """(first `limit` approved shops with a branch in `city`, total count)."""
+    def build():
+        shops = LaundryShop.objects.filter(is_approved=True)
+        if city:
+            shops = shops.filter(branches__city__iexact=city)
+        shops = shops.distinct()
+        return list(shops[:limit]), shops.count()
+
+    city_key = hashlib.md5((city or "").lower().encode()).hexdigest()
+    return cached_fragment(GLOBAL, f"approved_shops:{city_key}:{limit}", build)
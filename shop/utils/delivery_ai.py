@@ -1,6 +1,18 @@
-import pickle
-import pandas as pd
+import logging
 import os
+import pickle
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
 
 BASE_DIR = os.path.dirname(
     os.path.dirname(
@@ -9,15 +21,195 @@ BASE_DIR = os.path.dirname(
 )
 
 MODEL_PATH = os.path.join(BASE_DIR, "ml", "delivery_model.pkl")
+# NumPy export of the same model; see shop.utils.delivery_forest
+COMPILED_MODEL_PATH = os.path.join(BASE_DIR, "ml", "delivery_model.npz")
+
+
+def _max_rss_kb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _load_compiled(path):
+    from shop.utils.delivery_forest import CompiledForest, compile_pipeline
+
+    if os.path.exists(path):
+        return CompiledForest.load(path)
+    # No export yet: build it from the sklearn pipeline.
+    return compile_pipeline(_load_pickle(MODEL_PATH))
+
+
+class ModelRegistry:
+    """
+    Loads the delivery model on first use instead of at import time.
+
+    Web workers that never create an order never pay for loading it.
+    Calling preload() in the gunicorn master (with --preload) loads it
+    once before forking so workers share the pages copy-on-write.
+    """
+
+    def __init__(self, path, loader=_load_pickle):
+        self.path = path
+        self.loader = loader
+        self._model = None
+        self._lock = threading.Lock()
+        self.load_seconds = None
+        self.rss_delta_kb = None
+        self.loaded_at = None
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def get(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def _load(self):
+        rss_before = _max_rss_kb()
+        started = time.perf_counter()
+
+        model = self.loader(self.path)
+
+        self.load_seconds = time.perf_counter() - started
+        rss_after = _max_rss_kb()
+        if rss_before is not None and rss_after is not None:
+            self.rss_delta_kb = rss_after - rss_before
+        self.loaded_at = time.time()
+
+        logger.info(
+            "Loaded delivery model from %s in %.3fs (max RSS +%s KB, pid %s)",
+            self.path, self.load_seconds, self.rss_delta_kb, os.getpid()
+        )
+        return model
+
+    def info(self):
+        return {
+            "path": self.path,
+            "loaded": self.loaded,
+            "load_seconds": self.load_seconds,
+            "rss_delta_kb": self.rss_delta_kb,
+            "loaded_at": self.loaded_at,
+            "pid": os.getpid(),
+        }
+
+
+# The sklearn pipeline, kept for retraining checks and parity tests.
+registry = ModelRegistry(MODEL_PATH)
+# What predictions actually use: plain NumPy arrays, no pandas/sklearn.
+compiled_registry = ModelRegistry(COMPILED_MODEL_PATH, loader=_load_compiled)
+
+
+def preload():
+    """Load the model now (e.g. in the gunicorn master) and return its stats."""
+    compiled_registry.get()
+    return compiled_registry.info()
 
-with open(MODEL_PATH, "rb") as f:
-    model = pickle.load(f)
 
 def predict_delivery_hours(cloth, service, branch_load, items):
+    hours = compiled_registry.get().predict_one(cloth, service, branch_load, items)
+    return int(round(hours))
+
+
+def _combine(hours, quantities, starts, combine):
+    if combine == "max":
+        return np.maximum.reduceat(hours, starts)
+    if combine == "weighted":
+        weighted = np.add.reduceat(hours * quantities, starts)
+        return weighted / np.add.reduceat(quantities, starts)
+    raise ValueError(f"Unknown combine mode: {combine!r}")
+
+
+def predict_orders_hours(orders, combine="max"):
+    """
+    Score many orders with one model call.
+
+    orders: list of (lines, branch_load) where lines is a list of
+    (cloth, service, quantity). Every line is scored with the order's
+    total item count, then lines are combined per order: "max" (the
+    slowest line decides) or "weighted" (mean weighted by quantity).
+    Returns one int hour estimate per order, in the same order.
+    """
+    rows = []
+    quantities = []
+    starts = []
+    for lines, branch_load in orders:
+        if not lines:
+            raise ValueError("Cannot predict delivery for an order without items")
+        starts.append(len(rows))
+        total_items = sum(quantity for _, _, quantity in lines)
+        for cloth, service, quantity in lines:
+            rows.append((cloth, service, branch_load, total_items))
+            quantities.append(quantity)
+
+    if not rows:
+        return []
+
+    hours = compiled_registry.get().predict(rows)
+    combined = _combine(hours, np.asarray(quantities, dtype=np.float64), starts, combine)
+    return [int(round(h)) for h in combined]
+
+
+def predict_delivery_hours_batch(lines, branch_load, combine="max"):
+    """Order-level estimate from all of its (cloth, service, quantity) lines."""
+    return predict_orders_hours([(lines, branch_load)], combine=combine)[0]
+
+
+def rescore_branch_orders(branch, combine="max"):
+    """
+    Recompute predicted_delivery for every in-flight order of `branch`
+    against its current load, using one query for the lines, one model
+    call and one bulk update. Returns the number of orders updated.
+    """
+    from shop.models import Order, OrderItem
+
+    orders = {
+        order.id: order
+        for order in Order.objects.filter(
+            branch=branch, cloth_status__in=Order.IN_PROGRESS_STATUSES
+        ).only("id", "created_at", "predicted_delivery")
+    }
+    if not orders:
+        return 0
+
+    lines = {}
+    for order_id, cloth, service, quantity in (
+        OrderItem.objects
+        .filter(order_id__in=orders)
+        .values_list("order_id", "cloth__name", "service__name", "quantity")
+    ):
+        lines.setdefault(order_id, []).append((cloth, service, quantity))
+
+    # Each order waits behind the other in-flight orders, which is the
+    # load create_order saw before it was saved.
+    branch_load = len(orders) - 1
+    scored = [orders[order_id] for order_id in lines]
+    hours = predict_orders_hours(
+        [(lines[order.id], branch_load) for order in scored], combine=combine
+    )
+
+    for order, order_hours in zip(scored, hours):
+        order.predicted_delivery = order.created_at + timedelta(hours=order_hours)
+    Order.objects.bulk_update(scored, ["predicted_delivery"], batch_size=500)
+    return len(scored)
+
+
+def predict_delivery_hours_sklearn(cloth, service, branch_load, items):
+    import pandas as pd
+
     df = pd.DataFrame([{
         "cloth": cloth,
         "service": service,
         "branch_load": branch_load,
         "items": items
     }])
-    return int(round(model.predict(df)[0]))
+    return int(round(registry.get().predict(df)[0]))
@@ -0,0 +1,159 @@
+"""
+NumPy-only evaluator for the delivery-time pipeline.
+
+The sklearn pipeline is OneHotEncoder(cloth, service) + passthrough
+(branch_load, items) feeding a RandomForestRegressor. compile_pipeline()
+flattens it into a category-to-column map and one padded node array per
+tree attribute, so predicting needs neither pandas nor sklearn.
+"""
+import numpy as np
+
+CAT_COLUMNS = ("cloth", "service")
+NUM_COLUMNS = ("branch_load", "items")
+COLUMNS = CAT_COLUMNS + NUM_COLUMNS
+
+
+class CompiledForest:
+
+    def __init__(self, categories, n_features, depth, left, right, feature, threshold, value):
+        # categories: {column: {value: feature index}}
+        self.categories = categories
+        self.n_features = int(n_features)
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.num_offset = sum(len(v) for v in categories.values())
+        # Leaves point at themselves, so `depth` steps from the root
+        # always lands every tree on a leaf.
+        self.depth = int(depth)
+        self._tree_rows = np.arange(left.shape[0])[:, None]
+
+    # ---------- encoding ----------
+
+    def encode(self, rows):
+        """
+        rows: sequence or 2-D array of (cloth, service, branch_load, items).
+        Returns the float32 feature matrix sklearn would build. Unknown
+        categories encode as all zeros, like handle_unknown="ignore".
+        """
+        rows = np.asarray(rows, dtype=object)
+        if rows.ndim == 1:
+            rows = rows[None, :]
+
+        X = np.zeros((rows.shape[0], self.n_features), dtype=np.float32)
+        for col, name in enumerate(CAT_COLUMNS):
+            column = rows[:, col]
+            for value, index in self.categories[name].items():
+                X[column == value, index] = 1.0
+        for col, name in enumerate(NUM_COLUMNS):
+            X[:, self.num_offset + col] = rows[:, len(CAT_COLUMNS) + col].astype(np.float32)
+        return X
+
+    # ---------- evaluation ----------
+
+    def predict_encoded(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        samples = np.arange(X.shape[0])[None, :]
+        trees = self._tree_rows
+        node = np.zeros((self.left.shape[0], X.shape[0]), dtype=np.intp)
+
+        for _ in range(self.depth):
+            go_left = X[samples, self.feature[trees, node]] <= self.threshold[trees, node]
+            node = np.where(go_left, self.left[trees, node], self.right[trees, node])
+
+        return self.value[trees, node].mean(axis=0)
+
+    def predict(self, rows):
+        return self.predict_encoded(self.encode(rows))
+
+    def predict_one(self, cloth, service, branch_load, items):
+        X = np.zeros((1, self.n_features), dtype=np.float32)
+        for name, value in zip(CAT_COLUMNS, (cloth, service)):
+            index = self.categories[name].get(value)
+            if index is not None:
+                X[0, index] = 1.0
+        X[0, self.num_offset] = branch_load
+        X[0, self.num_offset + 1] = items
+        return float(self.predict_encoded(X)[0])
+
+    # ---------- persistence ----------
+
+    def save(self, path):
+        arrays = {
+            f"cat_{name}": np.array(list(mapping), dtype=str)
+            for name, mapping in self.categories.items()
+        }
+        np.savez_compressed(
+            path,
+            n_features=self.n_features,
+            depth=self.depth,
+            left=self.left,
+            right=self.right,
+            feature=self.feature,
+            threshold=self.threshold,
+            value=self.value,
+            **arrays,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            categories = {}
+            offset = 0
+            for name in CAT_COLUMNS:
+                values = [str(v) for v in data[f"cat_{name}"]]
+                categories[name] = {v: offset + i for i, v in enumerate(values)}
+                offset += len(values)
+            return cls(
+                categories,
+                data["n_features"],
+                data["depth"],
+                data["left"],
+                data["right"],
+                data["feature"],
+                data["threshold"],
+                data["value"],
+            )
+
+
+def compile_pipeline(pipeline):
+    """Build a CompiledForest from the fitted sklearn delivery pipeline."""
+    prep = pipeline.named_steps["prep"]
+    forest = pipeline.named_steps["model"]
+
+    encoder = prep.named_transformers_["cat"]
+    if list(prep.transformers_[0][2]) != list(CAT_COLUMNS) or \
+            list(prep.transformers_[1][2]) != list(NUM_COLUMNS):
+        raise ValueError("Unexpected column layout in delivery pipeline")
+
+    categories = {}
+    offset = 0
+    for name, values in zip(CAT_COLUMNS, encoder.categories_):
+        categories[name] = {str(v): offset + i for i, v in enumerate(values)}
+        offset += len(values)
+    n_features = offset + len(NUM_COLUMNS)
+
+    trees = [est.tree_ for est in forest.estimators_]
+    n_trees = len(trees)
+    max_nodes = max(t.node_count for t in trees)
+
+    left = np.zeros((n_trees, max_nodes), dtype=np.int32)
+    right = np.zeros((n_trees, max_nodes), dtype=np.int32)
+    feature = np.zeros((n_trees, max_nodes), dtype=np.int32)
+    threshold = np.zeros((n_trees, max_nodes), dtype=np.float64)
+    value = np.zeros((n_trees, max_nodes), dtype=np.float64)
+
+    for i, tree in enumerate(trees):
+        n = tree.node_count
+        nodes = np.arange(n)
+        is_leaf = tree.children_left == -1
+        left[i, :n] = np.where(is_leaf, nodes, tree.children_left)
+        right[i, :n] = np.where(is_leaf, nodes, tree.children_right)
+        feature[i, :n] = np.where(is_leaf, 0, tree.feature)
+        threshold[i, :n] = tree.threshold
+        value[i, :n] = tree.value[:, 0, 0]
+
+    depth = max(tree.max_depth for tree in trees)
+    return CompiledForest(categories, n_features, depth, left, right, feature, threshold, value)
@@ -0,0 +1,144 @@
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from shop.models import EmailOutbox
+
+MAX_ATTEMPTS = 6
+RETRY_BASE_SECONDS = 60
+# A worker that dies mid-batch leaves rows in "Sending"; after this long
+# another worker may pick them up again.
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def queue_email(subject, message, from_email, recipient_list, html=False, reply_to=None):
+    """
+    Drop-in for send_mail that stores the email for the outbox worker
+    instead of talking to SMTP inside the request. Written in the
+    caller's transaction, so it is only sent if that work commits.
+    """
+    row = outbox_email(subject, message, from_email, recipient_list, html, reply_to)
+    if row is not None:
+        row.save()
+    return row
+
+
+def outbox_email(subject, message, from_email, recipient_list, html=False, reply_to=None):
+    """Unsaved outbox row, or None without recipients; see queue_emails."""
+    recipients = [address for address in recipient_list if address]
+    if not recipients:
+        return None
+
+    return EmailOutbox(
+        subject=subject,
+        body=message,
+        is_html=html,
+        from_email=from_email or settings.EMAIL_HOST_USER or settings.DEFAULT_FROM_EMAIL,
+        to=recipients,
+        reply_to=reply_to or [],
+    )
+
+
+def queue_emails(rows):
+    """Queue many outbox_email() rows with one insert."""
+    return EmailOutbox.objects.bulk_create([row for row in rows if row is not None])
+
+
+def _claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        due = (
+            EmailOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status="Pending", next_attempt_at__lte=now)
+                | Q(status="Sending", claimed_at__lt=now - CLAIM_TIMEOUT)
+            )
+            .order_by("next_attempt_at")
+        )
+        ids = list(due.values_list("id", flat=True)[:batch_size])
+        if ids:
+            EmailOutbox.objects.filter(id__in=ids).update(status="Sending", claimed_at=now)
+
+    return list(EmailOutbox.objects.filter(id__in=ids).order_by("next_attempt_at"))
+
+
+def _to_message(row, connection):
+    message = EmailMessage(
+        subject=row.subject,
+        body=row.body,
+        from_email=row.from_email or None,
+        to=row.to,
+        reply_to=row.reply_to or None,
+        connection=connection,
+    )
+    if row.is_html:
+        message.content_subtype = "html"
+    return message
+
+
+def _is_permanent(error):
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)):
+        return True
+    code = getattr(error, "smtp_code", None)
+    return isinstance(code, int) and 500 <= code < 600
+
+
+def _record_failure(row, error):
+    row.attempts += 1
+    row.last_error = f"{type(error).__name__}: {error}"[:2000]
+    row.claimed_at = None
+
+    if _is_permanent(error) or row.attempts >= MAX_ATTEMPTS:
+        row.status = "Dead"
+    else:
+        row.status = "Pending"
+        delay = RETRY_BASE_SECONDS * (2 ** (row.attempts - 1))
+        row.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+
+    row.save(update_fields=["attempts", "last_error", "claimed_at", "status", "next_attempt_at"])
+
+
+def drain_outbox(batch_size=50):
+    """
+    Send one batch of due emails over a single SMTP connection.
+    Returns (sent, failed).
+    """
+    rows = _claim_batch(batch_size)
+    if not rows:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as error:
+        for row in rows:
+            _record_failure(row, error)
+        return 0, len(rows)
+
+    try:
+        for row in rows:
+            try:
+                connection.send_messages([_to_message(row, connection)])
+            except Exception as error:
+                _record_failure(row, error)
+                failed += 1
+                continue
+
+            row.status = "Sent"
+            row.sent_at = timezone.now()
+            row.attempts += 1
+            row.claimed_at = None
+            row.last_error = ""
+            row.save(update_fields=["status", "sent_at", "attempts", "claimed_at", "last_error"])
+            sent += 1
+    finally:
+        connection.close()
+
+    return sent, failed
@@ -0,0 +1,91 @@
+import math
+
+from shop.models import Branch
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_RADIUS_KM = 15
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lng, radius_km):
+    """
+    (min_lat, max_lat, min_lng, max_lng) around a point, wide enough to
+    hold every point within `radius_km`. The longitude bounds are None
+    when the box would wrap the antimeridian or reach a pole.
+    """
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90), min(max_lat, 90), None, None
+
+    dlng = dlat / math.cos(math.radians(lat))
+    min_lng, max_lng = lng - dlng, lng + dlng
+    if min_lng < -180 or max_lng > 180:
+        return min_lat, max_lat, None, None
+    return min_lat, max_lat, min_lng, max_lng
+
+
+def orderable_branches():
+    """Branches customers can order from right now."""
+    return Branch.objects.filter(shop__is_approved=True, shop__is_open=True)
+
+
+def nearby_branches(lat, lng, k=10, radius_km=DEFAULT_RADIUS_KM, city=None, queryset=None):
+    """
+    Up to `k` orderable branches nearest to (lat, lng) within
+    `radius_km`, closest first, each with a `distance_km` attribute.
+
+    Candidates come from a bounding-box range query on the indexed
+    latitude/longitude columns and are then ranked by exact haversine
+    distance in Python. Without coordinates it falls back to branches in
+    `city` (distance_km None).
+    """
+    queryset = orderable_branches() if queryset is None else queryset
+    queryset = queryset.select_related("shop")
+
+    if lat is None or lng is None:
+        if not city:
+            return []
+        branches = list(queryset.filter(city__iexact=city.strip()).order_by("id")[:k])
+        for branch in branches:
+            branch.distance_km = None
+        return branches
+
+    lat, lng = float(lat), float(lng)
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+    candidates = queryset.filter(latitude__gte=min_lat, latitude__lte=max_lat)
+    if min_lng is not None:
+        candidates = candidates.filter(longitude__gte=min_lng, longitude__lte=max_lng)
+    else:
+        candidates = candidates.filter(longitude__isnull=False)
+
+    ranked = []
+    for branch in candidates:
+        distance = haversine_km(lat, lng, branch.latitude, branch.longitude)
+        if distance <= radius_km:
+            branch.distance_km = distance
+            ranked.append(branch)
+
+    ranked.sort(key=lambda branch: (branch.distance_km, branch.id))
+    return ranked[:k]
+
+
+def nearby_shops(branches, limit=10):
+    """Distinct shops of already ranked branches, nearest first: (shops, total)."""
+    shops = []
+    seen = set()
+    for branch in branches:
+        if branch.shop_id not in seen:
+            seen.add(branch.shop_id)
+            branch.shop.distance_km = branch.distance_km
+            shops.append(branch.shop)
+    return shops[:limit], len(shops)
@@ -0,0 +1,133 @@
+"""
+Customer notifications for order status changes.
+
+A notification is written once, when an order moves into a status that
+has a template below (shop.signals calls notify_status_change), and the
+(user, order, status) unique constraint on Notification makes writing
+it again a no-op. Pages only read notifications; they never create them.
+"""
+from django.contrib.auth.models import User
+
+from shop.models import Notification, Order
+
+ORDER_STATUS_NOTIFICATIONS = {
+    "Washing": {
+        "title": "Order #{order_id} In Progress",
+        "message": "Your laundry from {shop_name} is being washed",
+        "notification_type": "status_update",
+        "icon": "fas fa-tint",
+        "color": "#17a2b8",
+    },
+    "Ready": {
+        "title": "Order #{order_id} Ready for Pickup",
+        "message": "Your laundry from {shop_name} is ready for pickup",
+        "notification_type": "ready_pickup",
+        "icon": "fas fa-box-open",
+        "color": "#f39c12",
+    },
+    "Completed": {
+        "title": "Order #{order_id} Completed",
+        "message": "Your laundry from {shop_name} is ready for pickup",
+        "notification_type": "completed",
+        "icon": "fas fa-check-circle",
+        "color": "#28a745",
+    },
+}
+
+WELCOME_NOTIFICATIONS = (
+    {
+        "title": "Welcome to Shine & Bright!",
+        "message": "Thanks for joining our laundry service. Start by exploring nearby shops.",
+        "notification_type": "welcome",
+        "icon": "fas fa-handshake",
+        "color": "#9b59b6",
+    },
+    {
+        "title": "Complete Your Profile",
+        "message": "Update your profile with your city information to get personalized service recommendations.",
+        "notification_type": "profile_reminder",
+        "icon": "fas fa-user-edit",
+        "color": "#3498db",
+    },
+)
+
+
+def order_notification(order_id, user_id, status, shop_name):
+    """Unsaved Notification for an order entering `status`, or None."""
+    template = ORDER_STATUS_NOTIFICATIONS.get(status)
+    if template is None:
+        return None
+    return Notification(
+        user_id=user_id,
+        order_id=order_id,
+        status=status,
+        title=template["title"].format(order_id=order_id),
+        message=template["message"].format(shop_name=shop_name),
+        notification_type=template["notification_type"],
+        icon=template["icon"],
+        color=template["color"],
+    )
+
+
+def notify_status_change(order, old_status):
+    if order.cloth_status == old_status or order.cloth_status not in ORDER_STATUS_NOTIFICATIONS:
+        return
+
+    notification = order_notification(order.id, order.user_id, order.cloth_status, order.shop.name)
+    Notification.objects.bulk_create([notification], ignore_conflicts=True)
+
+
+def send_welcome_notifications(user):
+    Notification.objects.bulk_create(
+        [Notification(user=user, **template) for template in WELCOME_NOTIFICATIONS]
+    )
+
+
+def backfill_order_notifications(batch_size=1000):
+    """
+    Create the notification for every order's current status that is
+    missing one. Returns the number of rows created.
+    """
+    before = Notification.objects.filter(order__isnull=False).count()
+
+    rows = (
+        Order.objects
+        .filter(cloth_status__in=ORDER_STATUS_NOTIFICATIONS)
+        .order_by("id")
+        .values_list("id", "user_id", "cloth_status", "shop__name")
+        .iterator(chunk_size=batch_size)
+    )
+    batch = []
+    for order_id, user_id, status, shop_name in rows:
+        batch.append(order_notification(order_id, user_id, status, shop_name))
+        if len(batch) >= batch_size:
+            Notification.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    Notification.objects.bulk_create(batch, ignore_conflicts=True)
+
+    return Notification.objects.filter(order__isnull=False).count() - before
+
+
+def backfill_welcome_notifications(batch_size=1000):
+    """Give users missing a welcome or profile reminder row their copy."""
+    created = 0
+    for template in WELCOME_NOTIFICATIONS:
+        missing = (
+            User.objects
+            .exclude(notification__notification_type=template["notification_type"])
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        # Walk by id rather than holding a cursor open over a table
+        # that is being inserted into
+        last_id = 0
+        while True:
+            user_ids = list(missing.filter(id__gt=last_id)[:batch_size])
+            if not user_ids:
+                break
+            Notification.objects.bulk_create(
+                [Notification(user_id=user_id, **template) for user_id in user_ids]
+            )
+            created += len(user_ids)
+            last_id = user_ids[-1]
+    return created
@@ -0,0 +1,149 @@
+import base64
+import json
+from urllib.parse import urlencode
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+# Totals above this are shown as "10000+" instead of being counted
+COUNT_CAP = 10000
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset."""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        # Filled in by paginate()
+        self.next_url = None
+        self.first_url = None
+        self.total = None
+        self.total_capped = False
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @property
+    def total_display(self):
+        if self.total is None:
+            return ""
+        return f"{self.total}+" if self.total_capped else str(self.total)
+
+
+def _field_value(obj, name):
+    value = getattr(obj, name)
+    return getattr(value, "pk", value)
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, model, ordering):
+    """Cursor string back to field values, or None if it is not valid."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if not isinstance(raw, list) or len(raw) != len(ordering):
+            return None
+        return [
+            model._meta.get_field(field.lstrip("-")).to_python(value)
+            for field, value in zip(ordering, raw)
+        ]
+    except (ValueError, TypeError, ValidationError, FieldDoesNotExist):
+        return None
+
+
+def _after(ordering, values):
+    """
+    Q for rows strictly after `values` in `ordering`, e.g. for
+    ("-created_at", "-id"): created_at < v0 OR (created_at = v0 AND id < v1).
+    """
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        step = Q(**{f"{name}__{lookup}": values[i]})
+        for prev, prev_value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev.lstrip("-"): prev_value})
+        condition |= step
+    return condition
+
+
+def after_cursor(queryset, cursor, ordering):
+    """`queryset` in `ordering`, starting after `cursor` (from the start if invalid)."""
+    queryset = queryset.order_by(*ordering)
+    values = decode_cursor(cursor, queryset.model, ordering)
+    if values is not None:
+        queryset = queryset.filter(_after(ordering, values))
+    return queryset
+
+
+def keyset_page(queryset, cursor=None, ordering=("-created_at", "-id"), page_size=20):
+    """
+    Page through `queryset` in a stable `ordering` (last field must be
+    unique) without OFFSET, so every page costs the same.
+    """
+    ordering = tuple(ordering)
+    queryset = after_cursor(queryset, cursor, ordering)
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor([
+            _field_value(last, field.lstrip("-")) for field in ordering
+        ])
+
+    return KeysetPage(items, next_cursor)
+
+
+def capped_count(queryset, cap=COUNT_CAP):
+    """
+    (count, capped): counts at most cap + 1 rows, so the cost stays
+    bounded on huge tables; capped is True when there are more than cap.
+    """
+    count = queryset.order_by().values("pk")[:cap + 1].count()
+    return min(count, cap), count > cap
+
+
+def _page_url(path, params, cursor=None):
+    query = {key: value for key, value in params.items() if key != "cursor" and value}
+    if cursor:
+        query["cursor"] = cursor
+    return f"{path}?{urlencode(query)}" if query else path
+
+
+def paginate(request, queryset, ordering, page_size=25, path=None, params=None, count=False):
+    """
+    keyset_page() for a listing view: reads ?cursor=, and sets next_url /
+    first_url (the current filters plus cursor, against `path`, default
+    the request path) and, with count=True, a capped total.
+    """
+    path = path or request.path
+    params = request.GET if params is None else params
+    cursor = request.GET.get("cursor")
+
+    page = keyset_page(queryset, cursor=cursor, ordering=ordering, page_size=page_size)
+    if page.next_cursor:
+        page.next_url = _page_url(path, params, page.next_cursor)
+    if cursor:
+        page.first_url = _page_url(path, params)
+    if count:
+        page.total, page.total_capped = capped_count(queryset)
+    return page
@@ -0,0 +1,152 @@
+from django.db import transaction
+from django.db.models import (
+    Count, ExpressionWrapper, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value,
+)
+from django.db.models.functions import Cast, Coalesce, Greatest, NullIf
+
+from shop.models import Branch, LaundryShop, Service, ServiceRating
+from shop.utils.catalog import bump_catalog_version
+
+# ServiceRating column -> model whose totals it feeds
+RATED_MODELS = {
+    "shop": LaundryShop,
+    "branch": Branch,
+    "service": Service,
+}
+
+
+def rating_average_expression(prefix=""):
+    """
+    Average rating from the stored totals of the row at `prefix`
+    (e.g. "branch__shop__"), NULL when it has no ratings. Usable in
+    annotate/filter/order_by without touching ServiceRating.
+    """
+    return ExpressionWrapper(
+        Cast(F(f"{prefix}rating_sum"), FloatField())
+        / NullIf(F(f"{prefix}rating_count"), 0),
+        output_field=FloatField(),
+    )
+
+
+def _shop_id(target):
+    if isinstance(target, LaundryShop):
+        return target.pk
+    if isinstance(target, Branch):
+        return target.shop_id
+    return target.branch.shop_id
+
+
+def save_rating(user, target, rating, comment=""):
+    """
+    Create or update `user`'s rating of a shop, branch or service and
+    move the target's rating_sum/rating_count in the same transaction.
+    Returns (ServiceRating, created).
+    """
+    field = next(name for name, model in RATED_MODELS.items() if isinstance(target, model))
+    rating = int(rating)
+
+    with transaction.atomic():
+        existing = (
+            ServiceRating.objects
+            .select_for_update()
+            .filter(user=user, **{field: target})
+            .first()
+        )
+
+        if existing:
+            sum_delta = rating - existing.rating
+            count_delta = 0
+            existing.rating = rating
+            existing.comment = comment
+            existing.save(update_fields=["rating", "comment"])
+            obj, created = existing, False
+        else:
+            sum_delta = rating
+            count_delta = 1
+            obj = ServiceRating.objects.create(
+                user=user, rating=rating, comment=comment, **{field: target}
+            )
+            created = True
+
+        type(target).objects.filter(pk=target.pk).update(
+            rating_sum=F("rating_sum") + sum_delta,
+            rating_count=F("rating_count") + count_delta,
+        )
+        # Cached branch/service listings carry these totals
+        shop_id = _shop_id(target)
+        transaction.on_commit(lambda: bump_catalog_version(shop_id))
+
+    return obj, created
+
+
+def forget_rating(rating):
+    """
+    Take a deleted rating back out of its target's totals once the
+    delete commits. Covers cascades (a deleted user, branch or service)
+    as well as direct deletes; targets deleted with it are skipped.
+    """
+    targets = [
+        (model, getattr(rating, f"{field}_id"))
+        for field, model in RATED_MODELS.items()
+        if getattr(rating, f"{field}_id")
+    ]
+
+    def subtract():
+        for model, pk in targets:
+            model.objects.filter(pk=pk).update(
+                rating_sum=Greatest(F("rating_sum") - rating.rating, 0),
+                rating_count=Greatest(F("rating_count") - 1, 0),
+            )
+        shop_ids = set()
+        for model, pk in targets:
+            if model is LaundryShop:
+                shop_ids.add(pk)
+            elif model is Branch:
+                shop_ids.update(Branch.objects.filter(pk=pk).values_list("shop_id", flat=True))
+            else:
+                shop_ids.update(Service.objects.filter(pk=pk).values_list("branch__shop_id", flat=True))
+        for shop_id in shop_ids:
+            bump_catalog_version(shop_id)
+
+    transaction.on_commit(subtract)
+
+
+def totals_subqueries(field):
+    ratings = (
+        ServiceRating.objects
+        .filter(**{field: OuterRef("pk")})
+        .values(field)
+        .order_by()
+    )
+    return {
+        "rating_sum": Coalesce(
+            Subquery(ratings.annotate(total=Sum("rating")).values("total")),
+            Value(0), output_field=IntegerField(),
+        ),
+        "rating_count": Coalesce(
+            Subquery(ratings.annotate(total=Count("id")).values("total")),
+            Value(0), output_field=IntegerField(),
+        ),
+    }
+
+
+def recompute_rating_totals():
+    """
+    Rebuild every rating_sum/rating_count from ServiceRating with one
+    UPDATE per model. Returns {model name: rows that had drifted}.
+    """
+    drifted = {}
+    with transaction.atomic():
+        for field, model in RATED_MODELS.items():
+            annotated = model.objects.annotate(
+                **{f"actual_{name}": expr for name, expr in totals_subqueries(field).items()}
+            )
+            drifted[model.__name__] = (
+                annotated.exclude(rating_sum=F("actual_rating_sum"), rating_count=F("actual_rating_count"))
+                .count()
+            )
+            model.objects.update(**totals_subqueries(field))
+
+    for shop_id in LaundryShop.objects.values_list("id", flat=True):
+        bump_catalog_version(shop_id)
+    return drifted
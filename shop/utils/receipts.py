@@ -0,0 +1,329 @@
+"""
+PDF payment receipts, rendered once per order version.
+
+Completing a payment queues a PaymentReceipt row (request_receipt); the
+receipts worker (render_receipts command) renders it off the request
+thread. The PDF is a pure function of receipt_data(), whose hash is the
+receipt's order_version, and it is stored under the hash of its bytes in
+the RECEIPT_STORAGE storage. The download view only renders when no
+receipt matches the order's current version.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from shop.models import Order, OrderItem, PaymentReceipt, ServiceClothPrice
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 60
+# A worker that dies mid-batch leaves rows in "Rendering"; after this
+# long another worker may pick them up again.
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def receipt_storage():
+    return storages.create_storage(settings.RECEIPT_STORAGE)
+
+
+def request_receipt(order):
+    """
+    Queue the receipt of a just-paid order for the worker. Written in
+    the caller's transaction, like queue_email.
+    """
+    receipt, created = PaymentReceipt.objects.get_or_create(order=order)
+    if not created and receipt.status != "Pending":
+        receipt.status = "Pending"
+        receipt.attempts = 0
+        receipt.requested_at = timezone.now()
+        receipt.save(update_fields=["status", "attempts", "requested_at"])
+    return receipt
+
+
+# ---------- content ----------
+
+def _money(value):
+    return f"{value:.2f}"
+
+
+def receipt_data(order, paid_at):
+    """Everything the receipt shows, as JSON-friendly values."""
+    items = list(
+        OrderItem.objects
+        .filter(order=order)
+        .order_by("id")
+        .values_list("service_id", "service__name", "service__price", "cloth_id", "cloth__name", "quantity")
+    )
+    prices = {
+        (service_id, cloth_id): price
+        for service_id, cloth_id, price in ServiceClothPrice.objects.filter(
+            service_id__in={item[0] for item in items},
+        ).values_list("service_id", "cloth_id", "price")
+    }
+
+    lines = []
+    for service_id, service_name, service_price, cloth_id, cloth_name, quantity in items:
+        price = prices.get((service_id, cloth_id), service_price) or 0
+        lines.append({
+            "service_name": service_name,
+            "cloth_name": cloth_name,
+            "quantity": quantity,
+            "price": _money(price),
+            "total": _money(price * quantity),
+        })
+
+    user = order.user
+    return {
+        "order_id": order.id,
+        "customer": user.get_full_name() or user.username,
+        "email": user.email,
+        "created_at": order.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+        "paid_at": paid_at.strftime("%Y-%m-%d %H:%M:%S"),
+        "delivery_name": order.delivery_name,
+        "delivery_address": order.delivery_address,
+        "delivery_phone": order.delivery_phone,
+        "special_instructions": order.special_instructions,
+        "items": lines,
+        "base_amount": _money(order.base_amount),
+        "platform_fee": _money(order.platform_fee),
+        "delivery_fee": _money(order.delivery_fee),
+        "gst_amount": _money(order.gst_amount),
+        "amount": _money(order.amount),
+        "razorpay_payment_id": order.razorpay_payment_id or "",
+    }
+
+
+def data_version(data):
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def render_receipt_pdf(data):
+    """Receipt PDF bytes; identical data gives identical bytes."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+    buffer = BytesIO()
+    # invariant: no creation date or random document id in the file
+    doc = SimpleDocTemplate(buffer, pagesize=letter, invariant=1)
+    styles = getSampleStyleSheet()
+
+    title_style = ParagraphStyle(
+        'Title',
+        parent=styles['Heading1'],
+        fontSize=20,
+        spaceAfter=30,
+        alignment=1,
+    )
+    heading_style = ParagraphStyle(
+        'Heading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        spaceAfter=10,
+    )
+    normal_style = styles['Normal']
+
+    def text(label, value):
+        return Paragraph(f"<b>{label}:</b> {escape(str(value))}", normal_style)
+
+    story = []
+
+    # ---------- TITLE ----------
+    story.append(Paragraph("Shine &amp; Bright Laundry Services", title_style))
+    story.append(Paragraph("Payment Receipt", heading_style))
+    story.append(Spacer(1, 12))
+
+    # ---------- ORDER DETAILS ----------
+    story.append(text("Order ID", f"#{data['order_id']}"))
+    story.append(text("Customer", data["customer"]))
+    story.append(text("Email", data["email"]))
+    story.append(text("Platform", "Shine & Bright"))
+    story.append(text("Order Date", data["created_at"]))
+    story.append(text("Payment Date", data["paid_at"]))
+    if data["razorpay_payment_id"]:
+        story.append(text("Payment ID", data["razorpay_payment_id"]))
+    story.append(Spacer(1, 12))
+
+    # ---------- DELIVERY DETAILS ----------
+    if data["delivery_name"] or data["delivery_address"] or data["delivery_phone"]:
+        story.append(Paragraph("<b>Delivery Details:</b>", heading_style))
+        for label, key in (("Name", "delivery_name"), ("Address", "delivery_address"),
+                           ("Phone", "delivery_phone"), ("Instructions", "special_instructions")):
+            if data[key]:
+                story.append(Paragraph(f"{label}: {escape(data[key])}", normal_style))
+        story.append(Spacer(1, 12))
+
+    # ---------- ORDER ITEMS ----------
+    story.append(Paragraph("<b>Order Items:</b>", heading_style))
+
+    table_data = [['Service', 'Cloth', 'Quantity', 'Price', 'Total']]
+    for item in data["items"]:
+        table_data.append([
+            item["service_name"],
+            item["cloth_name"],
+            str(item["quantity"]),
+            f"₹{item['price']}",
+            f"₹{item['total']}",
+        ])
+
+    items_table = Table(
+        table_data,
+        colWidths=[2*inch, 1.5*inch, 1*inch, 1*inch, 1*inch]
+    )
+    items_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('ALIGN', (2, 1), (-1, -1), 'CENTER'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ]))
+    story.append(items_table)
+    story.append(Spacer(1, 20))
+
+    # ---------- PAYMENT SUMMARY ----------
+    story.append(Paragraph("<b>Payment Summary:</b>", heading_style))
+
+    summary_data = [
+        ['Subtotal', f"₹{data['base_amount']}"],
+        ['Platform Fee', f"₹{data['platform_fee']}"],
+        ['Delivery Fee', f"₹{data['delivery_fee']}"],
+        ['GST', f"₹{data['gst_amount']}"],
+        ['Total Paid', f"₹{data['amount']}"],
+    ]
+    summary_table = Table(summary_data, colWidths=[4*inch, 2*inch])
+    summary_table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ]))
+    story.append(summary_table)
+    story.append(Spacer(1, 20))
+
+    # ---------- PAYMENT STATUS ----------
+    story.append(Paragraph(
+        "<b>Payment Status: Completed</b>",
+        ParagraphStyle(
+            'PaymentStatus',
+            parent=styles['Normal'],
+            fontSize=12,
+            textColor=colors.green,
+            alignment=1,
+        )
+    ))
+    story.append(Spacer(1, 20))
+
+    # ---------- FOOTER ----------
+    story.append(Paragraph(
+        "Thank you for choosing Shine &amp; Bright Laundry Services!",
+        ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontSize=10,
+            alignment=1,
+            spaceBefore=20,
+        )
+    ))
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+# ---------- rendering ----------
+
+def render_receipt(receipt):
+    """
+    Render and store the receipt for its order's current data unless the
+    stored one already matches. Returns the saved receipt.
+    """
+    order = Order.objects.select_related("user").get(pk=receipt.order_id)
+    data = receipt_data(order, receipt.paid_at)
+    version = data_version(data)
+
+    storage = receipt_storage()
+    if not (receipt.status == "Ready" and receipt.order_version == version
+            and storage.exists(receipt.file_name)):
+        pdf = render_receipt_pdf(data)
+        content_hash = hashlib.sha256(pdf).hexdigest()
+        file_name = f"{content_hash[:2]}/{content_hash}.pdf"
+        if not storage.exists(file_name):
+            file_name = storage.save(file_name, ContentFile(pdf))
+
+        receipt.order_version = version
+        receipt.content_hash = content_hash
+        receipt.file_name = file_name
+        receipt.generated_at = timezone.now()
+
+    receipt.status = "Ready"
+    receipt.claimed_at = None
+    receipt.last_error = ""
+    receipt.save()
+    return receipt
+
+
+def current_receipt(order):
+    """
+    The order's receipt, rendered now only if it is missing or the
+    order changed since it was rendered.
+    """
+    receipt, _ = PaymentReceipt.objects.get_or_create(order=order)
+    if receipt.status == "Ready":
+        version = data_version(receipt_data(order, receipt.paid_at))
+        if version == receipt.order_version:
+            return receipt
+    return render_receipt(receipt)
+
+
+def _claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        due = (
+            PaymentReceipt.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status="Pending", requested_at__lte=now)
+                | Q(status="Rendering", claimed_at__lt=now - CLAIM_TIMEOUT)
+            )
+            .order_by("requested_at")
+        )
+        ids = list(due.values_list("order_id", flat=True)[:batch_size])
+        if ids:
+            PaymentReceipt.objects.filter(order_id__in=ids).update(status="Rendering", claimed_at=now)
+
+    return list(PaymentReceipt.objects.filter(order_id__in=ids).order_by("requested_at"))
+
+
+def render_pending_receipts(batch_size=20):
+    """Render one batch of queued receipts. Returns (rendered, failed)."""
+    rendered = failed = 0
+    for receipt in _claim_batch(batch_size):
+        receipt.attempts += 1
+        try:
+            render_receipt(receipt)
+        except Exception as error:
+            if receipt.attempts >= MAX_ATTEMPTS:
+                receipt.status = "Failed"
+            else:
+                # requested_at doubles as the time of the next attempt
+                receipt.status = "Pending"
+                delay = RETRY_BASE_SECONDS * (2 ** (receipt.attempts - 1))
+                receipt.requested_at = timezone.now() + timedelta(seconds=delay)
+            receipt.claimed_at = None
+            receipt.last_error = f"{type(error).__name__}: {error}"[:2000]
+            receipt.save(update_fields=["attempts", "status", "requested_at", "claimed_at", "last_error"])
+            failed += 1
+        else:
+            rendered += 1
+    return rendered, failed
@@ -0,0 +1,187 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from shop.models import DailyShopRevenue, Order
+
+BUCKET_FIELDS = ("date", "shop_id", "branch_id", "payment_status", "cloth_status")
+
+
+def order_snapshot(order):
+    """
+    (bucket, amount) for an order as it currently sits in memory, or
+    None if it has not been saved yet.
+    """
+    if order.pk is None or order.created_at is None:
+        return None
+
+    bucket = (
+        timezone.localdate(order.created_at),
+        order.shop_id,
+        order.branch_id,
+        order.payment_status,
+        order.cloth_status,
+    )
+    return bucket, Decimal(order.amount or 0)
+
+
+def _apply(bucket, count_delta, revenue_delta):
+    lookup = dict(zip(BUCKET_FIELDS, bucket))
+
+    updated = DailyShopRevenue.objects.filter(**lookup).update(
+        order_count=F("order_count") + count_delta,
+        revenue=F("revenue") + revenue_delta,
+    )
+    if updated or count_delta <= 0:
+        return
+
+    try:
+        with transaction.atomic():
+            DailyShopRevenue.objects.create(
+                order_count=count_delta,
+                revenue=revenue_delta,
+                **lookup
+            )
+    except IntegrityError:
+        # Another request created the bucket first
+        DailyShopRevenue.objects.filter(**lookup).update(
+            order_count=F("order_count") + count_delta,
+            revenue=F("revenue") + revenue_delta,
+        )
+
+
+def record_order_change(old, new):
+    """Move an order from its old bucket to its new one."""
+    if old == new:
+        return
+
+    if old is not None:
+        _apply(old[0], -1, -old[1])
+    if new is not None:
+        _apply(new[0], 1, new[1])
+
+
+def fold_branch_buckets(branch_id):
+    """
+    Move a branch's buckets into its shop's branch-less ones before the
+    branch is deleted, as its orders move to branch=NULL.
+    """
+    buckets = DailyShopRevenue.objects.filter(branch_id=branch_id)
+    for date, shop_id, payment_status, cloth_status, order_count, revenue in buckets.values_list(
+        "date", "shop_id", "payment_status", "cloth_status", "order_count", "revenue"
+    ):
+        _apply((date, shop_id, None, payment_status, cloth_status), order_count, revenue)
+    buckets.delete()
+
+
+def rebuild_rollup(batch_size=1000):
+    """Recompute every bucket from the orders table. Returns the row count."""
+    rows = (
+        Order.objects
+        .annotate(date=TruncDate("created_at"))
+        .values("date", "shop_id", "branch_id", "payment_status", "cloth_status")
+        .annotate(order_count=Count("id"), revenue=Sum("amount"))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        DailyShopRevenue.objects.all().delete()
+        buckets = [
+            DailyShopRevenue(
+                date=row["date"],
+                shop_id=row["shop_id"],
+                branch_id=row["branch_id"],
+                payment_status=row["payment_status"],
+                cloth_status=row["cloth_status"],
+                order_count=row["order_count"],
+                revenue=row["revenue"] or 0,
+            )
+            for row in rows.iterator()
+        ]
+        DailyShopRevenue.objects.bulk_create(buckets, batch_size=batch_size)
+
+    return len(buckets)
+
+
+def reconcile_rollup(days=2):
+    """
+    Compare the last `days` days of buckets with the orders table and
+    fix the ones that drifted (e.g. after queryset updates that skip
+    signals). Fixes are applied as deltas, like order saves, so nothing
+    is deleted or locked beyond the buckets that are wrong. Returns the
+    number of buckets fixed.
+    """
+    since = timezone.localdate() - timedelta(days=days - 1)
+    start = timezone.make_aware(datetime.combine(since, time.min))
+
+    actual = {
+        tuple(row[field] for field in BUCKET_FIELDS): (row["order_count"], row["revenue"] or Decimal("0"))
+        for row in (
+            Order.objects
+            .filter(created_at__gte=start)
+            .annotate(date=TruncDate("created_at"))
+            .values(*BUCKET_FIELDS)
+            .annotate(order_count=Count("id"), revenue=Sum("amount"))
+            .order_by()
+        )
+    }
+    stored = {
+        row[:5]: row[5:]
+        for row in DailyShopRevenue.objects.filter(date__gte=since).values_list(
+            *BUCKET_FIELDS, "order_count", "revenue"
+        )
+    }
+
+    fixed = 0
+    for bucket in actual.keys() | stored.keys():
+        count, revenue = actual.get(bucket, (0, Decimal("0")))
+        have_count, have_revenue = stored.get(bucket, (0, Decimal("0")))
+        if (count, revenue) != (have_count, have_revenue):
+            _apply(bucket, count - have_count, revenue - have_revenue)
+            fixed += 1
+    return fixed
+
+
+def revenue_rows(**filters):
+    """Rollup buckets matching `filters`, e.g. shop=..., payment_status=..."""
+    return DailyShopRevenue.objects.filter(**filters)
+
+
+def summarize(rows, today=None):
+    """
+    Totals over a set of rollup buckets in one grouped query:
+    order count, revenue, today's revenue and count per cloth status.
+    """
+    today = today or timezone.localdate()
+
+    grouped = (
+        rows
+        .values("cloth_status")
+        .annotate(
+            count=Sum("order_count"),
+            total=Sum("revenue"),
+            today_total=Sum("revenue", filter=Q(date=today)),
+        )
+        .order_by("cloth_status")
+    )
+
+    by_status = {}
+    total_orders = 0
+    total_revenue = Decimal(0)
+    today_revenue = Decimal(0)
+    for row in grouped:
+        by_status[row["cloth_status"]] = row["count"] or 0
+        total_orders += row["count"] or 0
+        total_revenue += row["total"] or 0
+        today_revenue += row["today_total"] or 0
+
+    return {
+        "total_orders": total_orders,
+        "total_revenue": total_revenue,
+        "today_revenue": today_revenue,
+        "by_status": by_status,
+    }
@@ -0,0 +1,122 @@
+"""
+Periodic jobs for the run_scheduler command.
+
+The schedule lives in ScheduledJob rows shared by every node running
+the scheduler. A job is due once its next_run_at has passed, and a node
+runs it only after taking the row's lease with one conditional UPDATE,
+so each run happens on a single node however many schedulers are up.
+A node that dies mid-run keeps the lease until locked_until passes.
+Intervals are jittered so nodes and jobs drift apart instead of firing
+together.
+"""
+import logging
+import os
+import random
+import socket
+import time
+from datetime import timedelta
+
+from django.db.models import F, Min, Q
+from django.utils import timezone
+
+from shop.models import ScheduledJob
+from shop.utils.email_outbox import drain_outbox
+from shop.utils.revenue import reconcile_rollup
+from shop.utils.sweeps import run_all_sweeps
+from shop.utils.tokens import delete_expired_tokens
+
+logger = logging.getLogger(__name__)
+
+# Each interval is stretched or shrunk by up to this fraction
+JITTER = 0.1
+
+
+def drain_outbox_job(batch_size=50, max_batches=20):
+    """Send what the outbox has due, leaving the rest for the next run."""
+    for _ in range(max_batches):
+        sent, failed = drain_outbox(batch_size=batch_size)
+        if not (sent or failed):
+            break
+
+
+# name -> (interval seconds, lease seconds, function)
+JOBS = {
+    "order_sweeps": (60, 600, run_all_sweeps),
+    "email_outbox": (30, 300, drain_outbox_job),
+    "revenue_rollup": (60 * 60, 10 * 60, reconcile_rollup),
+    "expired_tokens": (60 * 60, 10 * 60, delete_expired_tokens),
+}
+
+
+def node_name():
+    return f"{socket.gethostname()}:{os.getpid()}"[:100]
+
+
+def _jittered(seconds):
+    return timedelta(seconds=seconds * random.uniform(1 - JITTER, 1 + JITTER))
+
+
+def ensure_jobs(names):
+    """Create missing schedule rows, first runs spread over a jitter window."""
+    now = timezone.now()
+    ScheduledJob.objects.bulk_create(
+        [
+            ScheduledJob(name=name, next_run_at=now + timedelta(seconds=JOBS[name][0] * random.uniform(0, JITTER)))
+            for name in names
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def run_job(name, node=None):
+    """
+    Run `name` if it is due and no other node holds its lease. Returns
+    the job row as recorded after the run, or None if it was skipped.
+    """
+    interval, lease, function = JOBS[name]
+    node = node or node_name()
+    started = timezone.now()
+
+    taken = (
+        ScheduledJob.objects
+        .filter(name=name, next_run_at__lte=started)
+        .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=started))
+        .update(locked_by=node, locked_until=started + timedelta(seconds=lease))
+    )
+    if not taken:
+        return None
+
+    scheduled = ScheduledJob.objects.values_list("next_run_at", flat=True).get(name=name)
+    clock = time.monotonic()
+    error = ""
+    try:
+        function()
+    except Exception as exc:
+        logger.exception("Scheduled job %s failed", name)
+        error = f"{type(exc).__name__}: {exc}"[:2000]
+    duration = time.monotonic() - clock
+    finished = timezone.now()
+
+    # Only the lease holder records the run; if the lease ran out and
+    # another node took the job over, this run is not the current one.
+    ScheduledJob.objects.filter(name=name, locked_by=node).update(
+        next_run_at=finished + _jittered(interval),
+        locked_by="",
+        locked_until=None,
+        last_started_at=started,
+        last_finished_at=finished,
+        last_duration=duration,
+        last_lag=(started - scheduled).total_seconds(),
+        last_error=error,
+        runs=F("runs") + 1,
+        failures=F("failures") + (1 if error else 0),
+    )
+    return ScheduledJob.objects.get(name=name)
+
+
+def seconds_until_due(names):
+    """Seconds until the earliest of `names` is due (0 if one already is)."""
+    next_run_at = ScheduledJob.objects.filter(name__in=names).aggregate(next=Min("next_run_at"))["next"]
+    if next_run_at is None:
+        return 0
+    return max((next_run_at - timezone.now()).total_seconds(), 0)
@@ -0,0 +1,261 @@
+"""
+Full-text search over services, shops, branches and users.
+
+Every searchable object has one SearchDocument row (title + body text)
+kept current by shop.signals. Migration 0048 indexes those rows with a
+weighted tsvector + GIN index on Postgres and an FTS5 table on SQLite;
+other databases fall back to icontains over the documents. All search
+boxes go through search_ids()/search_queryset() so they share ranking
+and prefix (type-ahead) matching.
+"""
+import re
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import BooleanField, F, FloatField, Func, OuterRef, Q, Subquery, Value
+from django.db.models.expressions import RawSQL
+
+from shop.models import Branch, LaundryShop, SearchDocument, Service
+
+MAX_TERMS = 8
+# Default cap on matches, so a one-letter prefix cannot return every row
+SEARCH_LIMIT = 500
+FTS_TABLE = "shop_searchdocument_fts"
+TITLE_LENGTH = SearchDocument._meta.get_field("title").max_length
+
+
+def _text(*parts):
+    """Join parts with punctuation turned into spaces, so both backends
+    split e-mails, phone numbers etc. into the same tokens."""
+    joined = " ".join(str(part) for part in parts if part)
+    return re.sub(r"[^\w]+", " ", joined).strip()
+
+
+def search_terms(query):
+    return re.findall(r"\w+", (query or "").lower())[:MAX_TERMS]
+
+
+# ---------- documents ----------
+
+def service_document(service):
+    branch = service.branch
+    return _text(service.name), _text(branch.name, branch.city, branch.shop.name)
+
+
+def shop_document(shop):
+    return _text(shop.name), _text(shop.city, shop.email, shop.phone, shop.address)
+
+
+def branch_document(branch):
+    return _text(branch.name), _text(branch.shop.name, branch.city, branch.address, branch.phone)
+
+
+def user_document(user):
+    return (
+        _text(user.username, user.first_name, user.last_name),
+        _text(user.email),
+    )
+
+
+DOCUMENT_BUILDERS = {
+    "service": (Service, service_document, ("branch__shop",)),
+    "shop": (LaundryShop, shop_document, ()),
+    "branch": (Branch, branch_document, ("shop",)),
+    "user": (User, user_document, ()),
+}
+
+KIND_FOR_MODEL = {model: kind for kind, (model, _, _) in DOCUMENT_BUILDERS.items()}
+
+
+# Fields each document is built from; saves touching none of them
+# (e.g. the last_login update on every login) leave the index alone
+INDEXED_FIELDS = {
+    "service": {"name", "branch"},
+    "shop": {"name", "city", "email", "phone", "address"},
+    "branch": {"name", "shop", "city", "address", "phone"},
+    "user": {"username", "first_name", "last_name", "email"},
+}
+SYNC_CHUNK_SIZE = 500
+
+
+def sync_documents(kind, objects):
+    """
+    Write the documents of `objects` whose text changed, reading the
+    stored ones a chunk at a time. Returns the number written.
+    """
+    build = DOCUMENT_BUILDERS[kind][1]
+    written = 0
+    objects = iter(objects)
+    while True:
+        chunk = list(islice(objects, SYNC_CHUNK_SIZE))
+        if not chunk:
+            return written
+
+        wanted = {}
+        for obj in chunk:
+            title, body = build(obj)
+            wanted[obj.pk] = (title[:TITLE_LENGTH], body)
+        stored = {
+            doc.object_id: doc
+            for doc in SearchDocument.objects.filter(kind=kind, object_id__in=wanted)
+        }
+
+        created, changed = [], []
+        for object_id, (title, body) in wanted.items():
+            doc = stored.get(object_id)
+            if doc is None:
+                created.append(SearchDocument(kind=kind, object_id=object_id, title=title, body=body))
+            elif (doc.title, doc.body) != (title, body):
+                doc.title, doc.body = title, body
+                changed.append(doc)
+        SearchDocument.objects.bulk_create(created, ignore_conflicts=True)
+        # Saved one by one: the SQLite FTS triggers and the Postgres
+        # generated column both follow row updates
+        for doc in changed:
+            doc.save(update_fields=["title", "body", "updated_at"])
+        written += len(created) + len(changed)
+
+
+def index_object(instance, update_fields=None):
+    """Refresh the instance's document; returns True if its text changed."""
+    kind = KIND_FOR_MODEL[type(instance)]
+    if update_fields is not None and not INDEXED_FIELDS[kind] & set(update_fields):
+        return False
+    return sync_documents(kind, [instance]) > 0
+
+
+def unindex_object(instance):
+    kind = KIND_FOR_MODEL[type(instance)]
+    SearchDocument.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+def reindex_related(instance):
+    """
+    Refresh the documents that copy text from `instance`: a shop's name
+    appears in its branch and service documents, a branch's in its
+    services'. Only documents whose text changed are written.
+    """
+    if isinstance(instance, LaundryShop):
+        branches = Branch.objects.filter(shop=instance)
+        services = Service.objects.filter(branch__shop=instance)
+    elif isinstance(instance, Branch):
+        branches = Branch.objects.none()
+        services = Service.objects.filter(branch=instance)
+    else:
+        return
+
+    sync_documents("branch", branches.select_related("shop").iterator(chunk_size=SYNC_CHUNK_SIZE))
+    sync_documents("service", services.select_related("branch__shop").iterator(chunk_size=SYNC_CHUNK_SIZE))
+
+
+def rebuild_index(kinds=None, batch_size=1000):
+    """Recreate the documents of `kinds` (default all). Returns row count."""
+    total = 0
+    for kind, (model, build, related) in DOCUMENT_BUILDERS.items():
+        if kinds and kind not in kinds:
+            continue
+
+        SearchDocument.objects.filter(kind=kind).delete()
+        batch = []
+        for obj in model.objects.select_related(*related).iterator(chunk_size=batch_size):
+            title, body = build(obj)
+            batch.append(SearchDocument(
+                kind=kind, object_id=obj.pk, title=title[:TITLE_LENGTH], body=body,
+            ))
+            if len(batch) >= batch_size:
+                SearchDocument.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        SearchDocument.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+# ---------- queries ----------
+
+def _postgres_documents(docs, terms):
+    tsquery = " & ".join(f"{term}:*" for term in terms)
+    return docs.filter(
+        RawSQL("search_vector @@ to_tsquery('simple', %s)", (tsquery,), output_field=BooleanField())
+    ).annotate(
+        rank=RawSQL("ts_rank(search_vector, to_tsquery('simple', %s))", (tsquery,), output_field=FloatField())
+    )
+
+
+def _sqlite_documents(docs, terms):
+    match = " AND ".join(f'"{term}"*' for term in terms)
+    # Title matches weigh ten times body matches; bm25 is lower-is-better.
+    # The rank joins on F("id") so it still points at this table when the
+    # queryset is used as a subquery (where Django renames it).
+    return docs.filter(
+        id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,))
+    ).annotate(
+        rank=Func(
+            Value(match), F("id"),
+            template=f"(SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %(expressions)s)",
+            arg_joiner=" AND rowid = ",
+            output_field=FloatField(),
+        )
+    )
+
+
+def _fallback_documents(docs, terms):
+    for term in terms:
+        docs = docs.filter(Q(title__icontains=term) | Q(body__icontains=term))
+    return docs.annotate(rank=Value(0.0, output_field=FloatField()))
+
+
+def matching_documents(query, kind):
+    """
+    SearchDocuments of `kind` matching every word of `query` (each as a
+    prefix, so "was ir" finds "Wash & Iron"), annotated with a `rank`
+    where higher is better. Stays lazy, so callers can use it as a
+    subquery instead of pulling every match into Python.
+    """
+    docs = SearchDocument.objects.filter(kind=kind)
+    terms = search_terms(query)
+    if not terms:
+        return docs.annotate(rank=Value(0.0, output_field=FloatField())).none()
+
+    if connection.vendor == "postgresql":
+        return _postgres_documents(docs, terms)
+    if connection.vendor == "sqlite":
+        return _sqlite_documents(docs, terms)
+    return _fallback_documents(docs, terms)
+
+
+def search_ids(query, kind, limit=SEARCH_LIMIT):
+    """Ids of the best `limit` `kind` objects matching `query`, best first."""
+    ranked = matching_documents(query, kind).order_by("-rank", "-object_id")
+    return list(ranked.values_list("object_id", flat=True)[:limit])
+
+
+def search_queryset(queryset, query, kind=None, ranked=True, limit=None):
+    """
+    Narrow `queryset` to objects matching `query`, through a subquery on
+    the documents. With ranked=True the result is ordered best match
+    first; otherwise the queryset keeps its own ordering. `limit` keeps
+    only the best `limit` matches.
+    """
+    kind = kind or KIND_FOR_MODEL[queryset.model]
+    docs = matching_documents(query, kind)
+    matches = docs.values("object_id")
+    if limit:
+        matches = matches.order_by("-rank", "-object_id")[:limit]
+    queryset = queryset.filter(pk__in=matches)
+    if ranked:
+        rank = docs.filter(object_id=OuterRef("pk")).values("rank")[:1]
+        queryset = queryset.annotate(search_rank=Subquery(rank)).order_by("-search_rank", "-pk")
+    return queryset
+
+
+def order_search_filter(query, user_field="user"):
+    """
+    Q for the admin order search boxes: "#123"/"123" finds that order,
+    anything else finds orders of users matching the text.
+    """
+    query = (query or "").strip().lstrip("#")
+    if query.isdigit():
+        return Q(id=int(query))
+    return Q(**{f"{user_field}_id__in": matching_documents(query, "user").values("object_id")})
@@ -0,0 +1,101 @@
+"""
+Monthly statement files (PDF + CSV) for one shop.
+
+Runs inside the statement process pool, so it works on plain data from
+shop.utils.statements and never touches Django or the database.
+ReportLab styles are built once per process and shared by every
+statement that process renders.
+"""
+import csv
+import os
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+CSV_HEADER = ["order_id", "created_at", "payment_status", "cloth_status", "amount", "commission", "payout"]
+
+
+@lru_cache(maxsize=None)
+def _styles():
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.platypus import TableStyle
+
+    sheet = getSampleStyleSheet()
+    return {
+        "title": ParagraphStyle('StatementTitle', parent=sheet['Heading1'], fontSize=18, spaceAfter=6),
+        "subtitle": ParagraphStyle('StatementSubtitle', parent=sheet['Normal'], fontSize=11, spaceAfter=18),
+        "heading": ParagraphStyle('StatementHeading', parent=sheet['Heading2'], fontSize=13, spaceAfter=8),
+        "normal": sheet['Normal'],
+        "summary": TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ]),
+        "orders": TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('ALIGN', (3, 1), (-1, -1), 'RIGHT'),
+            ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ]),
+    }
+
+
+def _pdf(statement, path):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
+
+    styles = _styles()
+    totals = statement["totals"]
+
+    story = [
+        Paragraph(escape(statement["shop_name"]), styles["title"]),
+        Paragraph(f"Monthly statement for {statement['month']}", styles["subtitle"]),
+        Paragraph("Summary", styles["heading"]),
+    ]
+    summary = Table(
+        [
+            ["Orders", str(totals["orders"])],
+            ["Paid orders", str(totals["paid_orders"])],
+            ["Gross paid", f"Rs. {totals['gross']}"],
+            [f"Platform commission ({statement['commission_percentage']}%)", f"Rs. {totals['commission']}"],
+            ["Payout", f"Rs. {totals['payout']}"],
+        ],
+        colWidths=[4 * inch, 2 * inch],
+    )
+    summary.setStyle(styles["summary"])
+    story += [summary, Spacer(1, 18), Paragraph("Orders", styles["heading"])]
+
+    rows = [["Order", "Date", "Payment", "Amount", "Commission", "Payout"]]
+    for line in statement["lines"]:
+        rows.append([
+            f"#{line['order_id']}", line["created_at"][:16], line["payment_status"],
+            line["amount"], line["commission"], line["payout"],
+        ])
+    orders = Table(rows, repeatRows=1, colWidths=[0.8 * inch, 1.4 * inch, 1.1 * inch, 1 * inch, 1 * inch, 1 * inch])
+    orders.setStyle(styles["orders"])
+    story.append(orders)
+
+    SimpleDocTemplate(path, pagesize=A4, invariant=1, title=f"Statement {statement['month']}").build(story)
+
+
+def _csv(statement, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for line in statement["lines"]:
+            writer.writerow([line[name] for name in CSV_HEADER])
+        totals = statement["totals"]
+        # Each column's own sum; commission and payout are zero on unpaid lines
+        writer.writerow(["total", "", "", "", totals["amount"], totals["commission"], totals["payout"]])
+
+
+def write_statement(statement, directory):
+    """Write shop-<id>.pdf and shop-<id>.csv into `directory`; returns the shop id."""
+    base = os.path.join(directory, f"shop-{statement['shop_id']}")
+    _csv(statement, base + ".csv")
+    _pdf(statement, base + ".pdf")
+    return statement["shop_id"]
@@ -0,0 +1,144 @@
+"""
+Monthly shop statements: orders, platform commission and payout.
+
+All orders of the month are read with one ordered iterator and grouped
+by shop as they stream past; each shop's statement is handed to a
+process pool that writes its PDF and CSV (shop.utils.statement_render).
+Only a bounded number of statements is in flight at once, so memory
+does not grow with the number of shops.
+"""
+import os
+from calendar import monthrange
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import groupby
+
+from django.db import connections
+from django.utils import timezone
+
+from shop.models import LaundryShop, Order
+from shop.payment_utils import calculate_commission
+from shop.utils.statement_render import write_statement
+
+CHUNK_SIZE = 5000
+# Statements queued per worker before the reader waits for one to finish
+IN_FLIGHT_PER_WORKER = 4
+CENT = Decimal("0.01")
+
+
+def month_bounds(year, month):
+    start = timezone.make_aware(datetime(year, month, 1))
+    days = monthrange(year, month)[1]
+    end = start + timedelta(days=days)
+    return start, end
+
+
+def _money(value):
+    return str(Decimal(value).quantize(CENT))
+
+
+def build_statement(shop_id, shop_name, month, rows, commission_percentage=5):
+    """Statement data for one shop from its (id, created_at, payment, cloth, amount) rows."""
+    lines = []
+    amount_total = gross = commission_total = payout_total = Decimal("0")
+    paid = 0
+    for order_id, created_at, payment_status, cloth_status, amount in rows:
+        amount_total += amount
+        if payment_status == "Completed":
+            commission, payout = calculate_commission(amount, commission_percentage)
+            paid += 1
+            gross += amount
+            commission_total += commission
+            payout_total += payout
+        else:
+            commission = payout = Decimal("0")
+        lines.append({
+            "order_id": order_id,
+            "created_at": timezone.localtime(created_at).isoformat(),
+            "payment_status": payment_status,
+            "cloth_status": cloth_status,
+            "amount": _money(amount),
+            "commission": _money(commission),
+            "payout": _money(payout),
+        })
+
+    return {
+        "shop_id": shop_id,
+        "shop_name": shop_name,
+        "month": month,
+        "commission_percentage": commission_percentage,
+        "lines": lines,
+        "totals": {
+            "orders": len(lines),
+            "paid_orders": paid,
+            # Every order line, paid or not; gross covers paid orders only
+            "amount": _money(amount_total),
+            "gross": _money(gross),
+            "commission": _money(commission_total),
+            "payout": _money(payout_total),
+        },
+    }
+
+
+def iter_statements(year, month, shop_ids=None, commission_percentage=5, chunk_size=CHUNK_SIZE):
+    """Yield one statement per shop with orders in the month, in shop id order."""
+    start, end = month_bounds(year, month)
+    label = f"{year:04d}-{month:02d}"
+
+    orders = Order.objects.filter(created_at__gte=start, created_at__lt=end)
+    shops = LaundryShop.objects.all()
+    if shop_ids:
+        orders = orders.filter(shop_id__in=shop_ids)
+        shops = shops.filter(id__in=shop_ids)
+    names = dict(shops.values_list("id", "name"))
+
+    rows = (
+        orders
+        .order_by("shop_id", "created_at", "id")
+        .values_list("shop_id", "id", "created_at", "payment_status", "cloth_status", "amount")
+        .iterator(chunk_size=chunk_size)
+    )
+    for shop_id, shop_rows in groupby(rows, key=lambda row: row[0]):
+        yield build_statement(
+            shop_id, names.get(shop_id, f"Shop {shop_id}"), label,
+            (row[1:] for row in shop_rows), commission_percentage,
+        )
+
+
+def generate_statements(year, month, directory, workers=None, shop_ids=None, commission_percentage=5):
+    """
+    Write every shop's statement for the month into directory/YYYY-MM.
+    Returns the number of shops written.
+    """
+    directory = os.path.join(directory, f"{year:04d}-{month:02d}")
+    os.makedirs(directory, exist_ok=True)
+    statements = iter_statements(year, month, shop_ids, commission_percentage)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        written = 0
+        for statement in statements:
+            write_statement(statement, directory)
+            written += 1
+        return written
+
+    # Start the workers before the reader opens its cursor, and without
+    # an inherited database connection a child could close on exit.
+    connections.close_all()
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pool.submit(os.getpid).result()
+
+        pending = set()
+        for statement in statements:
+            pending.add(pool.submit(write_statement, statement, directory))
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                    written += 1
+        for future in pending:
+            future.result()
+            written += 1
+    return written
@@ -0,0 +1,139 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from shop.models import Branch, LaundryShop
+from shop.utils.branch_load import branch_loads
+from shop.utils.revenue import revenue_rows
+
+
+def daily_series(rows, days, today=None):
+    """
+    Revenue and order count per day for the last `days` days of
+    rollup buckets.
+
+    One grouped query; days without orders are filled in with zeros so
+    the chart always has `days` points.
+    """
+    today = today or timezone.localdate()
+    start = today - timedelta(days=days - 1)
+
+    grouped = (
+        rows
+        .filter(date__gte=start, date__lte=today)
+        .values("date")
+        .annotate(total=Sum("revenue"), count=Sum("order_count"))
+        .order_by()
+    )
+    by_day = {row["date"]: row for row in grouped}
+
+    labels = []
+    revenue = []
+    counts = []
+    for i in range(days):
+        day = start + timedelta(days=i)
+        row = by_day.get(day)
+        labels.append(day.strftime("%b %d"))
+        revenue.append(float(row["total"] or 0) if row else 0.0)
+        counts.append(row["count"] if row else 0)
+
+    return {"labels": labels, "revenue": revenue, "orders": counts}
+
+
+def status_histogram(rows):
+    """Order count and revenue per cloth status in one grouped query."""
+    grouped = (
+        rows
+        .values("cloth_status")
+        .annotate(count=Sum("order_count"), total=Sum("revenue"))
+        .order_by("cloth_status")
+    )
+    return list(grouped)
+
+
+def user_totals(today=None):
+    today = today or timezone.localdate()
+    return User.objects.aggregate(
+        total=Count("id"),
+        new_today=Count("id", filter=Q(date_joined__date=today)),
+    )
+
+
+def shop_totals():
+    return LaundryShop.objects.aggregate(
+        total=Count("id"),
+        open=Count("id", filter=Q(is_open=True)),
+        pending_approval=Count("id", filter=Q(is_approved=False)),
+    )
+
+
+def admin_dashboard_stats(range_days=7, today=None):
+    """
+    Everything the admin dashboard shows as numbers, from a fixed
+    handful of grouped queries regardless of `range_days`.
+    """
+    today = today or timezone.localdate()
+    paid = revenue_rows(payment_status="Completed")
+
+    histogram = status_histogram(paid)
+    by_status = {row["cloth_status"]: row["count"] for row in histogram}
+    series = daily_series(paid, range_days, today=today)
+
+    users = user_totals(today=today)
+    shops = shop_totals()
+
+    return {
+        "total_orders": sum((row["count"] or 0) for row in histogram),
+        "total_revenue": sum((row["total"] or 0) for row in histogram),
+        "today_revenue": series["revenue"][-1],
+        "status_counts": by_status,
+        "orders_by_status": histogram,
+        "chart_labels": series["labels"],
+        "revenue_chart_data": series["revenue"],
+        "orders_chart_data": series["orders"],
+        "total_users": users["total"],
+        "new_users_today": users["new_today"],
+        "total_shops": shops["total"],
+        "open_shops": shops["open"],
+        "pending_approvals": shops["pending_approval"],
+        "total_branches": Branch.objects.count(),
+    }
+
+
+def branch_stats(shop, branches):
+    """
+    Paid order counts, revenue, rating and current load per branch of a
+    shop: one grouped query over the revenue rollup and one over the
+    load counters, joined in memory with the branches' rating totals.
+    """
+    order_rows = (
+        revenue_rows(shop=shop, payment_status="Completed")
+        .values("branch_id")
+        .annotate(
+            total=Sum("order_count"),
+            pending=Sum("order_count", filter=Q(cloth_status="Pending")),
+            completed=Sum("order_count", filter=Q(cloth_status="Completed")),
+            revenue_total=Sum("revenue"),
+        )
+        .order_by()
+    )
+    orders_by_branch = {row["branch_id"]: row for row in order_rows}
+
+    loads = branch_loads(branches)
+
+    stats = []
+    for branch in branches:
+        orders = orders_by_branch.get(branch.id, {})
+        stats.append({
+            "branch": branch,
+            "total_orders": orders.get("total") or 0,
+            "pending_orders": orders.get("pending") or 0,
+            "completed_orders": orders.get("completed") or 0,
+            "revenue": orders.get("revenue_total") or 0,
+            "average_rating": branch.rating_average,
+            "total_ratings": branch.rating_count,
+            "in_flight": loads.get(branch.id, 0),
+        })
+    return stats
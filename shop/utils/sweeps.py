@@ -0,0 +1,155 @@
+"""
+Periodic order sweeps: delayed orders and new paid orders.
+
+Each sweep picks its candidate orders a chunk at a time, locking them
+with select_for_update(skip_locked=True) so concurrent runs split the
+work instead of notifying twice. Per chunk it writes every notification
+with one bulk_create, queues the customer emails in the outbox with one
+more, and flips the order flag with a single update().
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from shop.models import Notification, Order
+from shop.utils.email_outbox import outbox_email, queue_emails
+
+CHUNK_SIZE = 500
+
+DELAY_EMAIL = """
+Hi {name},
+
+We sincerely apologize for the delay in delivering your laundry order.
+
+Order Details:
+• Order ID: #{order_id}
+• Shop: {shop_name}
+• Expected Delivery: {delivery:%d %b %Y, %I:%M %p}
+• Current Status: {cloth_status}
+
+Our team is actively working on your order and it will be delivered shortly.
+
+Thank you for your patience.
+
+— Shine & Bright Team 🧺✨
+"""
+
+
+# ---------- delayed: paid, still in progress, past the delivery date ----------
+
+def delayed_candidates(now):
+    # Matches the order_delayed_candidates_idx partial index
+    return Order.objects.filter(
+        payment_status="Completed",
+        cloth_status__in=Order.IN_PROGRESS_STATUSES,
+        delivery_date__lt=now,
+        overdue_notification_sent=False,
+    ).order_by("delivery_date", "id")
+
+
+DELAYED_FIELDS = (
+    "id", "user_id", "user__username", "user__first_name", "user__last_name", "user__email",
+    "shop_id", "shop__name", "delivery_date", "cloth_status",
+)
+
+
+def delayed_messages(rows):
+    notifications, emails = [], []
+    for (order_id, user_id, username, first_name, last_name, email,
+         shop_id, shop_name, delivery_date, cloth_status) in rows:
+        delivery = timezone.localtime(delivery_date)
+        notifications.append(Notification(
+            user_id=user_id,
+            order_id=order_id,
+            title=f"Order #{order_id} Delayed",
+            message="Your laundry delivery has been delayed. We apologize for the inconvenience.",
+            notification_type="delay",
+            icon="fas fa-clock",
+            color="#e74c3c",
+        ))
+        notifications.append(Notification(
+            shop_id=shop_id,
+            order_id=order_id,
+            title=f"Overdue Order #{order_id}",
+            message=f"Order for {username} was due on {delivery:%d %b %Y %H:%M}.",
+            notification_type="shop_overdue",
+            icon="fas fa-exclamation-triangle",
+            color="#e74c3c",
+        ))
+        emails.append(outbox_email(
+            f"Order #{order_id} Delivery Delayed | Shine & Bright",
+            DELAY_EMAIL.format(
+                name=f"{first_name} {last_name}".strip() or username,
+                order_id=order_id,
+                shop_name=shop_name,
+                delivery=delivery,
+                cloth_status=cloth_status,
+            ),
+            None,
+            [email],
+        ))
+    return notifications, emails
+
+
+# ---------- pending: paid orders the shop has not been told about ----------
+
+def pending_candidates(now):
+    return Order.objects.filter(
+        payment_status="Completed",
+        cloth_status="Pending",
+        pending_notification_sent=False,
+    ).order_by("id")
+
+
+PENDING_FIELDS = ("id", "user__username", "shop_id")
+
+
+def pending_messages(rows):
+    notifications = [
+        Notification(
+            shop_id=shop_id,
+            order_id=order_id,
+            title=f"Pending Order #{order_id}",
+            message=f"New order from {username}. Please start processing.",
+            notification_type="shop_pending",
+            icon="fas fa-hourglass-start",
+            color="#f59e0b",
+        )
+        for order_id, username, shop_id in rows
+    ]
+    return notifications, []
+
+
+# name -> (ordered candidates(now), flag set once handled, fields, messages(rows))
+SWEEPS = {
+    "delayed": (delayed_candidates, "overdue_notification_sent", DELAYED_FIELDS, delayed_messages),
+    "pending": (pending_candidates, "pending_notification_sent", PENDING_FIELDS, pending_messages),
+}
+
+
+def run_sweep(name, chunk_size=CHUNK_SIZE, now=None):
+    """Handle every current candidate of one sweep. Returns the number of orders."""
+    candidates, flag, fields, messages = SWEEPS[name]
+    now = now or timezone.now()
+    handled = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                candidates(now)
+                .select_for_update(skip_locked=True)
+                .values_list("id", flat=True)[:chunk_size]
+            )
+            if ids:
+                rows = Order.objects.filter(id__in=ids).order_by("id").values_list(*fields)
+                notifications, emails = messages(rows)
+                Notification.objects.bulk_create(notifications)
+                queue_emails(emails)
+                Order.objects.filter(id__in=ids).update(**{flag: True})
+
+        handled += len(ids)
+        if len(ids) < chunk_size:
+            return handled
+
+
+def run_all_sweeps(chunk_size=CHUNK_SIZE):
+    now = timezone.now()
+    return {name: run_sweep(name, chunk_size, now) for name in SWEEPS}
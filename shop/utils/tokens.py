@@ -0,0 +1,62 @@
+"""
+Password reset OTPs and tokens: issuing, and deleting expired rows.
+
+A user has at most one OTP row (enforced by a unique constraint);
+asking again overwrites it. Expired rows of every token table are
+deleted a bounded chunk of primary keys at a time, each chunk its own
+short statement, so cleanup never holds long locks on tables the login
+flows write to.
+"""
+import secrets
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from shop.models import EmailVerificationToken, PasswordResetOTP, ShopPasswordResetToken
+
+CHUNK_SIZE = 1000
+
+
+def issue_password_reset_otp(user):
+    """Replace the user's OTP with a fresh one and return its code."""
+    otp = str(secrets.randbelow(900000) + 100000)
+    rows = PasswordResetOTP.objects.filter(user=user)
+    if rows.update(otp=otp, created_at=timezone.now()):
+        return otp
+    try:
+        with transaction.atomic():
+            PasswordResetOTP.objects.create(user=user, otp=otp)
+    except IntegrityError:
+        # A concurrent request created the user's row first
+        rows.update(otp=otp, created_at=timezone.now())
+    return otp
+
+
+def expired_token_querysets(now=None):
+    now = now or timezone.now()
+    return {
+        "password reset OTPs": PasswordResetOTP.objects.filter(created_at__lt=now - PasswordResetOTP.TTL),
+        "shop reset tokens": ShopPasswordResetToken.objects.filter(
+            created_at__lt=now - ShopPasswordResetToken.TTL
+        ),
+        "email verification tokens": EmailVerificationToken.objects.filter(expires_at__lt=now),
+    }
+
+
+def delete_in_chunks(queryset, chunk_size=CHUNK_SIZE):
+    """Delete `queryset` chunk_size rows at a time. Returns the number deleted."""
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by().values_list("pk", flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        count, _ = queryset.model.objects.filter(pk__in=ids).delete()
+        deleted += count
+
+
+def delete_expired_tokens(chunk_size=CHUNK_SIZE):
+    """Delete every expired OTP and token. Returns {table label: rows deleted}."""
+    return {
+        label: delete_in_chunks(queryset, chunk_size)
+        for label, queryset in expired_token_querysets().items()
+    }
@@ -1,5 +1,5 @@
 import json
-import random
+import math
 import uuid
 from datetime import datetime, timedelta
 
@@ -10,14 +10,18 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from django.core.mail import EmailMessage, send_mail
-from django.db import IntegrityError
-from django.db.models import Avg, Count, Q, Sum
-from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Prefetch, Q, Sum
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified, HttpResponseRedirect, JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from .forms import (
@@ -47,7 +51,28 @@ from .models import (
     ShopPasswordResetToken,
     WashRecommendation,
 )
-from shop.utils.delivery_ai import predict_delivery_hours
+from shop.utils.branch_load import branch_load
+from shop.utils.catalog import (
+    approved_shops_in_city,
+    branch_services,
+    get_branch_catalog,
+    shop_branches,
+    shop_services,
+)
+from shop.utils.delivery_ai import predict_delivery_hours_batch
+from shop.utils.email_outbox import queue_email
+from shop.utils.exports import (
+    FORMATS, export_lines, export_queryset, export_records, parse_cursor, parse_day,
+)
+from shop.utils.branch_index import get_branch_index
+from shop.utils.geo import DEFAULT_RADIUS_KM, nearby_branches, nearby_shops
+from shop.utils.pagination import keyset_page, paginate
+from shop.utils.ratings import rating_average_expression, save_rating
+from shop.utils.receipts import current_receipt, receipt_storage, request_receipt
+from shop.utils.revenue import revenue_rows, summarize
+from shop.utils.search import order_search_filter, search_queryset
+from shop.utils.stats import admin_dashboard_stats, branch_stats
+from shop.utils.tokens import issue_password_reset_otp
 from .payment_utils import (
     calculate_commission,
     capture_payment_and_transfer,
@@ -58,6 +83,10 @@ from .payment_utils import (
 import pickle
 import os
 
+MY_ORDERS_PAGE_SIZE = 20
+ADMIN_PAGE_SIZE = 50
+NEARBY_BRANCH_LIMIT = 50
+
 def splash(request):
     return render(request, 'splash.html')
 def shop_splash(request):
@@ -67,170 +96,6 @@ def shop_entry(request):
         return redirect('shop_dashboard')
     return redirect('shop_login')
 
-def generate_payment_receipt_pdf(order, order_items):
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import letter
-    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
-    from reportlab.lib.units import inch
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-    from io import BytesIO
-
-    """Generate a PDF payment receipt for the order (with fees & GST)."""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-
-    # Custom styles
-    title_style = ParagraphStyle(
-        'Title',
-        parent=styles['Heading1'],
-        fontSize=20,
-        spaceAfter=30,
-        alignment=1,
-    )
-
-    heading_style = ParagraphStyle(
-        'Heading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=10,
-    )
-
-    normal_style = styles['Normal']
-
-    story = []
-
-    # ---------- TITLE ----------
-    story.append(Paragraph("Shine & Bright Laundry Services", title_style))
-    story.append(Paragraph("Payment Receipt", heading_style))
-    story.append(Spacer(1, 12))
-
-    # ---------- ORDER DETAILS ----------
-    story.append(Paragraph(f"<b>Order ID:</b> #{order.id}", normal_style))
-    story.append(Paragraph(
-        f"<b>Customer:</b> {order.user.get_full_name() or order.user.username}",
-        normal_style
-    ))
-    story.append(Paragraph(f"<b>Email:</b> {order.user.email}", normal_style))
-    story.append(Paragraph(f"<b>Platform:</b> Shine & Bright", normal_style))
-    story.append(Paragraph(
-        f"<b>Order Date:</b> {order.created_at.strftime('%Y-%m-%d %H:%M:%S')}",
-        normal_style
-    ))
-    story.append(Paragraph(
-        f"<b>Payment Date:</b> {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}",
-        normal_style
-    ))
-    story.append(Spacer(1, 12))
-
-    # ---------- DELIVERY DETAILS ----------
-    if order.delivery_name or order.delivery_address or order.delivery_phone:
-        story.append(Paragraph("<b>Delivery Details:</b>", heading_style))
-        if order.delivery_name:
-            story.append(Paragraph(f"Name: {order.delivery_name}", normal_style))
-        if order.delivery_address:
-            story.append(Paragraph(f"Address: {order.delivery_address}", normal_style))
-        if order.delivery_phone:
-            story.append(Paragraph(f"Phone: {order.delivery_phone}", normal_style))
-        if order.special_instructions:
-            story.append(Paragraph(
-                f"Instructions: {order.special_instructions}",
-                normal_style
-            ))
-        story.append(Spacer(1, 12))
-
-    # ---------- ORDER ITEMS ----------
-    story.append(Paragraph("<b>Order Items:</b>", heading_style))
-
-    table_data = [['Service', 'Cloth', 'Quantity', 'Price', 'Total']]
-
-    for item in order_items:
-        table_data.append([
-            item.get('service_name', ''),
-            item.get('cloth_name', ''),
-            str(item.get('quantity', 1)),
-            f"₹{item.get('price', 0):.2f}",
-            f"₹{item.get('total', 0):.2f}",
-        ])
-
-    items_table = Table(
-        table_data,
-        colWidths=[2*inch, 1.5*inch, 1*inch, 1*inch, 1*inch]
-    )
-
-    items_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('ALIGN', (2, 1), (-1, -1), 'CENTER'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-    ]))
-
-    story.append(items_table)
-    story.append(Spacer(1, 20))
-
-    # ---------- PAYMENT SUMMARY ----------
-    story.append(Paragraph("<b>Payment Summary:</b>", heading_style))
-
-    summary_data = [
-        ['Subtotal', f"₹{order.base_amount:.2f}"],
-        ['Platform Fee', f"₹{order.platform_fee:.2f}"],
-        ['Delivery Fee', f"₹{order.delivery_fee:.2f}"],
-        ['GST', f"₹{order.gst_amount:.2f}"],
-        ['Total Paid', f"₹{order.amount:.2f}"],
-    ]
-
-    summary_table = Table(summary_data, colWidths=[4*inch, 2*inch])
-    summary_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-    ]))
-
-    story.append(summary_table)
-    story.append(Spacer(1, 20))
-
-    # ---------- PAYMENT STATUS ----------
-    story.append(Paragraph(
-        "<b>Payment Status: Completed</b>",
-        ParagraphStyle(
-            'PaymentStatus',
-            parent=styles['Normal'],
-            fontSize=12,
-            textColor=colors.green,
-            alignment=1,
-        )
-    ))
-    story.append(Spacer(1, 20))
-
-    # ---------- FOOTER ----------
-    story.append(Paragraph(
-        "Thank you for choosing Shine & Bright Laundry Services!",
-        ParagraphStyle(
-            'Footer',
-            parent=styles['Normal'],
-            fontSize=10,
-            alignment=1,
-            spaceBefore=20,
-        )
-    ))
-    story.append(Paragraph(
-        "🧺✨",
-        ParagraphStyle(
-            'Emoji',
-            parent=styles['Normal'],
-            fontSize=14,
-            alignment=1,
-        )
-    ))
-
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
-
-
 # --- DUMMY DATA (FOR VIEWS) ---
 
 # NOTE: The dashboard template expects a 'cloth_status' list. 
@@ -273,74 +138,6 @@ def get_cloth_status(user):
 
     return result
 
-# --- Notification Helper Functions ---
-
-def create_order_notifications(user):
-    """Create notifications for user's orders if they don't exist."""
-    orders = Order.objects.filter(user=user)
-
-    for order in orders:
-        # Check if notification already exists for this order and status
-        existing_notification = Notification.objects.filter(
-            user=user,
-            title__icontains=f'Order #{order.id}',
-            message__icontains=order.shop.name
-        ).exists()
-
-        if not existing_notification:
-            if order.cloth_status == 'Completed':
-                Notification.objects.create(
-                    user=user,
-                    title=f'Order #{order.id} Completed',
-                    message=f'Your laundry from {order.shop.name} is ready for pickup',
-                    notification_type='completed',
-                    icon='fas fa-check-circle',
-                    color='#28a745'
-                )
-            elif order.cloth_status == 'Ready':
-                Notification.objects.create(
-                    user=user,
-                    title=f'Order #{order.id} Ready for Pickup',
-                    message=f'Your laundry from {order.shop.name} is ready for pickup',
-                    notification_type='ready_pickup',
-                    icon='fas fa-box-open',
-                    color='#f39c12'
-                )
-            elif order.cloth_status == 'Washing':
-                Notification.objects.create(
-                    user=user,
-                    title=f'Order #{order.id} In Progress',
-                    message=f'Your laundry from {order.shop.name} is being washed',
-                    notification_type='status_update',
-                    icon='fas fa-tint',
-                    color='#17a2b8'
-                )
-
-def create_welcome_notifications(user):
-    """Create welcome notifications for new users."""
-    # Check if welcome notification already exists
-    if not Notification.objects.filter(user=user, notification_type='welcome').exists():
-        Notification.objects.create(
-            user=user,
-            title='Welcome to Shine & Bright!',
-            message='Thanks for joining our laundry service. Start by exploring nearby shops.',
-            notification_type='welcome',
-            icon='fas fa-handshake',
-            color='#9b59b6'
-        )
-
-    # Check if profile reminder exists
-    if not Notification.objects.filter(user=user, notification_type='profile_reminder').exists():
-        Notification.objects.create(
-            user=user,
-            title='Complete Your Profile',
-            message='Update your profile with your city information to get personalized service recommendations.',
-            notification_type='profile_reminder',
-            icon='fas fa-user-edit',
-            color='#3498db'
-        )
-
-
 # --- Existing Views ---
 
 def index(request):
@@ -371,7 +168,7 @@ def login_page(request):
             try:
                 profile = getattr(user, "profile", None)
                 if profile and hasattr(profile, "login_email_sent") and not profile.login_email_sent:
-                    send_mail(
+                    queue_email(
                         subject="Login Successful - Shine & Bright",
                         message=f"""
 Hi {user.username},
@@ -386,7 +183,6 @@ If this wasn’t you, please contact support immediately.
 """,
                         from_email=settings.EMAIL_HOST_USER,
                         recipient_list=[user.email],
-                        fail_silently=True,
                     )
 
                     profile.login_email_sent = True
@@ -479,8 +275,7 @@ def signup(request):
         profile.email_verified = True
         profile.save()
 
-        # Notifications
-        create_welcome_notifications(user)
+        # Welcome notifications are created by shop.signals with the user
 
         # Welcome Email (DO NOT REMOVE)
         welcome_message = f"""
@@ -502,12 +297,11 @@ Shine & Bright Team
 """
 
         try:
-            send_mail(
+            queue_email(
                 subject="Welcome to Shine & Bright Laundry Services!",
                 message=welcome_message,
                 from_email=settings.EMAIL_HOST_USER,
                 recipient_list=[email],
-                fail_silently=True,
             )
         except Exception:
             pass
@@ -607,6 +401,11 @@ def user_dashboard(request):
     profile = getattr(request.user, "profile", None)
     user_city = profile.city.strip() if profile and profile.city else None
 
+    # Nearest orderable branches when we know where the user is
+    nearby = []
+    if profile and profile.latitude is not None and profile.longitude is not None:
+        nearby = nearby_branches(profile.latitude, profile.longitude, k=NEARBY_BRANCH_LIMIT)
+
     # ===============================
     # SERVICES & RATINGS LOGIC (Updated for consistency)
     # ===============================
@@ -615,37 +414,26 @@ def user_dashboard(request):
         branch__shop__is_approved=True
     ).select_related("branch", "branch__shop")
 
-    # 2. Filter by City (Restrict to user city if it exists)
-    if user_city:
+    # 2. Restrict to nearby branches, or the user's city without coordinates
+    if nearby:
+        services_qs = services_qs.filter(branch__in=[branch.id for branch in nearby])
+    elif user_city:
         services_qs = services_qs.filter(branch__city__iexact=user_city)    
 
     # 3. Filter by Search Query if provided
     if search_query:
-        services_qs = services_qs.filter(name__icontains=search_query)
+        services_qs = search_queryset(services_qs, search_query)
 
     # 4. ⭐ ANNOTATE: Use "shop_avg_rating" consistently to match your template
+    # (read from the stored rating totals, no join to ServiceRating)
     services_qs = services_qs.annotate(
         # ⭐ Only service ratings (exclude shop/branch ratings)
-        avg_rating=Avg(
-            "servicerating__rating",
-            filter=Q(servicerating__service__isnull=False)
-        ),
-        total_reviews=Count(
-            "servicerating",
-            filter=Q(servicerating__service__isnull=False),
-            distinct=True
-        ),
+        avg_rating=rating_average_expression(),
+        total_reviews=F("rating_count"),
 
         # 🏪 Only shop ratings
-        shop_avg_rating=Avg(
-            "branch__shop__servicerating__rating",
-            filter=Q(branch__shop__servicerating__shop__isnull=False)
-        ),
-        shop_total_reviews=Count(
-            "branch__shop__servicerating",
-            filter=Q(branch__shop__servicerating__shop__isnull=False),
-            distinct=True
-        ),
+        shop_avg_rating=rating_average_expression("branch__shop__"),
+        shop_total_reviews=F("branch__shop__rating_count"),
     )
 
     # 5. ⭐ APPLY RATING FILTER: Use the annotated name "shop_avg_rating"
@@ -660,19 +448,14 @@ def user_dashboard(request):
     # ===============================
     # SHOPS LOGIC (Keeping your existing logic)
     # ===============================
-    nearby_shops_qs = LaundryShop.objects.filter(is_approved=True)
-    if user_city:
-        nearby_shops_qs = nearby_shops_qs.filter(branches__city__iexact=user_city)
-    
-    nearby_shops_qs = nearby_shops_qs.distinct()
-    shops_nearby = nearby_shops_qs[:10]
-    nearby_shop_count = nearby_shops_qs.count()
+    if nearby:
+        shops_nearby, nearby_shop_count = nearby_shops(nearby)
+    else:
+        shops_nearby, nearby_shop_count = approved_shops_in_city(user_city)
 
     # ===============================
     # NOTIFICATIONS (Keeping your existing logic)
     # ===============================
-    create_order_notifications(request.user)
-    create_welcome_notifications(request.user)
 
     recent_notifications = list(
         Notification.objects
@@ -807,12 +590,11 @@ Shine & Bright Team
 
 """
 
-                send_mail(
+                queue_email(
                     subject=" Password Changed - Shine & Bright",
                     message=password_change_message,
                     from_email=settings.EMAIL_HOST_USER,
                     recipient_list=[user.email],
-                    fail_silently=True,
                 )
 
                 messages.success(request, 'Your password was successfully updated! A confirmation email has been sent.')
@@ -863,12 +645,11 @@ Shine & Bright Team
 """
 
         try:
-            send_mail(
+            queue_email(
                 subject="👋 Account Deleted - Shine & Bright",
                 message=deletion_message,
                 from_email=settings.EMAIL_HOST_USER,
                 recipient_list=[user_email],
-                fail_silently=True,
             )
         except:
             # Continue with deletion even if email fails
@@ -888,10 +669,6 @@ Shine & Bright Team
 @login_required
 def notifications_view(request):
     """Renders the Notifications page."""
-    # Ensure notifications are created for the user
-    create_order_notifications(request.user)
-    create_welcome_notifications(request.user)
-
     # Mark all notifications as read when user visits the page
     Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
 
@@ -942,17 +719,33 @@ def my_orders(request):
 
     user_orders = Order.objects.filter(user=request.user)\
         .select_related('shop', 'branch')\
-        .prefetch_related('order_items__service')\
-        .order_by('-created_at')
+        .prefetch_related(
+            Prefetch(
+                'order_items',
+                queryset=OrderItem.objects.select_related('service', 'cloth', 'wash_recommendation')
+            )
+        )
 
-    for order in user_orders:
+    page = keyset_page(
+        user_orders,
+        cursor=request.GET.get('cursor'),
+        ordering=('-created_at', '-id'),
+        page_size=MY_ORDERS_PAGE_SIZE,
+    )
 
-        for item in order.order_items.all():
+    # ✅ All of the user's service ratings at once, keyed by service
+    ratings_by_service = {
+        rating.service_id: rating
+        for rating in ServiceRating.objects.filter(
+            user=request.user,
+            service__isnull=False
+        )
+    }
 
-            item.service_rating = ServiceRating.objects.filter(
-                user=request.user,
-                service_id=item.service_id
-            ).first()
+    for order in page:
+
+        for item in order.order_items.all():
+            item.service_rating = ratings_by_service.get(item.service_id)
 
         # Status display
         if order.payment_status != "Completed":
@@ -961,7 +754,8 @@ def my_orders(request):
             order.display_status = order.cloth_status
 
     return render(request, "orders.html", {
-        "orders": user_orders
+        "orders": page.items,
+        "next_cursor": page.next_cursor,
     })
 
 @login_required
@@ -980,25 +774,19 @@ def shop_detail(request, shop_id):
     shop = get_object_or_404(LaundryShop, id=shop_id, is_approved=True)
 
     # Get all branches for this shop
-    branches = Branch.objects.filter(shop=shop).prefetch_related('services')
-
-    # Add rating data to each branch
-    for branch in branches:
-        branch_ratings = ServiceRating.objects.filter(branch=branch)
-        branch.average_rating = branch_ratings.aggregate(avg=Avg('rating'))['avg'] or 0
-        branch.branch_ratings = branch_ratings
+    branches = shop_branches(shop)
 
     # If shop has only one branch, redirect to branch detail
-    if branches.count() == 1:
-        return redirect('branch_detail', branch_id=branches.first().id)
+    if len(branches) == 1:
+        return redirect('branch_detail', branch_id=branches[0].id)
 
     # Get all services across all branches
-    all_services = Service.objects.filter(branch__shop=shop).select_related('branch')
+    all_services = shop_services(shop)
 
     # Get shop ratings
     shop_ratings = ServiceRating.objects.filter(shop=shop).select_related('user')
     user_rating = ServiceRating.objects.filter(shop=shop, user=request.user).first()
-    average_rating = shop_ratings.aggregate(avg=Avg('rating'))['avg'] or 0
+    average_rating = shop.rating_average
 
     context = {
         'shop': shop,
@@ -1018,7 +806,7 @@ def branch_detail(request, branch_id):
     branch = get_object_or_404(Branch, id=branch_id, shop__is_approved=True)
 
     # Get all services for this branch
-    services = Service.objects.filter(branch=branch)
+    services = branch_services(branch)
 
     # Get service ratings for the user
     for service in services:
@@ -1027,7 +815,7 @@ def branch_detail(request, branch_id):
     # Get branch ratings
     branch_ratings = ServiceRating.objects.filter(branch=branch).select_related('user')
     user_rating = ServiceRating.objects.filter(branch=branch, user=request.user).first()
-    average_rating = branch_ratings.aggregate(avg=Avg('rating'))['avg'] or 0
+    average_rating = branch.rating_average
 
     context = {
         'branch': branch,
@@ -1041,18 +829,50 @@ def branch_detail(request, branch_id):
     return render(request, 'branch_detail.html', context)
 
 
+@login_required
+def nearby_branches_api(request):
+    """JSON list of the nearest orderable branches for the "near me" widget."""
+    try:
+        lat = float(request.GET["lat"])
+        lng = float(request.GET["lng"])
+        k = max(1, min(int(request.GET.get("k", 10)), 50))
+        radius_km = float(request.GET.get("radius", DEFAULT_RADIUS_KM))
+    except (KeyError, ValueError):
+        return JsonResponse({"success": False, "message": "lat and lng are required"}, status=400)
+
+    # float() accepts "nan" and "inf"; NaN fails every comparison below
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return JsonResponse({"success": False, "message": "lat/lng out of range"}, status=400)
+    if not 0 < radius_km < math.inf:
+        return JsonResponse({"success": False, "message": "radius must be a positive number"}, status=400)
+    radius_km = min(radius_km, 200)
+
+    if settings.BRANCH_SPATIAL_INDEX:
+        results = get_branch_index().nearest(lat, lng, k=k, radius_km=radius_km)
+    else:
+        results = [
+            {
+                "branch_id": branch.id,
+                "branch_name": branch.name,
+                "city": branch.city,
+                "shop_id": branch.shop_id,
+                "shop_name": branch.shop.name,
+                "distance_km": branch.distance_km,
+            }
+            for branch in nearby_branches(lat, lng, k=k, radius_km=radius_km)
+        ]
+
+    for row in results:
+        row["distance_km"] = round(row["distance_km"], 2)
+    return JsonResponse({"success": True, "branches": results})
+
+
 @login_required
 def select_branch_for_order(request, shop_id):
     """Customer selects a branch to place an order from."""
     shop = get_object_or_404(LaundryShop, id=shop_id, is_approved=True)
 
-    branches = Branch.objects.filter(shop=shop).prefetch_related('services')
-
-    # Add rating data to each branch
-    for branch in branches:
-        branch_ratings = ServiceRating.objects.filter(branch=branch)
-        branch.average_rating = branch_ratings.aggregate(avg=Avg('rating'))['avg'] or 0
-        branch.branch_ratings = branch_ratings
+    branches = shop_branches(shop)
 
     context = {
         'shop': shop,
@@ -1074,33 +894,15 @@ def select_services(request, shop_id, branch_id=None):
     # ✅ Branch guaranteed from here
     branch = get_object_or_404(Branch, id=branch_id, shop=shop)
 
-    # Services for this branch only
-    services = Service.objects.filter(branch=branch).prefetch_related(
-        'cloth_prices__cloth'
-    )
-
-    service_clothes = {}
-    cloth_prices = {}
-
-    for service in services:
-        service_clothes[service.id] = []
-        cloth_prices[service.id] = {}
-
-        for price_obj in service.cloth_prices.all():
-            # Ensure cloth belongs to this branch
-            if BranchCloth.objects.filter(
-                branch=branch,
-                cloth=price_obj.cloth
-            ).exists():
-                service_clothes[service.id].append(price_obj.cloth)
-                cloth_prices[service.id][price_obj.cloth.id] = float(price_obj.price)
+    # Services, the cloths this branch takes for each and their prices
+    catalog = get_branch_catalog(branch)
 
     context = {
         "shop": shop,
         "branch": branch,
-        "services": services,
-        "service_clothes": service_clothes,
-        "cloth_prices": cloth_prices,
+        "services": catalog.services,
+        "service_clothes": catalog.service_clothes(),
+        "cloth_prices": catalog.cloth_prices(),
     }
 
     return render(request, "select_services.html", context)
@@ -1124,20 +926,48 @@ def create_order(request, shop_id, branch_id):
         messages.error(request, "Please select at least one service.")
         return redirect("select_services", shop_id=shop.id, branch_id=branch.id)
 
+    # ---------- LOAD THE WHOLE CART AT ONCE ----------
+    cart = []
+    for service_id in selected_services:
+        clothes_list = request.POST.getlist(f"clothes_{service_id}")
+        cart.append((service_id, clothes_list))
+
+    try:
+        service_ids = {int(service_id) for service_id, _ in cart}
+        cloth_ids = {int(cloth_id) for _, clothes in cart for cloth_id in clothes}
+    except ValueError:
+        raise Http404("Invalid selection")
+
+    # Same catalog the selection page was rendered from
+    catalog = get_branch_catalog(branch)
+    if any(catalog.service(service_id) is None for service_id in service_ids):
+        raise Http404("Service not found")
+
+    cloths = Cloth.objects.in_bulk(cloth_ids)
+    if len(cloths) != len(cloth_ids):
+        raise Http404("Cloth not found")
+
+    # The cached catalog is for display only: another worker may not
+    # have seen a price change yet, so charge what the database says.
+    prices = {
+        (service_id, cloth_id): price
+        for service_id, cloth_id, price in ServiceClothPrice.objects.filter(
+            service__branch=branch,
+            service_id__in=service_ids,
+            cloth_id__in=cloth_ids,
+            cloth__branch_availability__branch=branch,
+        ).values_list("service_id", "cloth_id", "price")
+    }
+
     total_amount = 0
     order_items_data = []
 
     # ---------- CALCULATE ORDER ----------
-    for service_id in selected_services:
-        service = get_object_or_404(
-            Service,
-            id=service_id,
-            branch=branch
-        )
+    for service_id, clothes_list in cart:
+        service = catalog.service(int(service_id))
 
-        clothes_list = request.POST.getlist(f"clothes_{service_id}")
         if not clothes_list:
-            messages.error(request, f"Select clothes for {service.name}.")
+            messages.error(request, f"Select clothes for {service['name']}.")
             return redirect(
                 "select_services",
                 shop_id=shop.id,
@@ -1145,7 +975,7 @@ def create_order(request, shop_id, branch_id):
             )
 
         for cloth_id in clothes_list:
-            cloth = get_object_or_404(Cloth, id=cloth_id)
+            cloth = cloths[int(cloth_id)]
 
             quantity = int(
                 request.POST.get(
@@ -1154,15 +984,12 @@ def create_order(request, shop_id, branch_id):
             )
             quantity = max(quantity, 1)
 
-            price_obj = ServiceClothPrice.objects.filter(
-                service=service,
-                cloth=cloth
-            ).first()
+            price = prices.get((service["id"], cloth.id))
 
-            if not price_obj:
+            if price is None:
                 messages.error(
                     request,
-                    f"Price not set for {cloth.name} in {service.name}"
+                    f"Price not set for {cloth.name} in {service['name']}"
                 )
                 return redirect(
                     "select_services",
@@ -1170,14 +997,14 @@ def create_order(request, shop_id, branch_id):
                     branch_id=branch.id
                 )
 
-            line_total = price_obj.price * quantity
+            line_total = price * quantity
             total_amount += line_total
 
             order_items_data.append({
                 "service": service,
                 "cloth": cloth,
                 "quantity": quantity,
-                "price": price_obj.price,
+                "price": price,
                 "total": line_total,
             })
 
@@ -1197,73 +1024,69 @@ def create_order(request, shop_id, branch_id):
     
     # ---------------- AI DELIVERY PREDICTION ----------------
 
-    total_items = sum(item["quantity"] for item in order_items_data)
-
-    branch_load = Order.objects.filter(
-        branch=branch,
-        cloth_status__in=["Pending", "Washing", "Drying", "Ironing"]
-    ).count()
-
-    # Use first cloth/service for prediction (can improve later)
-    sample_cloth = order_items_data[0]["cloth"].name
-    sample_service = order_items_data[0]["service"].name
-
-    predicted_hours = predict_delivery_hours(
-        cloth=sample_cloth,
-        service=sample_service,
-        branch_load=branch_load,
-        items=total_items
+    # Score every line; the slowest one decides when the order is ready
+    predicted_hours = predict_delivery_hours_batch(
+        [
+            (item["cloth"].name, item["service"]["name"], item["quantity"])
+            for item in order_items_data
+        ],
+        branch_load=branch_load(branch),
     )
 
     predicted_delivery_time = timezone.now() + timedelta(hours=predicted_hours)
     
     # ---------- CREATE ORDER ----------
-    order = Order.objects.create(
-        user=request.user,
-        shop=shop,
-        branch=branch,
-        base_amount=base_amount,
-        platform_fee=platform_fee,
-        delivery_fee=delivery_fee,
-        gst_amount=gst_amount,
-        amount=final_amount,   # ✅ MUST BE final_amount
-        cloth_status="Pending",
-        payment_status="Pending",
-        predicted_delivery=predicted_delivery_time
-    )
-
-    session_items = []
-
-    for item in order_items_data:
-        order_item = OrderItem.objects.create(
-            order=order,
-            service=item["service"],
-            cloth=item["cloth"],
-            quantity=item["quantity"],
-        )
-
-        # 🤖 AI WASH RECOMMENDATION
-        rec = get_wash_recommendation(
-            cloth_name=item["cloth"].name,
-            service_name=item["service"].name
+    with transaction.atomic():
+        order = Order.objects.create(
+            user=request.user,
+            shop=shop,
+            branch=branch,
+            base_amount=base_amount,
+            platform_fee=platform_fee,
+            delivery_fee=delivery_fee,
+            gst_amount=gst_amount,
+            amount=final_amount,   # ✅ MUST BE final_amount
+            cloth_status="Pending",
+            payment_status="Pending",
+            predicted_delivery=predicted_delivery_time
         )
 
-        WashRecommendation.objects.create(
-            order_item=order_item,
-            water_temperature=rec["water"],
-            wash_cycle=rec["cycle"],
-            detergent=rec["detergent"],
-            drying_method=rec["dry"],
-        )
+        order_items = OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                service_id=item["service"]["id"],
+                cloth=item["cloth"],
+                quantity=item["quantity"],
+            )
+            for item in order_items_data
+        ])
 
+        # 🤖 AI WASH RECOMMENDATION
+        recommendations = []
+        for order_item, item in zip(order_items, order_items_data):
+            rec = get_wash_recommendation(
+                cloth_name=item["cloth"].name,
+                service_name=item["service"]["name"]
+            )
+            recommendations.append(WashRecommendation(
+                order_item=order_item,
+                water_temperature=rec["water"],
+                wash_cycle=rec["cycle"],
+                detergent=rec["detergent"],
+                drying_method=rec["dry"],
+            ))
+        WashRecommendation.objects.bulk_create(recommendations)
 
-        session_items.append({
-            "service_name": item["service"].name,
+    session_items = [
+        {
+            "service_name": item["service"]["name"],
             "cloth_name": item["cloth"].name,
             "quantity": item["quantity"],
             "price": float(item["price"]),
             "total": float(item["total"]),
-        })
+        }
+        for item in order_items_data
+    ]
 
     # ---------- SESSION ----------
     request.session["order_id"] = order.id
@@ -1412,14 +1235,41 @@ def payment_success(request):
     ):
         return JsonResponse({"success": False, "message": "Payment verification failed"}, status=400)
 
-    order.razorpay_payment_id = razorpay_payment_id
-    order.payment_status = "Completed"
-    order.cloth_status = "Pickup"
-    order.save()
+    with transaction.atomic():
+        order.razorpay_payment_id = razorpay_payment_id
+        order.payment_status = "Completed"
+        order.cloth_status = "Pickup"
+        order.save()
+        request_receipt(order)
 
     return JsonResponse({"success": True})
 
 
+@login_required
+def download_receipt(request, order_id):
+    """The order's PDF receipt, revalidated by ETag and streamed from storage."""
+    orders = Order.objects.select_related('user')
+    if not request.user.is_staff:
+        orders = orders.filter(user=request.user)
+    order = get_object_or_404(orders, id=order_id, payment_status="Completed")
+
+    receipt = current_receipt(order)
+    etag = f'"{receipt.content_hash}"'
+
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(
+            receipt_storage().open(receipt.file_name, 'rb'),
+            as_attachment=True,
+            filename=f"receipt-{order.id}.pdf",
+            content_type='application/pdf',
+        )
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 @login_required
 def payment_failed(request):
     """Handle failed payment (ALLOW RETRY)."""
@@ -1461,11 +1311,7 @@ def admin_orders(request):
         orders = orders.filter(cloth_status=status_filter)
 
     if search_query:
-        orders = orders.filter(
-            Q(user__username__icontains=search_query) |
-            Q(user__email__icontains=search_query) |
-            Q(id__icontains=search_query)
-        )
+        orders = orders.filter(order_search_filter(search_query))
 
     # Only show orders from approved shops that are visible in admin dashboard
     approved_shops = LaundryShop.objects.filter(is_approved=True)
@@ -1474,7 +1320,7 @@ def admin_orders(request):
     orders = orders.filter(shop__is_approved=True)
 
     context = {
-        'orders': orders,
+        'orders': paginate(request, orders, ('-created_at', '-id'), ADMIN_PAGE_SIZE, count=True),
         'status_choices': Order.STATUS_CHOICES,
         'current_status': status_filter,
         'search_query': search_query,
@@ -1489,36 +1335,16 @@ def admin_dashboard(request):
     """Admin dashboard with statistics and management tools."""
     status_filter = request.GET.get('status', '')
     search_query = request.GET.get('search', '')
-    search_query = request.GET.get('search', '')
     users = User.objects.all().order_by('-date_joined')
     shops = LaundryShop.objects.all().order_by('name')
 
     orders = Order.objects.select_related('user', 'shop').order_by('-created_at')
-    pending_approvals = LaundryShop.objects.filter(is_approved=False).count()
     has_seen_notifs = request.session.get('admin_seen_notifications', False)
 
-    now = timezone.now()
-    delayed_orders = Order.objects.filter(
-        payment_status="Completed",
-        delivery_date__isnull=False,
-        delivery_date__lt=now,
-        cloth_status__in=['Pending', 'Washing', 'Drying', 'Ironing']
-    )
-
-    show_indicator = (
-        pending_approvals + delayed_orders.count() > 0
-    ) and not has_seen_notifs
-
-
-    today = timezone.now().date()
+    today = timezone.localdate()
     now = timezone.now()
     if search_query:
-        users = users.filter(
-            Q(username__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query)
-        )
+        users = search_queryset(users, search_query, ranked=False)
     
     # 🔒 BASE QUERY → ONLY PAID ORDERS
     paid_orders = Order.objects.filter(payment_status="Completed")
@@ -1527,11 +1353,7 @@ def admin_dashboard(request):
         orders = orders.filter(cloth_status=status_filter)
 
     if search_query:
-        orders = orders.filter(
-            Q(user__username__icontains=search_query) |
-            Q(user__email__icontains=search_query) |
-            Q(id__icontains=search_query)
-        )
+        orders = orders.filter(order_search_filter(search_query))
 
     # Only show orders from approved shops that are visible in admin dashboard
     approved_shops = LaundryShop.objects.filter(is_approved=True)
@@ -1539,27 +1361,6 @@ def admin_dashboard(request):
     # Filter orders to only show those from approved shops
     orders = orders.filter(shop__is_approved=True)
 
-    # =====================
-    # 📊 STATISTICS
-    # =====================
-    total_orders = paid_orders.count()
-
-    pending_orders = paid_orders.filter(cloth_status="Pending").count()
-    washing_orders = paid_orders.filter(cloth_status="Washing").count()
-    ready_orders = paid_orders.filter(cloth_status="Ready").count()
-    completed_orders = paid_orders.filter(cloth_status="Completed").count()
-
-    # =====================
-    # 💰 REVENUE
-    # =====================
-    total_revenue = paid_orders.aggregate(
-        total=Sum('amount')
-    )['total'] or 0
-
-    today_revenue = paid_orders.filter(
-        created_at__date=today
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
     # =====================
     # 📅 DATE RANGE (7 / 30 / 90)
     # =====================
@@ -1571,58 +1372,17 @@ def admin_dashboard(request):
         range_days = 7
 
     # =====================
-    # 📈 CHART DATA (DYNAMIC RANGE)
-    # =====================
-    chart_labels = []
-    revenue_chart_data = []
-    orders_chart_data = []
-
-    for i in range(range_days - 1, -1, -1):
-        day = today - timedelta(days=i)
-        chart_labels.append(day.strftime("%b %d"))
-
-        daily_revenue = paid_orders.filter(
-            created_at__date=day
-        ).aggregate(total=Sum('amount'))['total'] or 0
-
-        daily_orders = paid_orders.filter(
-            created_at__date=day
-        ).count()
-
-        revenue_chart_data.append(float(daily_revenue))
-        orders_chart_data.append(daily_orders)
-
-
-    # =====================
-    # 👤 USERS
-    # =====================
-    total_users = User.objects.count()
-    new_users_today = User.objects.filter(
-        date_joined__date=today
-    ).count()
-
-    # =====================
-    # 🏪 SHOPS
+    # 📊 STATISTICS, 💰 REVENUE, 📈 CHART, 👤 USERS, 🏪 SHOPS
     # =====================
-    total_shops = LaundryShop.objects.count()
-    open_shops = LaundryShop.objects.filter(is_open=True).count()
-    pending_approvals = LaundryShop.objects.filter(is_approved=False).count()
+    stats = admin_dashboard_stats(range_days=range_days, today=today)
+    status_counts = stats["status_counts"]
+    pending_approvals = stats["pending_approvals"]
 
     # =====================
     # 📦 RECENT PAID ORDERS
     # =====================
     recent_orders = paid_orders.order_by('-created_at')[:10]
 
-    # =====================
-    # 📊 ORDERS BY STATUS (PAID ONLY)
-    # =====================
-    orders_by_status = (
-        paid_orders
-        .values('cloth_status')
-        .annotate(count=Count('id'))
-        .order_by('cloth_status')
-    )
-
     # =====================
     # 🧑‍🤝‍🧑 RECENT USERS
     # =====================
@@ -1631,7 +1391,6 @@ def admin_dashboard(request):
     # =====================
     # 🏢 BRANCHES
     # =====================
-    total_branches = Branch.objects.count()
     recent_branches = Branch.objects.select_related('shop').order_by('-created_at')[:10]
 
     # =====================
@@ -1644,39 +1403,52 @@ def admin_dashboard(request):
         delivery_date__lt=now,
         cloth_status__in=['Pending', 'Washing', 'Drying', 'Ironing']
     ).order_by('delivery_date')
+    delayed_orders_count = delayed_orders.count()
+
+    show_indicator = (
+        pending_approvals + delayed_orders_count > 0
+    ) and not has_seen_notifs
 
     # =====================
     # 🧠 CONTEXT
     # =====================
     context = {
         # Stats
-        'total_orders': total_orders,
-        'pending_orders': pending_orders,
-        'washing_orders': washing_orders,
-        'ready_orders': ready_orders,
-        'completed_orders': completed_orders,
-        'orders': orders,
+        'total_orders': stats['total_orders'],
+        'pending_orders': status_counts.get('Pending', 0),
+        'washing_orders': status_counts.get('Washing', 0),
+        'ready_orders': status_counts.get('Ready', 0),
+        'completed_orders': status_counts.get('Completed', 0),
+        # First pages; the tables page on through their partial endpoints
+        'orders': paginate(
+            request, orders, ('-created_at', '-id'), ADMIN_PAGE_SIZE,
+            path=reverse('admin_orders_filter'),
+            params={'search': search_query, 'status': status_filter},
+            count=True,
+        ),
         'status_choices': Order.STATUS_CHOICES,
         'current_status': status_filter,
         'search_query': search_query,
-        'all_shops': approved_shops,
         
-        'total_revenue': total_revenue,
-        'today_revenue': today_revenue,
+        'total_revenue': stats['total_revenue'],
+        'today_revenue': stats['today_revenue'],
 
-        'total_users': total_users,
-        'new_users_today': new_users_today,
+        'total_users': stats['total_users'],
+        'new_users_today': stats['new_users_today'],
 
-        'total_shops': total_shops,
-        'open_shops': open_shops,
-        'pending_approvals': pending_approvals,
+        'total_shops': stats['total_shops'],
+        'open_shops': stats['open_shops'],
 
-        'total_branches': total_branches,
-        'users': users,
-        'search_query': search_query,
+        'total_branches': stats['total_branches'],
+        'users': paginate(
+            request, users, ('-date_joined', '-id'), ADMIN_PAGE_SIZE,
+            path=reverse('admin_user_search'),
+            params={'q': search_query},
+            count=True,
+        ),
         # Data
         'recent_orders': recent_orders,
-        'orders_by_status': orders_by_status,
+        'orders_by_status': stats['orders_by_status'],
         'recent_users': recent_users,
         'recent_branches': recent_branches,
         'all_shops': LaundryShop.objects.all(),
@@ -1684,12 +1456,11 @@ def admin_dashboard(request):
         'shops': shops,
         'show_notification_indicator': show_indicator,
         'pending_approvals': pending_approvals,
-        'delayed_orders_count': delayed_orders.count(),
         'delayed_orders': delayed_orders,
-        'delayed_orders_count': delayed_orders.count(),
-        'chart_labels': chart_labels,
-        'revenue_chart_data': revenue_chart_data,
-        'orders_chart_data': orders_chart_data,
+        'delayed_orders_count': delayed_orders_count,
+        'chart_labels': stats['chart_labels'],
+        'revenue_chart_data': stats['revenue_chart_data'],
+        'orders_chart_data': stats['orders_chart_data'],
         'range_days': range_days,
     }
 
@@ -1704,15 +1475,12 @@ def mark_admin_notifications_read(request):
 def admin_user_search(request):
     query = request.GET.get("q", "")
 
-    users = User.objects.filter(
-        Q(username__icontains=query) |
-        Q(email__icontains=query) |
-        Q(first_name__icontains=query) |
-        Q(last_name__icontains=query)
-    )
+    users = User.objects.all()
+    if query.strip():
+        users = search_queryset(users, query, ranked=False)
 
     return render(request, "admin/partials/users_table.html", {
-        "users": users
+        "users": paginate(request, users, ("-date_joined", "-id"), ADMIN_PAGE_SIZE, count=True),
     })
 
 @login_required
@@ -1746,18 +1514,18 @@ def admin_update_order_status(request, order_id):
                 return JsonResponse({'success': False, 'message': 'Invalid or unapproved shop selected'}, status=400)
 
         if changes_made:
-            order.save()
+            with transaction.atomic():
+                order.save()
 
-            # Create notification for user
-            create_status_update_notification(
-                user=order.user,
-                title="Order Status Updated",
-                message=f"Your Order #{order.id} status changed to {order.cloth_status}."
-            )
-            (order, new_status)
+                # Create notification for user
+                create_status_update_notification(
+                    user=order.user,
+                    title="Order Status Updated",
+                    message=f"Your Order #{order.id} status changed to {order.cloth_status}."
+                )
+                (order, new_status)
 
-            # Send notification emails
-            try:
+                # Queue notification emails
                 # Email to Customer
                 customer_subject = f"Order Updated - Order #{order.id}"
                 customer_message = f"""
@@ -1809,12 +1577,11 @@ Shine & Bright System
 🧺✨
 """
 
-                    send_mail(
+                    queue_email(
                         subject=new_shop_subject,
                         message=new_shop_message,
                         from_email=settings.EMAIL_HOST_USER,
                         recipient_list=[order.shop.email],
-                        fail_silently=True,
                     )
 
                     # Email to Old Shop (if shop changed)
@@ -1835,12 +1602,11 @@ Shine & Bright System
 🧺✨
 """
 
-                        send_mail(
+                        queue_email(
                             subject=old_shop_subject,
                             message=old_shop_message,
                             from_email=settings.EMAIL_HOST_USER,
                             recipient_list=[old_shop.email],
-                            fail_silently=True,
                         )
 
                 # Email to Shop for status updates
@@ -1865,26 +1631,21 @@ Shine & Bright System
 🧺✨
 """
 
-                    send_mail(
+                    queue_email(
                         subject=shop_subject,
                         message=shop_message,
                         from_email=settings.EMAIL_HOST_USER,
                         recipient_list=[order.shop.email],
-                        fail_silently=True,
                     )
 
                 # Send email to customer
-                send_mail(
+                queue_email(
                     subject=customer_subject,
                     message=customer_message,
                     from_email=settings.EMAIL_HOST_USER,
                     recipient_list=[order.user.email],
-                    fail_silently=True,
                 )
 
-            except Exception as e:
-                print(f"Failed to send update emails: {e}")
-
             return JsonResponse({'success': True, 'message': f'Order updated successfully: {", ".join(changes_made)}'})
         else:
             return JsonResponse({'success': False, 'message': 'No changes made'}, status=400)
@@ -1907,21 +1668,23 @@ def admin_payments(request):
         orders = orders.filter(payment_status=payment_status_filter)
 
     if search_query:
-        orders = orders.filter(
-            Q(user__username__icontains=search_query) |
-            Q(user__email__icontains=search_query) |
-            Q(id__icontains=search_query)
-        )
+        orders = orders.filter(order_search_filter(search_query))
 
     # Only show orders from approved shops
     orders = orders.filter(shop__is_approved=True)
 
     # Calculate total revenue for filtered orders
-    total_revenue = orders.aggregate(total=Sum('amount'))['total'] or 0
+    if search_query:
+        total_revenue = orders.aggregate(total=Sum('amount'))['total'] or 0
+    else:
+        rollup = revenue_rows(shop__is_approved=True)
+        if payment_status_filter:
+            rollup = rollup.filter(payment_status=payment_status_filter)
+        total_revenue = rollup.aggregate(total=Sum('revenue'))['total'] or 0
 
     context = {
-        'orders': orders,
-        'payment_status_choices': Order.PAYMENT_STATUS_CHOICES,
+        'orders': paginate(request, orders, ('-created_at', '-id'), ADMIN_PAGE_SIZE, count=True),
+        'payment_status_choices': Order.PAYMENT_CHOICES,
         'current_payment_status': payment_status_filter,
         'search_query': search_query,
         'total_revenue': total_revenue,
@@ -1930,6 +1693,34 @@ def admin_payments(request):
     return render(request, 'admin_orders.html', context)  # Reuse the same template
 
 
+@login_required
+@user_passes_test(is_staff_user, login_url='login')
+def admin_export_orders(request):
+    """Stream orders with items and fees as CSV or JSON lines for finance."""
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in FORMATS:
+        return JsonResponse({'success': False, 'message': 'format must be csv or jsonl'}, status=400)
+
+    try:
+        start = parse_day(request.GET.get('start'), 'start')
+        end = parse_day(request.GET.get('end'), 'end')
+        cursor = parse_cursor(request.GET.get('cursor'), 'cursor')
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    shop_id = request.GET.get('shop')
+    if shop_id and not shop_id.isdigit():
+        return JsonResponse({'success': False, 'message': 'shop must be a shop id'}, status=400)
+
+    orders = export_queryset(start, end, shop_id, request.GET.get('payment_status'))
+    records = export_records(orders, cursor=cursor)
+
+    response = StreamingHttpResponse(export_lines(records, fmt), content_type=FORMATS[fmt])
+    filename = f"orders-{timezone.localdate():%Y%m%d}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required
 @user_passes_test(is_staff_user, login_url='login')
 def admin_revenue_orders(request):
@@ -1943,20 +1734,22 @@ def admin_revenue_orders(request):
         orders = orders.filter(cloth_status=status_filter)
 
     if search_query:
-        orders = orders.filter(
-            Q(user__username__icontains=search_query) |
-            Q(user__email__icontains=search_query) |
-            Q(id__icontains=search_query)
-        )
+        orders = orders.filter(order_search_filter(search_query))
 
     # Only show orders from approved shops
     orders = orders.filter(shop__is_approved=True)
 
     # Calculate total revenue for filtered orders
-    total_revenue = orders.aggregate(total=Sum('amount'))['total'] or 0
+    if search_query:
+        total_revenue = orders.aggregate(total=Sum('amount'))['total'] or 0
+    else:
+        rollup = revenue_rows(shop__is_approved=True)
+        if status_filter:
+            rollup = rollup.filter(cloth_status=status_filter)
+        total_revenue = rollup.aggregate(total=Sum('revenue'))['total'] or 0
 
     context = {
-        'orders': orders,
+        'orders': paginate(request, orders, ('-amount', '-id'), ADMIN_PAGE_SIZE, count=True),
         'status_choices': Order.STATUS_CHOICES,
         'current_status': status_filter,
         'search_query': search_query,
@@ -1975,15 +1768,10 @@ def admin_users(request):
     users = User.objects.all().order_by('-date_joined')
     
     if search_query:
-        users = users.filter(
-            Q(username__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query)
-        )
+        users = search_queryset(users, search_query, ranked=False)
     
     context = {
-        'users': users,
+        'users': paginate(request, users, ('-date_joined', '-id'), ADMIN_PAGE_SIZE, count=True),
         'search_query': search_query,
     }
     
@@ -1994,10 +1782,10 @@ def admin_users(request):
 @user_passes_test(is_staff_user, login_url='login')
 def admin_shops(request):
     """View and manage shops."""
-    shops = LaundryShop.objects.all().order_by('name')
+    shops = LaundryShop.objects.all()
 
     context = {
-        'shops': shops,
+        'shops': paginate(request, shops, ('name', 'id'), ADMIN_PAGE_SIZE, count=True),
     }
 
     return render(request, 'admin_shops.html', context)
@@ -2007,10 +1795,10 @@ def admin_shops(request):
 @user_passes_test(is_staff_user, login_url='login')
 def admin_open_shops(request):
     """View only open shops."""
-    shops = LaundryShop.objects.filter(is_open=True).order_by('name')
+    shops = LaundryShop.objects.filter(is_open=True)
 
     context = {
-        'shops': shops,
+        'shops': paginate(request, shops, ('name', 'id'), ADMIN_PAGE_SIZE, count=True),
     }
 
     return render(request, 'admin_shops.html', context)
@@ -2029,13 +1817,14 @@ def admin_shop_detail(request, shop_id):
     recent_orders = Order.objects.filter(shop=shop).select_related('user', 'branch').order_by('-created_at')[:10]
 
     # Statistics
-    total_orders = Order.objects.filter(shop=shop).count()
-    completed_orders = Order.objects.filter(shop=shop, cloth_status='Completed').count()
-    total_revenue = Order.objects.filter(shop=shop).aggregate(total=Sum('amount'))['total'] or 0
+    shop_summary = summarize(revenue_rows(shop=shop))
+    total_orders = shop_summary['total_orders']
+    completed_orders = shop_summary['by_status'].get('Completed', 0)
+    total_revenue = shop_summary['total_revenue']
 
     # Shop ratings
     shop_ratings = ServiceRating.objects.filter(shop=shop).select_related('user')
-    average_rating = shop_ratings.aggregate(avg=Avg('rating'))['avg'] or 0
+    average_rating = shop.rating_average
 
     context = {
         'shop': shop,
@@ -2245,7 +2034,7 @@ def shop_notifications(request):
             'time': n.created_at,
             'icon': n.icon or 'fas fa-bell',
             'color': n.color or '#1a365d',
-            'is_alert': n.notification_type == "shop_order_reminder"
+            'is_alert': n.notification_type in ("shop_order_reminder", "shop_overdue")
         })
 
     # 3. 📦 DYNAMIC ORDER HISTORY (New Orders & Payments)
@@ -2291,12 +2080,13 @@ def shop_dashboard(request):
     paid_orders = Order.objects.filter(shop=shop, payment_status="Completed")
     one_week_ago = timezone.now() - timedelta(days=7)
     
-    # 2. Stats
-    total_orders = paid_orders.count()
-    pending_orders = paid_orders.filter(cloth_status="Pending").count()
-    completed_orders = paid_orders.filter(cloth_status="Completed").count()
-    total_revenue = paid_orders.aggregate(total=Sum('amount'))['total'] or 0
-    today_revenue = paid_orders.filter(created_at__date=timezone.now().date()).aggregate(total=Sum('amount'))['total'] or 0
+    # 2. Stats (from the daily revenue rollup)
+    paid_summary = summarize(revenue_rows(shop=shop, payment_status="Completed"))
+    total_orders = paid_summary['total_orders']
+    pending_orders = paid_summary['by_status'].get("Pending", 0)
+    completed_orders = paid_summary['by_status'].get("Completed", 0)
+    total_revenue = paid_summary['total_revenue']
+    today_revenue = paid_summary['today_revenue']
 
     # 3. Tables
     incomplete_payment_orders = Order.objects.filter(
@@ -2320,22 +2110,8 @@ def shop_dashboard(request):
         star: (rating_map.get(star, 0) / total_reviews) * 100
         for star in range(1, 6)
     }
-    # 4. Branch Stats Loop
-    branch_stats = []
-    for branch in branches:
-        branch_paid = paid_orders.filter(branch=branch)
-        branch_ratings = ServiceRating.objects.filter(branch=branch)
-        avg_rating = branch_ratings.aggregate(avg=Avg('rating'))['avg'] or 0
-
-        branch_stats.append({
-            'branch': branch,
-            'total_orders': branch_paid.count(),
-            'pending_orders': branch_paid.filter(cloth_status="Pending").count(),
-            'completed_orders': branch_paid.filter(cloth_status="Completed").count(),
-            'revenue': branch_paid.aggregate(total=Sum('amount'))['total'] or 0,
-            'average_rating': avg_rating,
-            'total_ratings': branch_ratings.count(),
-        })
+    # 4. Branch Stats (two grouped queries for all branches)
+    branch_stats_data = branch_stats(shop, branches)
 
     # ========================================================
     # 🔔 NOTIFICATIONS & DELAYED (MOVED OUTSIDE THE LOOP) ✅
@@ -2349,21 +2125,21 @@ def shop_dashboard(request):
         delivery_date__lt=now, 
         cloth_status__in=['Pending', 'Washing', 'Drying', 'Ironing']
     ).order_by('delivery_date')
-    pending_count = Order.objects.filter(
-        shop=shop,
-        payment_status="Completed",
-        cloth_status="Pending"
-    ).count()
+    pending_count = pending_orders
 
-    # DB Notifications (Handle unread_count BEFORE slicing)
+    # DB Notifications: counts in one query, only the newest few are displayed
     db_notifs_query = Notification.objects.filter(shop=shop).order_by("-created_at")
+    db_counts = db_notifs_query.aggregate(
+        total=Count('id'),
+        unread=Count('id', filter=Q(is_read=False)),
+    )
     unread_count = (
-        db_notifs_query.filter(is_read=False).count()
+        db_counts['unread']
         + (1 if pending_count > 0 else 0)
     )
 
 
-    for n in db_notifs_query:
+    for n in db_notifs_query[:5]:
         shop_notifications.append({
             "title": n.title, 
             "message": n.message, 
@@ -2375,7 +2151,6 @@ def shop_dashboard(request):
         })
 
     # 2. ADD SYSTEM ALERTS (Pending Orders)
-    pending_count = Order.objects.filter(shop=shop, payment_status="Completed", cloth_status="Pending").count()
     if pending_count > 0:
         shop_notifications.append({
             "title": "Action Required!",
@@ -2387,9 +2162,11 @@ def shop_dashboard(request):
             "is_alert": True
         })
 
-    # 3. ADD RECENT ORDER LOGIC (Auto-generated)
-    notif_recent_orders = Order.objects.filter(shop=shop).order_by('-created_at')[:5]
-    for order in notif_recent_orders:
+    # 3. ADD RECENT ORDER LOGIC (Auto-generated, one fetch for both feeds)
+    recent_orders_notif = list(
+        Order.objects.filter(shop=shop).select_related('user').order_by('-created_at')[:10]
+    )
+    for order in recent_orders_notif[:5]:
         if order.payment_status != "Completed":
             shop_notifications.append({
                 "title": f"Unpaid Order #{order.id}",
@@ -2402,7 +2179,6 @@ def shop_dashboard(request):
             "title": "Welcome", "message": "Dashboard Ready", "time": now,
             "icon": "fas fa-store", "color": "#3498db", "is_read": True,
         })
-    recent_orders_notif = Order.objects.filter(shop=shop).order_by('-created_at')[:10]
     for order in recent_orders_notif:
         if order.payment_status != "Completed":
             shop_notifications.append({
@@ -2417,11 +2193,13 @@ def shop_dashboard(request):
                 "time": order.created_at, "icon": "fas fa-shopping-cart", "color": "#28a745", "is_read": True,
             })
     shop_notifications.sort(key=lambda x: x["time"], reverse=True)
-    final_notifications = shop_notifications[:5]
+    total_notifications_count = (
+        len(shop_notifications) + max(db_counts['total'] - 5, 0)
+    )
 
     # Ratings
     shop_ratings = ServiceRating.objects.filter(shop=shop).select_related('user')
-    average_rating = shop_ratings.aggregate(avg=Avg('rating'))['avg'] or 0
+    average_rating = shop.rating_average
     limited_notifications = shop_notifications[:3]
     context = {
         'shop': shop,
@@ -2434,7 +2212,7 @@ def shop_dashboard(request):
         'recent_orders': recent_orders,
         'incomplete_payment_orders': incomplete_payment_orders,
         'incomplete_payment_count': incomplete_payment_orders.count(),
-        'branch_stats': branch_stats,
+        'branch_stats': branch_stats_data,
         'shop_ratings': shop_ratings,
         'average_rating': average_rating,
         'delayed_orders': delayed_orders,
@@ -2442,7 +2220,7 @@ def shop_dashboard(request):
         'now': now,
         'unread_count': unread_count,
         "rating_percentages": rating_percentages,
-        'total_notifications_count': len(shop_notifications),
+        'total_notifications_count': total_notifications_count,
         'shop_notifications': limited_notifications, # dropdown only gets 3
         
     }
@@ -2478,20 +2256,21 @@ def branch_orders(request, branch_id):
     # ==========================
     branch_orders_qs = Order.objects.filter(branch=branch).order_by('-created_at')
 
-    total_orders = branch_orders_qs.count()
+    branch_summary = summarize(revenue_rows(branch=branch))
+    by_status = branch_summary['by_status']
+
+    total_orders = branch_summary['total_orders']
 
-    pending_orders = branch_orders_qs.filter(cloth_status="Pending").count()
-    washing_orders = branch_orders_qs.filter(cloth_status="Washing").count()
-    drying_orders = branch_orders_qs.filter(cloth_status="Drying").count()
-    ironing_orders = branch_orders_qs.filter(cloth_status="Ironing").count()
-    ready_orders = branch_orders_qs.filter(cloth_status="Ready").count()
-    completed_orders = branch_orders_qs.filter(cloth_status="Completed").count()
+    pending_orders = by_status.get("Pending", 0)
+    washing_orders = by_status.get("Washing", 0)
+    drying_orders = by_status.get("Drying", 0)
+    ironing_orders = by_status.get("Ironing", 0)
+    ready_orders = by_status.get("Ready", 0)
+    completed_orders = by_status.get("Completed", 0)
 
-    total_revenue = branch_orders_qs.aggregate(total=Sum('amount'))['total'] or 0
+    total_revenue = branch_summary['total_revenue']
 
-    today_revenue = branch_orders_qs.filter(
-        created_at__date=datetime.now().date()
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    today_revenue = branch_summary['today_revenue']
 
     active_orders = branch_orders_qs.filter(
         payment_status="Completed"
@@ -2550,25 +2329,22 @@ def branch_orders(request, branch_id):
     # ⭐ SERVICE RATINGS (FIXED PROPERLY)
     # ==========================
     service_ratings_data = []
-    branch_avg_rating = 0
-
-    branch_services = Service.objects.filter(branch=branch)
-
-    for service in branch_services:
-        ratings = ServiceRating.objects.filter(service=service)
-
-        avg_rating = ratings.aggregate(avg=Avg("rating"))["avg"] or 0
-        total_reviews = ratings.count()
+    branch_rating_sum = 0
+    branch_rating_count = 0
 
+    for service in Service.objects.filter(branch=branch):
         service_ratings_data.append({
             "service": service,
-            "average_rating": round(avg_rating, 1),
-            "total_reviews": total_reviews,
+            "average_rating": round(service.rating_average, 1),
+            "total_reviews": service.rating_count,
         })
+        branch_rating_sum += service.rating_sum
+        branch_rating_count += service.rating_count
 
-    branch_avg_rating = ServiceRating.objects.filter(
-        service__branch=branch
-    ).aggregate(avg=Avg("rating"))["avg"] or 0
+    # Average over all service ratings at this branch
+    branch_avg_rating = (
+        branch_rating_sum / branch_rating_count if branch_rating_count else 0
+    )
 
     # ==========================
     # 📤 CONTEXT
@@ -2636,18 +2412,18 @@ def shop_update_order_status(request, order_id):
     old_status = order.cloth_status
 
     # ✅ Update status
-    order.cloth_status = new_status
-    order.save()
+    with transaction.atomic():
+        order.cloth_status = new_status
+        order.save()
 
-    # 🔔 Create notification for user
-    create_status_update_notification(
-        user=order.user,
-        title="Order Status Updated",
-        message=f"Your Order #{order.id} status changed to {new_status}."
-    )
+        # 🔔 Create notification for user
+        create_status_update_notification(
+            user=order.user,
+            title="Order Status Updated",
+            message=f"Your Order #{order.id} status changed to {new_status}."
+        )
 
-    # 📧 Send notification emails
-    try:
+        # 📧 Queue notification emails
         # Email to Customer
         customer_subject = f"Order Status Updated - Order #{order.id}"
         customer_message = f"""
@@ -2673,21 +2449,23 @@ Best regards,
 🧺✨
 """
 
-        send_mail(
+        queue_email(
             subject=customer_subject,
             message=customer_message,
             from_email=settings.EMAIL_HOST_USER,
             recipient_list=[order.user.email],
-            fail_silently=True,
         )
 
-        # Email to Admin
-        admin_user = (
-            User.objects.filter(is_superuser=True).first()
-            or User.objects.filter(is_staff=True).first()
+        # Email to Admin (superusers first, then staff)
+        admin_email = (
+            User.objects
+            .filter(Q(is_superuser=True) | Q(is_staff=True))
+            .order_by('-is_superuser', 'id')
+            .values_list('email', flat=True)
+            .first()
         )
 
-        if admin_user and admin_user.email:
+        if admin_email:
             admin_subject = f"Order Status Updated by Shop - Order #{order.id}"
             admin_message = f"""
 Dear Admin,
@@ -2704,17 +2482,13 @@ Best regards,
 Shine & Bright System
 """
 
-            send_mail(
+            queue_email(
                 subject=admin_subject,
                 message=admin_message,
                 from_email=settings.EMAIL_HOST_USER,
-                recipient_list=[admin_user.email],
-                fail_silently=True,
+                recipient_list=[admin_email],
             )
 
-    except Exception as e:
-        print(f"Failed to send status update emails: {e}")
-
     return JsonResponse(
         {'success': True, 'message': 'Order status updated successfully'}
     )
@@ -3025,16 +2799,8 @@ def rate_shop(request, shop_id):
 
         shop = get_object_or_404(LaundryShop, id=shop_id)
 
-        # ✅ Use update_or_create to allow users to update their review 
-        # instead of creating multiple entries for the same shop
-        ServiceRating.objects.update_or_create(
-            user=request.user,
-            shop=shop,
-            defaults={
-                "rating": rating_value,
-                "comment": comment_text
-            }
-        )
+        # ✅ One review per user per shop; updating it adjusts the shop totals
+        save_rating(request.user, shop, rating_value, comment_text)
 
         return JsonResponse({"success": True})
     # ... rest of your error handling ...
@@ -3057,17 +2823,14 @@ def rate_service(request, service_id):
     service = get_object_or_404(Service, id=service_id)
 
     if request.method == "POST":
-        rating = request.POST.get("rating")
+        rating = request.POST.get("rating", "")
         comment = request.POST.get("comment", "")
 
-        ServiceRating.objects.update_or_create(
-            user=request.user,
-            service=service,
-            defaults={
-                "rating": rating,
-                "comment": comment
-            }
-        )
+        if not rating.isdigit() or not (1 <= int(rating) <= 5):
+            messages.error(request, "Please select a rating between 1 and 5.")
+            return redirect("orders")
+
+        save_rating(request.user, service, rating, comment)
 
         messages.success(request, "Service rated successfully!")
         return redirect("orders")
@@ -3087,21 +2850,11 @@ def rate_branch(request, branch_id):
 
     rating = int(rating)
 
-    # Check if user already rated this branch
-    existing_rating = ServiceRating.objects.filter(user=request.user, branch=branch).first()
-    if existing_rating:
-        existing_rating.rating = rating
-        existing_rating.comment = comment
-        existing_rating.save()
-        message = 'Your rating has been updated successfully!'
-    else:
-        ServiceRating.objects.create(
-            user=request.user,
-            branch=branch,
-            rating=rating,
-            comment=comment
-        )
+    _, created = save_rating(request.user, branch, rating, comment)
+    if created:
         message = 'Thank you for rating this branch!'
+    else:
+        message = 'Your rating has been updated successfully!'
 
     return JsonResponse({'success': True, 'message': message})
 
@@ -3120,7 +2873,7 @@ def shop_reset_request(request):
         reset_link = request.build_absolute_uri(
             reverse("shop_reset_confirm", args=[token])
         )
-        send_mail(
+        queue_email(
             "Shop Password Reset - Shine & Bright",
             f"Click to reset your password:\n{reset_link}",
             settings.EMAIL_HOST_USER,
@@ -3178,14 +2931,13 @@ def newsletter_subscribe(request):
             {"shops": shops}
         )
 
-        email_message = EmailMessage(
+        queue_email(
             subject=subject,
-            body=html_message,
+            message=html_message,
             from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[email],
+            recipient_list=[email],
+            html=True,
         )
-        email_message.content_subtype = "html"
-        email_message.send(fail_silently=True)
 
         messages.success(request, "Subscribed successfully! Shop details sent to your email.")
         return redirect(request.META.get("HTTP_REFERER", "/"))
@@ -3228,16 +2980,13 @@ def forgot_password(request):
             messages.error(request, "No account found with this email.")
             return redirect("forgot_password")
 
-        otp = str(random.randint(100000, 999999))
-
-        PasswordResetOTP.objects.create(user=user, otp=otp)
+        otp = issue_password_reset_otp(user)
 
-        send_mail(
+        queue_email(
             subject="Password Reset OTP - Shine & Bright",
             message=f"Your OTP is {otp}. It is valid for 5 minutes.",
             from_email=settings.EMAIL_HOST_USER,
             recipient_list=[email],
-            fail_silently=True,
         )
 
         request.session["reset_user_id"] = user.id
@@ -3257,7 +3006,7 @@ def verify_otp(request):
         otp_obj = PasswordResetOTP.objects.filter(
             user_id=user_id,
             otp=otp_entered
-        ).last()
+        ).first()
 
         if not otp_obj or otp_obj.is_expired():
             messages.error(request, "Invalid or expired OTP.")
@@ -3358,10 +3107,7 @@ def admin_orders_filter(request):
     delayed = request.GET.get("delayed") # ✅ The separate view trigger
 
     if search:
-        orders = orders.filter(
-            Q(user__username__icontains=search) |
-            Q(id__icontains=search)
-        )
+        orders = orders.filter(order_search_filter(search))
 
     if status:
         orders = orders.filter(cloth_status=status)
@@ -3378,7 +3124,7 @@ def admin_orders_filter(request):
     ).exclude(cloth_status="Completed").count()
 
     return render(request, "admin/partials/orders_table.html", {
-        "orders": orders,
+        "orders": paginate(request, orders, ("-created_at", "-id"), ADMIN_PAGE_SIZE, count=True),
         "delayed_orders_count": delayed_orders_count,
         "is_delayed_view": delayed == "1" # Flag to show 'Back' button in template
     })